@@ -1,7 +1,7 @@
 import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine
 from alembic import context
-from app.models.reservation import *
+from app.models import Base
 import os
 from dotenv import load_dotenv
 
@@ -50,5 +50,9 @@ def do_run_migrations(connection):
 
 if context.is_offline_mode():
     run_migrations_offline()
+elif config.attributes.get("connection") is not None:
+    # Вызов из приложения при старте (app/core/startup.py): соединение уже
+    # открыто и держит advisory-блокировку, транзакцию фиксирует вызывающий
+    do_run_migrations(config.attributes["connection"])
 else:
     asyncio.run(run_migrations_online())
\ No newline at end of file
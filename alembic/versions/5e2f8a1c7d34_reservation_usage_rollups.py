@@ -0,0 +1,128 @@
+"""reservation usage rollups
+
+Revision ID: 5e2f8a1c7d34
+Revises: d41c7e2a9b58
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2f8a1c7d34'
+down_revision: Union[str, None] = 'd41c7e2a9b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema. Агрегаты заполняются по существующим броням под SHARE-блокировкой."""
+    op.create_table(
+        'reservation_usage_hourly',
+        sa.Column('table_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('booked_seconds', sa.Integer(), nullable=False),
+        sa.Column('reservations', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('table_id', 'hour'),
+    )
+    op.create_index('ix_reservation_usage_hourly_hour', 'reservation_usage_hourly', ['hour'], unique=False)
+    op.create_table(
+        'reservation_usage_daily',
+        sa.Column('table_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('booked_seconds', sa.Integer(), nullable=False),
+        sa.Column('reservations', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('table_id', 'day'),
+    )
+    op.create_index('ix_reservation_usage_daily_day', 'reservation_usage_daily', ['day'], unique=False)
+
+    op.execute("LOCK TABLE reservations IN SHARE MODE")
+    op.execute("""
+        INSERT INTO reservation_usage_hourly (table_id, hour, booked_seconds, reservations)
+        SELECT r.table_id, bucket,
+               sum(extract(epoch FROM upper(slice) - lower(slice))::integer),
+               count(*) FILTER (WHERE bucket = first_hour)
+        FROM reservations AS r,
+             LATERAL (SELECT date_trunc('hour', lower(r.period) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC') AS f(first_hour),
+             LATERAL generate_series(first_hour, upper(r.period) - interval '1 microsecond', interval '1 hour') AS bucket,
+             LATERAL (SELECT r.period * tstzrange(bucket, bucket + interval '1 hour')) AS part(slice)
+        GROUP BY r.table_id, bucket
+    """)
+    op.execute("""
+        INSERT INTO reservation_usage_daily (table_id, day, booked_seconds, reservations)
+        SELECT table_id, (date_trunc('day', hour AT TIME ZONE 'UTC'))::date, sum(booked_seconds), sum(reservations)
+        FROM reservation_usage_hourly
+        GROUP BY 1, 2
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION apply_reservation_usage(usage_table_id integer, usage_period tstzrange, sign integer)
+        RETURNS void LANGUAGE plpgsql AS $$
+        DECLARE
+            first_hour timestamptz := date_trunc('hour', lower(usage_period) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+            first_day timestamptz := date_trunc('day', lower(usage_period) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+        BEGIN
+            INSERT INTO reservation_usage_hourly AS usage (table_id, hour, booked_seconds, reservations)
+            SELECT usage_table_id, bucket,
+                   sign * extract(epoch FROM upper(slice) - lower(slice))::integer,
+                   sign * (bucket = first_hour)::integer
+            FROM generate_series(first_hour, upper(usage_period) - interval '1 microsecond', interval '1 hour') AS bucket,
+                 LATERAL (SELECT usage_period * tstzrange(bucket, bucket + interval '1 hour')) AS part(slice)
+            ORDER BY bucket
+            ON CONFLICT (table_id, hour) DO UPDATE SET
+                booked_seconds = usage.booked_seconds + EXCLUDED.booked_seconds,
+                reservations = usage.reservations + EXCLUDED.reservations;
+
+            -- Сутки отсчитываются интервалом в 24 часа: '1 day' зависит от часового пояса сессии
+            INSERT INTO reservation_usage_daily AS usage (table_id, day, booked_seconds, reservations)
+            SELECT usage_table_id, (bucket AT TIME ZONE 'UTC')::date,
+                   sign * extract(epoch FROM upper(slice) - lower(slice))::integer,
+                   sign * (bucket = first_day)::integer
+            FROM generate_series(first_day, upper(usage_period) - interval '1 microsecond', interval '24 hours') AS bucket,
+                 LATERAL (SELECT usage_period * tstzrange(bucket, bucket + interval '24 hours')) AS part(slice)
+            ORDER BY bucket
+            ON CONFLICT (table_id, day) DO UPDATE SET
+                booked_seconds = usage.booked_seconds + EXCLUDED.booked_seconds,
+                reservations = usage.reservations + EXCLUDED.reservations;
+
+            IF sign < 0 THEN
+                DELETE FROM reservation_usage_hourly
+                WHERE table_id = usage_table_id AND hour >= first_hour AND hour < upper(usage_period)
+                  AND booked_seconds = 0 AND reservations = 0;
+                DELETE FROM reservation_usage_daily
+                WHERE table_id = usage_table_id AND day >= (first_day AT TIME ZONE 'UTC')::date
+                  AND day <= (upper(usage_period) AT TIME ZONE 'UTC')::date
+                  AND booked_seconds = 0 AND reservations = 0;
+            END IF;
+        END $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION track_reservation_usage() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM apply_reservation_usage(OLD.table_id, OLD.period, -1);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM apply_reservation_usage(NEW.table_id, NEW.period, 1);
+            END IF;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER reservations_usage AFTER INSERT OR UPDATE OR DELETE ON reservations
+            FOR EACH ROW EXECUTE FUNCTION track_reservation_usage()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS reservations_usage ON reservations")
+    op.execute("DROP FUNCTION IF EXISTS track_reservation_usage()")
+    op.execute("DROP FUNCTION IF EXISTS apply_reservation_usage(integer, tstzrange, integer)")
+    op.drop_index('ix_reservation_usage_daily_day', table_name='reservation_usage_daily')
+    op.drop_table('reservation_usage_daily')
+    op.drop_index('ix_reservation_usage_hourly_hour', table_name='reservation_usage_hourly')
+    op.drop_table('reservation_usage_hourly')
@@ -0,0 +1,35 @@
+"""listing keyset indexes
+
+Revision ID: 6cf626627b6e
+Revises: b9651c2dbbe4
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6cf626627b6e'
+down_revision: Union[str, None] = 'b9651c2dbbe4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reservations_time_id', 'reservations', ['reservation_time', 'id'], unique=False)
+    op.create_index(
+        'ix_reservations_table_time_id', 'reservations', ['table_id', 'reservation_time', 'id'], unique=False
+    )
+    op.create_index(
+        'ix_tables_location_id', 'tables', ['location', 'id'], unique=False, postgresql_include=['seats']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tables_location_id', table_name='tables')
+    op.drop_index('ix_reservations_table_time_id', table_name='reservations')
+    op.drop_index('ix_reservations_time_id', table_name='reservations')
@@ -0,0 +1,50 @@
+"""initial schema
+
+Revision ID: 9a7b6631fa7e
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a7b6631fa7e'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'tables',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('seats', sa.Integer(), nullable=False),
+        sa.Column('location', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_tables_id'), 'tables', ['id'], unique=False)
+    op.create_table(
+        'reservations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('customer_name', sa.String(), nullable=False),
+        sa.Column('table_id', sa.Integer(), nullable=False),
+        sa.Column('reservation_time', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('duration_minutes', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['table_id'], ['tables.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_reservations_id'), 'reservations', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_reservations_id'), table_name='reservations')
+    op.drop_table('reservations')
+    op.drop_index(op.f('ix_tables_id'), table_name='tables')
+    op.drop_table('tables')
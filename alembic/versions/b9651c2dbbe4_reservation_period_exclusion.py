@@ -0,0 +1,54 @@
+"""reservation period exclusion constraint
+
+Revision ID: b9651c2dbbe4
+Revises: 9a7b6631fa7e
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9651c2dbbe4'
+down_revision: Union[str, None] = '9a7b6631fa7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    Если в таблице уже есть пересекающиеся брони, создание ограничения упадёт:
+    их нужно разрешить вручную до миграции.
+    """
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(
+        "CREATE OR REPLACE FUNCTION reservation_period(start timestamptz, minutes integer) "
+        "RETURNS tstzrange LANGUAGE sql IMMUTABLE PARALLEL SAFE AS "
+        "$$ SELECT tstzrange(start, start + make_interval(mins => minutes)) $$"
+    )
+    op.add_column(
+        'reservations',
+        sa.Column(
+            'period',
+            postgresql.TSTZRANGE(),
+            sa.Computed('reservation_period(reservation_time, duration_minutes)', persisted=True),
+        ),
+    )
+    op.create_exclude_constraint(
+        'reservations_no_overlap',
+        'reservations',
+        ('table_id', '='),
+        ('period', '&&'),
+        using='gist',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('reservations_no_overlap', 'reservations')
+    op.drop_column('reservations', 'period')
+    op.execute("DROP FUNCTION IF EXISTS reservation_period(timestamptz, integer)")
@@ -0,0 +1,71 @@
+"""change notify triggers
+
+Revision ID: bf873b51d47c
+Revises: 6cf626627b6e
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bf873b51d47c'
+down_revision: Union[str, None] = '6cf626627b6e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND NEW.id = OLD.id THEN
+                PERFORM pg_notify('table_changes', json_build_object('op', 'UPDATE', 'id', NEW.id)::text);
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pg_notify('table_changes', json_build_object('op', 'DELETE', 'id', OLD.id)::text);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM pg_notify('table_changes', json_build_object('op', 'INSERT', 'id', NEW.id)::text);
+            END IF;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER tables_notify AFTER INSERT OR UPDATE OR DELETE ON tables
+            FOR EACH ROW EXECUTE FUNCTION notify_table_change()
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_reservation_change() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pg_notify('reservation_changes', json_build_object('op', 'DELETE', 'id', OLD.id)::text);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM pg_notify('reservation_changes', json_build_object(
+                    'op', 'INSERT',
+                    'id', NEW.id,
+                    'table_id', NEW.table_id,
+                    'reservation_time', NEW.reservation_time,
+                    'duration_minutes', NEW.duration_minutes
+                )::text);
+            END IF;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER reservations_notify AFTER INSERT OR UPDATE OR DELETE ON reservations
+            FOR EACH ROW EXECUTE FUNCTION notify_reservation_change()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS reservations_notify ON reservations")
+    op.execute("DROP FUNCTION IF EXISTS notify_reservation_change()")
+    op.execute("DROP TRIGGER IF EXISTS tables_notify ON tables")
+    op.execute("DROP FUNCTION IF EXISTS notify_table_change()")
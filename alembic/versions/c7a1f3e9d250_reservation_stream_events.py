@@ -0,0 +1,74 @@
+"""reservation stream events
+
+Revision ID: c7a1f3e9d250
+Revises: 8b4e2d6f1a93
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a1f3e9d250'
+down_revision: Union[str, None] = '8b4e2d6f1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _notify_functions(event_fields: bool) -> tuple[str, str]:
+    # С event_fields уведомления несут номер события, стол удалённой брони и зал нового стола
+    delete_extra = "'event_id', nextval('reservation_event_seq'), 'id', OLD.id, 'table_id', OLD.table_id" if event_fields else "'id', OLD.id"
+    insert_extra = "'event_id', nextval('reservation_event_seq'), 'id', NEW.id" if event_fields else "'id', NEW.id"
+    table_extra = ", 'location', NEW.location" if event_fields else ""
+    reservation_function = f"""
+        CREATE OR REPLACE FUNCTION notify_reservation_change() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pg_notify('reservation_changes', json_build_object('op', 'DELETE', {delete_extra})::text);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM pg_notify('reservation_changes', json_build_object(
+                    'op', 'INSERT',
+                    {insert_extra},
+                    'table_id', NEW.table_id,
+                    'reservation_time', NEW.reservation_time,
+                    'duration_minutes', NEW.duration_minutes
+                )::text);
+            END IF;
+            RETURN NULL;
+        END $$
+    """
+    table_function = f"""
+        CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND NEW.id = OLD.id THEN
+                PERFORM pg_notify('table_changes', json_build_object('op', 'UPDATE', 'id', NEW.id{table_extra})::text);
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pg_notify('table_changes', json_build_object('op', 'DELETE', 'id', OLD.id)::text);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM pg_notify('table_changes', json_build_object('op', 'INSERT', 'id', NEW.id{table_extra})::text);
+            END IF;
+            RETURN NULL;
+        END $$
+    """
+    return reservation_function, table_function
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(sa.schema.CreateSequence(sa.Sequence('reservation_event_seq')))
+    for function in _notify_functions(event_fields=True):
+        op.execute(function)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for function in _notify_functions(event_fields=False):
+        op.execute(function)
+    op.execute(sa.schema.DropSequence(sa.Sequence('reservation_event_seq')))
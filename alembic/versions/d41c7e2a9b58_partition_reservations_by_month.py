@@ -0,0 +1,148 @@
+"""partition reservations by month
+
+Revision ID: d41c7e2a9b58
+Revises: bf873b51d47c
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41c7e2a9b58'
+down_revision: Union[str, None] = 'bf873b51d47c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, customer_name, table_id, reservation_time, duration_minutes"
+
+
+def _detach_old_table(name: str) -> None:
+    """Старая таблица освобождает имена индексов, ограничений и последовательность."""
+    op.execute(f"ALTER TABLE reservations RENAME TO {name}")
+    op.execute(f"DROP TRIGGER IF EXISTS reservations_notify ON {name}")
+    op.execute(f"DROP TRIGGER IF EXISTS reservations_cross_partition ON {name}")
+    op.execute("DROP INDEX IF EXISTS ix_reservations_id")
+    op.execute("DROP INDEX IF EXISTS ix_reservations_time_id")
+    op.execute("DROP INDEX IF EXISTS ix_reservations_table_time_id")
+    op.execute(f"ALTER TABLE {name} RENAME CONSTRAINT reservations_pkey TO {name}_pkey")
+    op.execute(f"ALTER TABLE {name} RENAME CONSTRAINT reservations_table_id_fkey TO {name}_table_id_fkey")
+    op.execute("ALTER SEQUENCE reservations_id_seq OWNED BY NONE")
+
+
+def _create_indexes() -> None:
+    op.create_index('ix_reservations_id', 'reservations', ['id'], unique=False)
+    op.create_index('ix_reservations_time_id', 'reservations', ['reservation_time', 'id'], unique=False)
+    op.create_index('ix_reservations_table_time_id', 'reservations', ['table_id', 'reservation_time', 'id'], unique=False)
+
+
+def _create_notify_trigger() -> None:
+    op.execute("""
+        CREATE TRIGGER reservations_notify AFTER INSERT OR UPDATE OR DELETE ON reservations
+            FOR EACH ROW EXECUTE FUNCTION notify_reservation_change()
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    Все существующие брони попадают в партицию по умолчанию; по месяцам их
+    раскладывает `python -m app.maintenance partitions`. Брони длиннее суток
+    нарушат новое CHECK-ограничение — их нужно исправить до миграции.
+    """
+    _detach_old_table('reservations_unpartitioned')
+    op.execute("ALTER TABLE reservations_unpartitioned DROP CONSTRAINT IF EXISTS reservations_no_overlap")
+
+    op.execute("""
+        CREATE TABLE reservations (
+            id integer NOT NULL DEFAULT nextval('reservations_id_seq'),
+            customer_name varchar NOT NULL,
+            table_id integer NOT NULL,
+            reservation_time timestamptz NOT NULL,
+            duration_minutes integer NOT NULL,
+            period tstzrange GENERATED ALWAYS AS (reservation_period(reservation_time, duration_minutes)) STORED,
+            CONSTRAINT reservations_pkey PRIMARY KEY (id, reservation_time),
+            CONSTRAINT reservations_table_id_fkey FOREIGN KEY (table_id) REFERENCES tables (id) ON DELETE CASCADE,
+            CONSTRAINT reservations_duration_range CHECK (duration_minutes > 0 AND duration_minutes <= 1440)
+        ) PARTITION BY RANGE (reservation_time)
+    """)
+    op.execute("ALTER SEQUENCE reservations_id_seq OWNED BY reservations.id")
+    _create_indexes()
+    op.execute("CREATE TABLE reservations_default PARTITION OF reservations DEFAULT")
+    op.execute(
+        "ALTER TABLE reservations_default ADD CONSTRAINT reservations_default_no_overlap "
+        "EXCLUDE USING gist (table_id WITH =, period WITH &&)"
+    )
+
+    # Данные переносятся до создания триггеров: они уже без пересечений,
+    # а уведомление на каждую строку никому не нужно
+    op.execute(f"INSERT INTO reservations ({COLUMNS}) SELECT {COLUMNS} FROM reservations_unpartitioned")
+    op.execute("DROP TABLE reservations_unpartitioned")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION check_reservation_cross_partition() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            month_start timestamptz := date_trunc('month', NEW.reservation_time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+            next_month timestamptz := month_start + interval '1 month';
+            new_period tstzrange := reservation_period(NEW.reservation_time, NEW.duration_minutes);
+        BEGIN
+            IF NEW.reservation_time < month_start + make_interval(mins => 1440)
+                    OR upper(new_period) > next_month THEN
+                PERFORM pg_advisory_xact_lock(hashtext('reservations'), NEW.table_id);
+                IF EXISTS (
+                    SELECT 1 FROM reservations
+                    WHERE table_id = NEW.table_id
+                      AND id <> NEW.id
+                      AND period && new_period
+                      AND reservation_time > NEW.reservation_time - make_interval(mins => 1440)
+                      AND reservation_time < upper(new_period)
+                      AND (reservation_time < month_start OR reservation_time >= next_month)
+                ) THEN
+                    RAISE EXCEPTION USING
+                        ERRCODE = 'exclusion_violation',
+                        CONSTRAINT = 'reservations_no_overlap',
+                        MESSAGE = 'reservation overlaps an existing one for table ' || NEW.table_id;
+                END IF;
+            END IF;
+            RETURN NEW;
+        END $$
+    """)
+    op.execute("""
+        CREATE TRIGGER reservations_cross_partition BEFORE INSERT OR UPDATE ON reservations
+            FOR EACH ROW EXECUTE FUNCTION check_reservation_cross_partition()
+    """)
+    _create_notify_trigger()
+
+
+def downgrade() -> None:
+    """Downgrade schema. Отсоединённые архивные партиции обратно не возвращаются."""
+    _detach_old_table('reservations_partitioned')
+
+    op.execute("""
+        CREATE TABLE reservations (
+            id integer NOT NULL DEFAULT nextval('reservations_id_seq'),
+            customer_name varchar NOT NULL,
+            table_id integer NOT NULL,
+            reservation_time timestamptz NOT NULL,
+            duration_minutes integer NOT NULL,
+            period tstzrange GENERATED ALWAYS AS (reservation_period(reservation_time, duration_minutes)) STORED,
+            CONSTRAINT reservations_pkey PRIMARY KEY (id),
+            CONSTRAINT reservations_table_id_fkey FOREIGN KEY (table_id) REFERENCES tables (id) ON DELETE CASCADE
+        )
+    """)
+    op.execute("ALTER SEQUENCE reservations_id_seq OWNED BY reservations.id")
+    op.execute(f"INSERT INTO reservations ({COLUMNS}) SELECT {COLUMNS} FROM reservations_partitioned")
+    op.execute("DROP TABLE reservations_partitioned")
+    op.execute("DROP FUNCTION IF EXISTS check_reservation_cross_partition()")
+
+    _create_indexes()
+    op.create_exclude_constraint(
+        'reservations_no_overlap',
+        'reservations',
+        ('table_id', '='),
+        ('period', '&&'),
+        using='gist',
+    )
+    _create_notify_trigger()
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import math
+from collections import Counter, deque
+from enum import Enum
+from typing import NamedTuple, Optional
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.metrics import ADMISSION_SHED, GaugeCallback
+from app.database import Settings, engine, settings
+
+logger = logging.getLogger(__name__)
+
+# Запросы, не занимающие соединение пула надолго или нужные при перегрузке:
+# пробы, метрики, документация и долгоживущий поток событий
+EXEMPT_PREFIXES = ("/health", "/metrics", "/monitoring", "/docs", "/redoc", "/openapi.json", "/reservations/stream")
+
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+SHED_BODY = orjson.dumps({"detail": "Server is overloaded, retry later"})
+
+
+class RouteClass(str, Enum):
+    # Создание и удаление столов и броней: обслуживаются первыми
+    write = "write"
+    # Списки, выгрузки, отчёты
+    read = "read"
+
+
+# Порядок, в котором освободившиеся места отдаются ожидающим
+PRIORITY = (RouteClass.write, RouteClass.read)
+
+
+class ClassLimits(NamedTuple):
+    concurrency: int
+    queue: int
+    wait_seconds: float
+
+
+class Overloaded(Exception):
+    def __init__(self, route_class: RouteClass, reason: str):
+        super().__init__(f"{route_class.value} requests over limit: {reason}")
+        self.route_class = route_class
+        self.reason = reason
+
+
+def pool_capacity(engine: AsyncEngine, settings: Settings) -> int:
+    """Сколько соединений воркер может держать одновременно: pool_size + max_overflow.
+    Без собственного пула (PgBouncer) — по тем же настройкам."""
+    pool = engine.sync_engine.pool
+    if isinstance(pool, AsyncAdaptedQueuePool) and pool._max_overflow >= 0:
+        return pool.size() + pool._max_overflow
+    return settings.DB_POOL_SIZE + max(settings.DB_MAX_OVERFLOW, 0)
+
+
+def plan_limits(capacity: int, settings: Settings) -> dict[RouteClass, ClassLimits]:
+    """Пишущим запросам доступен весь пул, читающим — без доли ADMISSION_WRITE_RESERVE,
+    чтобы длинные списки и выгрузки не занимали все соединения."""
+    capacity = max(capacity, 1)
+    reserve = math.ceil(capacity * settings.ADMISSION_WRITE_RESERVE) if capacity > 1 else 0
+    concurrency = {RouteClass.write: capacity, RouteClass.read: max(capacity - reserve, 1)}
+    wait_seconds = {
+        RouteClass.write: settings.ADMISSION_WRITE_WAIT_SECONDS,
+        RouteClass.read: settings.ADMISSION_READ_WAIT_SECONDS,
+    }
+    return {
+        route_class: ClassLimits(limit, math.ceil(limit * settings.ADMISSION_QUEUE_FACTOR), wait_seconds[route_class])
+        for route_class, limit in concurrency.items()
+    }
+
+
+class AdmissionController:
+    """Ограничение одновременных запросов воркера по классам маршрутов.
+
+    Запрос сверх лимита ждёт в очереди своего класса не дольше wait_seconds;
+    если очередь полна или срок вышел, он сразу получает 503, а не ждёт
+    соединение пула до DB_POOL_TIMEOUT. Освободившееся место сначала
+    получают пишущие запросы, затем читающие.
+    """
+
+    def __init__(self, capacity: int, limits: dict[RouteClass, ClassLimits]):
+        self.capacity = capacity
+        self.limits = limits
+        self.in_flight = {route_class: 0 for route_class in RouteClass}
+        self._waiters: dict[RouteClass, deque[asyncio.Future]] = {route_class: deque() for route_class in RouteClass}
+        self._counters = Counter()
+
+    def queued(self, route_class: RouteClass) -> int:
+        return len(self._waiters[route_class])
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            **{
+                route_class.value: {
+                    **self.limits[route_class]._asdict(),
+                    "in_flight": self.in_flight[route_class],
+                    "queued": self.queued(route_class),
+                    "admitted": self._counters[route_class, "admitted"],
+                    "shed": self._counters[route_class, "shed"],
+                }
+                for route_class in RouteClass
+            },
+        }
+
+    def _can_run(self, route_class: RouteClass) -> bool:
+        return (
+            sum(self.in_flight.values()) < self.capacity
+            and self.in_flight[route_class] < self.limits[route_class].concurrency
+        )
+
+    def _admit(self, route_class: RouteClass):
+        self.in_flight[route_class] += 1
+        self._counters[route_class, "admitted"] += 1
+
+    def _shed(self, route_class: RouteClass, reason: str) -> Overloaded:
+        self._counters[route_class, "shed"] += 1
+        ADMISSION_SHED.inc(route_class.value, reason)
+        return Overloaded(route_class, reason)
+
+    async def acquire(self, route_class: RouteClass):
+        # Без очереди проходит, только если никто более приоритетный не ждёт
+        ahead = PRIORITY[:PRIORITY.index(route_class) + 1]
+        if self._can_run(route_class) and not any(self._waiters[waiting] for waiting in ahead):
+            self._admit(route_class)
+            return
+
+        limits = self.limits[route_class]
+        waiters = self._waiters[route_class]
+        if len(waiters) >= limits.queue:
+            raise self._shed(route_class, "queue_full")
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, limits.wait_seconds)
+        except TimeoutError:
+            if waiter in waiters:
+                waiters.remove(waiter)
+            raise self._shed(route_class, "timeout")
+        except BaseException:
+            # Запрос отменён (клиент ушёл): место, если его успели выдать, возвращается
+            if waiter.done() and not waiter.cancelled():
+                self.release(route_class)
+            elif waiter in waiters:
+                waiters.remove(waiter)
+            raise
+
+    def release(self, route_class: RouteClass):
+        self.in_flight[route_class] -= 1
+        for waiting in PRIORITY:
+            waiters = self._waiters[waiting]
+            while waiters and self._can_run(waiting):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self._admit(waiting)
+                    waiter.set_result(None)
+
+
+def route_class(scope) -> Optional[RouteClass]:
+    """Класс запроса по методу и пути; None — запрос не ограничивается."""
+    if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+        return None
+    return RouteClass.write if scope["method"] in WRITE_METHODS else RouteClass.read
+
+
+class AdmissionMiddleware:
+    """ASGI-middleware: место в контроллере занимается на всё время запроса,
+    включая потоковую отдачу тела (выгрузка держит соединение пула до конца)."""
+
+    def __init__(self, app, controller: AdmissionController, retry_after_seconds: int = 1):
+        self.app = app
+        self.controller = controller
+        self.retry_after = str(retry_after_seconds).encode()
+
+    async def __call__(self, scope, receive, send):
+        request_class = route_class(scope)
+        if request_class is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire(request_class)
+        except Overloaded as exc:
+            # INFO, а не WARNING: при перегрузке таких записей много, и их ограничивает лимит логгера
+            logger.info("Запрос %s %s отклонён: %s", scope["method"], scope["path"], exc.reason)
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(SHED_BODY)).encode()),
+                    (b"retry-after", self.retry_after),
+                ],
+            })
+            await send({"type": "http.response.body", "body": SHED_BODY})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(request_class)
+
+
+# Лимиты воркера считаются от его собственного пула: app/server.py урезает пул
+# под бюджет соединений до импорта приложения
+_capacity = pool_capacity(engine, settings)
+admission_controller = AdmissionController(_capacity, plan_limits(_capacity, settings))
+
+for _route_class in RouteClass:
+    GaugeCallback(
+        f"admission_{_route_class.value}_in_flight", f"{_route_class.value.capitalize()} requests being served",
+        lambda route_class=_route_class: admission_controller.in_flight[route_class],
+    )
+    GaugeCallback(
+        f"admission_{_route_class.value}_queued", f"{_route_class.value.capitalize()} requests waiting for admission",
+        lambda route_class=_route_class: admission_controller.queued(route_class),
+    )
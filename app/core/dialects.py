@@ -0,0 +1,132 @@
+"""Выражения, которые Postgres и SQLite записывают по-разному.
+
+Основной бэкенд — Postgres; SQLite (aiosqlite) нужен для лёгкого локального
+экземпляра на точке и для тестов без сервера базы. Сервисы строят запросы
+из этих элементов, а нужный SQL выбирается при компиляции под диалект
+соединения, поэтому код запросов у бэкендов общий.
+"""
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement, Values
+
+
+class UTCDateTime(sa.TypeDecorator):
+    """timestamptz в Postgres, строка UTC в SQLite.
+
+    SQLite хранит время текстом без смещения, поэтому перед записью время
+    приводится к UTC, а при чтении смещение UTC возвращается. Строки одного
+    формата сравниваются как время, и индексы по ним работают так же.
+    """
+
+    impl = sa.DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        if dialect.name == "sqlite":
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+
+def as_timestamp(value):
+    """Время из Python как параметр запроса типа UTCDateTime."""
+    if isinstance(value, datetime):
+        return sa.literal(value, UTCDateTime())
+    return value
+
+
+def dialect_name(db: AsyncSession) -> str:
+    """Диалект соединения сессии: "postgresql" или "sqlite"."""
+    return db.get_bind().dialect.name
+
+
+# --- Сложение времени с минутами
+
+class _add_minutes(FunctionElement):
+    type = UTCDateTime()
+    name = "add_minutes"
+    inherit_cache = True
+
+
+def add_minutes(timestamp, minutes):
+    """timestamp + minutes минут. Значения из Python складываются сразу."""
+    if isinstance(timestamp, datetime) and isinstance(minutes, int):
+        return timestamp + timedelta(minutes=minutes)
+    return _add_minutes(as_timestamp(timestamp), minutes)
+
+
+@compiles(_add_minutes, "postgresql")
+def _add_minutes_postgresql(element, compiler, **kw):
+    timestamp, minutes = element.clauses
+    return f"({compiler.process(timestamp, **kw)} + make_interval(mins => {compiler.process(minutes, **kw)}))"
+
+
+def sqlite_add_minutes(timestamp: str, minutes: str) -> str:
+    """SQL SQLite для timestamp + minutes минут над строкой 'YYYY-MM-DD HH:MM:SS.ffffff'.
+    strftime('%f') оставляет только миллисекунды, поэтому дробная часть
+    секунды переносится из исходной строки: сдвиг на целые минуты её не меняет."""
+    return f"(strftime('%Y-%m-%d %H:%M:%S', {timestamp}, {minutes} || ' minutes') || substr({timestamp}, 20))"
+
+
+@compiles(_add_minutes, "sqlite")
+def _add_minutes_sqlite(element, compiler, **kw):
+    timestamp, minutes = element.clauses
+    return sqlite_add_minutes(compiler.process(timestamp, **kw), compiler.process(minutes, **kw))
+
+
+# --- Разность времени в минутах
+
+class minutes_between(FunctionElement):
+    """Минуты от start до end, дробные."""
+    type = sa.Float()
+    name = "minutes_between"
+    inherit_cache = True
+
+    def __init__(self, start, end):
+        super().__init__(as_timestamp(start), as_timestamp(end))
+
+
+@compiles(minutes_between, "postgresql")
+def _minutes_between_postgresql(element, compiler, **kw):
+    start, end = element.clauses
+    return f"(extract(epoch FROM {compiler.process(end, **kw)} - {compiler.process(start, **kw)}) / 60)"
+
+
+@compiles(minutes_between, "sqlite")
+def _minutes_between_sqlite(element, compiler, **kw):
+    start, end = element.clauses
+    # julianday считает в сутках с плавающей точкой: округление убирает
+    # погрешность порядка 1e-7 минуты, из-за которой 60 превращалось бы в 59.999
+    return (
+        f"round((julianday({compiler.process(end, **kw)}) - julianday({compiler.process(start, **kw)})) * 1440, 4)"
+    )
+
+
+# --- VALUES как таблица
+
+@compiles(Values, "sqlite")
+def _values_sqlite(element, compiler, asfrom=False, from_linter=None, **kw):
+    # SQLite не принимает имена колонок после алиаса "(VALUES ...) AS batch (a, b)"
+    # и называет колонки VALUES column1, column2, ...: имена задаёт подзапрос
+    rows = compiler._render_values(element, **kw)
+    columns = ", ".join(
+        f"column{position} AS {compiler.preparer.quote(column.name)}"
+        for position, column in enumerate(element.columns, start=1)
+    )
+    text = f"(SELECT {columns} FROM ({rows}))"
+    if asfrom and element.name:
+        if from_linter:
+            from_linter.froms[element._de_clone()] = element.name
+        text += f" AS {compiler.preparer.quote(element.name)}"
+    return text
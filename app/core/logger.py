@@ -1,28 +1,173 @@
+import json
 import logging
-from logging.config import dictConfig
-
-LOG_CONFIG = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
-            "format": "[%(asctime)s] %(levelname)s in %(module)s: %(message)s",
-        },
-        "verbose": {
-            "format": "[%(asctime)s] %(levelname)s [%(name)s:%(lineno)s] %(message)s",
-        },
-    },
-    "handlers": {
-        "default": {
-            "formatter": "verbose",
-            "class": "logging.StreamHandler",
-        },
-    },
-    "root": {
-        "level": "INFO",
-        "handlers": ["default"],
-    },
-}
-
-def setup_logging():
-    dictConfig(LOG_CONFIG)
+import queue
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# Идентификатор текущего запроса; задаётся RequestIdMiddleware и попадает в каждую запись
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+TEXT_FORMAT = "[%(asctime)s] %(levelname)s [%(name)s:%(lineno)s] [%(request_id)s] %(message)s"
+
+# Сторонние логгеры со своими синхронными обработчиками, переводимые на общую очередь
+ROUTED_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+class RequestIdFilter(logging.Filter):
+    """Добавляет к записи request_id. Работает в потоке, где записано сообщение,
+    поэтому видит contextvar текущего запроса."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Ограничение частоты записей уровня INFO и ниже: не больше per_second
+    в секунду на шаблон сообщения. Шаблон — это record.msg до подстановки
+    аргументов, поэтому одинаковые события с разными значениями считаются вместе.
+    Первая пропущенная после паузы запись несёт число отброшенных в поле suppressed.
+    """
+
+    # Предел числа отслеживаемых шаблонов
+    MAX_KEYS = 1024
+
+    def __init__(self, per_second: int):
+        super().__init__()
+        self.per_second = per_second
+        # Шаблон -> [начало окна, записей в окне, отброшено]
+        self._windows: dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or self.per_second <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None:
+            if len(self._windows) >= self.MAX_KEYS:
+                self._windows.clear()
+            window = self._windows[key] = [now, 0, 0]
+        elif now - window[0] >= 1.0:
+            window[0], window[1] = now, 0
+        if window[1] >= self.per_second:
+            window[2] += 1
+            return False
+        window[1] += 1
+        if window[2]:
+            record.suppressed, window[2] = window[2], 0
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "module": record.module,
+            "line": record.lineno,
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler, который не форматирует запись и не ждёт места в очереди.
+
+    Стандартный prepare() подставляет аргументы в потоке вызова; здесь это
+    делает поток QueueListener, и на event loop остаётся только put_nowait.
+    При переполненной очереди запись отбрасывается и учитывается в dropped.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", json_format: bool = True, rate_limit: int = 0, queue_size: int = 10000):
+    """Перевод корневого логгера на очередь, которую разбирает отдельный поток."""
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+    if rate_limit:
+        handler.addFilter(RateLimitFilter(rate_limit))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+    for name in ROUTED_LOGGERS:
+        routed = logging.getLogger(name)
+        routed.handlers = []
+        routed.propagate = True
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Остановка потока логирования с дозаписью накопившихся записей."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI-middleware: request id из заголовка X-Request-ID или новый, в contextvar и в ответ."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = REQUEST_ID_HEADER.lower().encode()
+        request_id = next((value.decode("latin-1") for name, value in scope["headers"] if name == header), None)
+        # Входящее значение принимается, только если оно короткое, иначе генерируется своё
+        if not request_id or len(request_id) > 128:
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (header, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
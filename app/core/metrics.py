@@ -0,0 +1,237 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import pool_stats
+
+# Все метрики живут в потоке event loop (события SQLAlchemy выполняются в нём же
+# через greenlet), поэтому обычные словари безопасны и блокировки не нужны.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Метка для запросов, не совпавших ни с одним маршрутом: сырые пути не
+# попадают в метки, иначе кардинальность неограничена
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        registry.append(self)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in self._values.items()]
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # На каждую комбинацию меток: [счётчики корзин..., +Inf], сумма
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self._counts.get(labels, ()))
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {self._sums[labels]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class GaugeCallback(Metric):
+    """Набор gauge-значений, вычисляемых в момент сбора (например, состояние пула)."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Optional[float]]):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def samples(self) -> list[str]:
+        value = self.callback()
+        return [] if value is None else [f"{self.name} {value}"]
+
+
+registry: list[Metric] = []
+
+
+def render() -> str:
+    """Текст в формате Prometheus exposition 0.0.4."""
+    lines = []
+    for metric in registry:
+        samples = metric.samples()
+        if samples:
+            lines.extend(metric.header())
+            lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+HTTP_RESPONSES = Counter("http_responses_total", "HTTP responses by route template and status", ("method", "route", "status"))
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: латентность и коды ответов по шаблону маршрута."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Маршрут FastAPI кладёт в scope при сопоставлении
+            route = scope.get("route")
+            template = getattr(route, "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method, template)
+            HTTP_RESPONSES.inc(method, template, str(status_code))
+
+
+# --- База данных
+
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "SQL statement execution time by operation", ("operation",))
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "Failed SQL statements by operation", ("operation",))
+
+# Операции, попадающие в метки как есть; остальное — "OTHER"
+_KNOWN_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK"})
+
+
+def statement_operation(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    operation = head[0].upper() if head else ""
+    return operation if operation in _KNOWN_OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Подписка на события движка для замера времени каждого запроса."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERY_DURATION.observe(time.perf_counter() - context._metrics_started, statement_operation(statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        if context.statement is not None:
+            DB_QUERY_ERRORS.inc(statement_operation(context.statement))
+
+
+# Показатели пула из pool_stats(), отдаваемые как gauge
+POOL_GAUGES = {
+    "size": "Configured pool size",
+    "checked_out": "Connections currently checked out",
+    "overflow": "Connections opened above pool size",
+    "checkout_timeouts": "Checkouts that timed out waiting for a connection",
+    "checkout_wait_avg_ms": "Average time spent waiting for a connection, ms",
+    "checkout_wait_max_ms": "Longest time spent waiting for a connection, ms",
+}
+
+
+def instrument_pool(engine: AsyncEngine):
+    for key, documentation in POOL_GAUGES.items():
+        GaugeCallback(f"db_pool_{key}", documentation, lambda key=key: pool_stats(engine).get(key))
+
+
+# --- Предметная область
+
+RESERVATIONS_CREATED = Counter("reservations_created_total", "Reservations created", ("mode",))
+RESERVATION_CONFLICTS = Counter(
+    "reservation_conflicts_total", "Reservation requests rejected because the slot is taken", ("source",)
+)
+TABLE_NOT_FOUND = Counter("table_not_found_total", "Reservation requests for unknown tables")
+IDEMPOTENT_REPLAYS = Counter(
+    "idempotent_replays_total", "POST requests answered with the stored response of their Idempotency-Key", ("source",)
+)
+STREAM_CLIENTS_DROPPED = Counter(
+    "reservation_stream_dropped_total", "Stream clients disconnected for falling behind their queue"
+)
+ADMISSION_SHED = Counter(
+    "admission_shed_total", "Requests rejected with 503 by admission control", ("route_class", "reason")
+)
+READS_ROUTED = Counter("db_reads_routed_total", "Read-only requests by the database that served them", ("target",))
+DB_SLOW_QUERIES = Counter(
+    "db_slow_queries_total", "SQL statements slower than PROFILING_SLOW_QUERY_MS", ("operation",)
+)
+DB_REPEATED_STATEMENTS = Counter(
+    "db_repeated_statements_total", "Requests that repeated one SQL statement PROFILING_REPEAT_THRESHOLD times or more"
+)
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед переподключением LISTEN-соединения
+RECONNECT_DELAY_SECONDS = 5
+
+
+class NotificationListener:
+    """Одно LISTEN-соединение на воркер, раздающее уведомления Postgres подписчикам.
+
+    Подписки регистрируются до start(). После каждого (пере)подключения вызываются
+    on_connect-колбэки: всё, что случилось, пока соединения не было, подписчик
+    должен перечитать сам. При обрыве вызываются on_disconnect-колбэки.
+    """
+
+    def __init__(self):
+        self.connected = False
+        self._handlers: dict[str, list[Callable[[str], None]]] = defaultdict(list)
+        self._on_connect: list[Callable[[], Awaitable[None]]] = []
+        self._on_disconnect: list[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]):
+        self._handlers[channel].append(handler)
+
+    def on_connect(self, callback: Callable[[], Awaitable[None]]):
+        self._on_connect.append(callback)
+
+    def on_disconnect(self, callback: Callable[[], None]):
+        self._on_disconnect.append(callback)
+
+    def _dispatch(self, connection, pid, channel, payload):
+        for handler in self._handlers[channel]:
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Не удалось обработать уведомление %s: %s", channel, payload)
+
+    async def _listen(self, engine: AsyncEngine):
+        conn = await engine.connect()
+        try:
+            raw = await conn.get_raw_connection()
+            listener = raw.driver_connection
+            closed = asyncio.Event()
+            listener.add_termination_listener(lambda _: closed.set())
+            for channel in self._handlers:
+                await listener.add_listener(channel, self._dispatch)
+            self.connected = True
+            logger.info("LISTEN %s", ", ".join(self._handlers))
+            for callback in self._on_connect:
+                await callback()
+            await closed.wait()
+        finally:
+            if self.connected:
+                self.connected = False
+                for callback in self._on_disconnect:
+                    callback()
+            # Соединение с подписками не возвращаем в пул
+            await conn.invalidate()
+            await conn.close()
+
+    async def _run(self, engine: AsyncEngine):
+        while True:
+            try:
+                await self._listen(engine)
+                logger.warning("LISTEN-соединение закрыто")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка LISTEN-соединения")
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    def start(self, engine: AsyncEngine):
+        if self._task is None and self._handlers:
+            self._task = asyncio.create_task(self._run(engine))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+notification_listener = NotificationListener()
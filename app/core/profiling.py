@@ -0,0 +1,196 @@
+import asyncio
+import cProfile
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.logger import request_id_var
+from app.core.metrics import DB_REPEATED_STATEMENTS, DB_SLOW_QUERIES, statement_operation
+from app.database import settings
+
+logger = logging.getLogger(__name__)
+
+DB_QUERIES_HEADER = "X-DB-Queries"
+
+# Операции, повтор которых в одном запросе означает N+1; BEGIN и COMMIT не в счёт
+_DATA_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"})
+
+# Предел длины параметров в записи о медленном запросе (executemany может нести тысячи строк)
+MAX_LOGGED_PARAMETERS = 2000
+
+
+class RequestProfile:
+    """SQL одного HTTP-запроса: число выражений, время в базе и повторы текста."""
+
+    __slots__ = ("started", "queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Counter[str] = Counter()
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Выражения, выполненные не меньше threshold раз: признак N+1."""
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold and statement_operation(statement) in _DATA_OPERATIONS
+        ]
+
+    def server_timing(self) -> bytes:
+        """Значение Server-Timing: время в базе, остальное (Python, сериализация) и всего."""
+        total_ms = 1000 * (time.perf_counter() - self.started)
+        db_ms = 1000 * self.db_seconds
+        return (
+            f'db;dur={db_ms:.1f};desc="{self.queries} queries", '
+            f"app;dur={max(total_ms - db_ms, 0):.1f}, total;dur={total_ms:.1f}"
+        ).encode()
+
+
+# Профиль текущего запроса; задаётся ProfilingMiddleware. Объект изменяемый, поэтому
+# его видят и задачи, которые запрос породил (например, потоковая отдача тела)
+request_profile_var: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def _dump_name(scope) -> str:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+    return f"{stamp}_{scope['method']}_{path}_{request_id_var.get() or 'none'}.prof"
+
+
+class QueryProfiler:
+    """Профилирование запросов по событиям движка.
+
+    Выключенный профилировщик не подписывается на события и не ставит
+    middleware, поэтому ничего не стоит. Включённый на каждое SQL-выражение
+    делает один get() contextvar и пару сложений; медленные выражения пишутся
+    в лог с параметрами, повторы одного текста в запросе — предупреждением о N+1.
+    Каждый sample_every-й запрос дополнительно снимается cProfile в dump_dir.
+    """
+
+    def __init__(self, slow_query_ms: float, repeat_threshold: int, sample_every: int = 0, dump_dir: str = "profiles"):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.repeat_threshold = repeat_threshold
+        self.sample_every = sample_every
+        self.dump_dir = dump_dir
+        self._requests = 0
+        # cProfile ставит профилирующую функцию на весь поток, поэтому
+        # одновременно снимается не больше одного запроса
+        self._sampling = False
+
+    def instrument(self, engine: AsyncEngine):
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            profile = request_profile_var.get()
+            if profile is None:
+                return
+            profile.queries += 1
+            profile.statements[statement] += 1
+            context._profile_started = time.perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, "_profile_started", None)
+            profile = request_profile_var.get()
+            if started is None or profile is None:
+                return
+            elapsed = time.perf_counter() - started
+            profile.db_seconds += elapsed
+            if elapsed >= self.slow_query_seconds:
+                DB_SLOW_QUERIES.inc(statement_operation(statement))
+                logger.warning(
+                    "Медленный SQL-запрос %.1f мс: %s; параметры: %.*r",
+                    1000 * elapsed, statement, MAX_LOGGED_PARAMETERS, parameters,
+                )
+
+    def start_sample(self) -> Optional[cProfile.Profile]:
+        """cProfile для каждого sample_every-го запроса, иначе None.
+        Профилируется весь event loop: в дамп попадают и запросы, обслуживаемые параллельно."""
+        if not self.sample_every or self._sampling:
+            return None
+        self._requests += 1
+        if self._requests % self.sample_every:
+            return None
+        self._sampling = True
+        sampler = cProfile.Profile()
+        sampler.enable()
+        return sampler
+
+    def stop_sample(self, sampler: cProfile.Profile):
+        sampler.disable()
+        self._sampling = False
+
+    def finish(self, scope, profile: RequestProfile):
+        repeated = profile.repeated(self.repeat_threshold)
+        if repeated:
+            DB_REPEATED_STATEMENTS.inc()
+        for statement, count in repeated:
+            logger.warning(
+                "Возможный N+1 в %s %s: выражение выполнено %s раз: %s", scope["method"], scope["path"], count, statement
+            )
+
+    async def dump(self, scope, profiler: cProfile.Profile):
+        os.makedirs(self.dump_dir, exist_ok=True)
+        path = os.path.join(self.dump_dir, _dump_name(scope))
+        # Запись статистики — файловый ввод-вывод, поэтому не в event loop
+        await asyncio.to_thread(profiler.dump_stats, path)
+        logger.info("Профиль запроса %s %s записан в %s", scope["method"], scope["path"], path)
+
+
+class ProfilingMiddleware:
+    """ASGI-middleware: профиль SQL на время запроса, заголовки Server-Timing
+    и X-DB-Queries в ответе и, для выборки запросов, дамп cProfile.
+
+    Заголовки уходят с началом ответа, поэтому у потоковой выгрузки они
+    учитывают только запросы, выполненные до первого фрагмента тела."""
+
+    def __init__(self, app, profiler: QueryProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = request_profile_var.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", profile.server_timing()),
+                    (DB_QUERIES_HEADER.lower().encode(), str(profile.queries).encode()),
+                ]
+            await send(message)
+
+        sampler = self.profiler.start_sample()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_profile_var.reset(token)
+            if sampler is not None:
+                self.profiler.stop_sample(sampler)
+            self.profiler.finish(scope, profile)
+        if sampler is not None:
+            await self.profiler.dump(scope, sampler)
+
+
+query_profiler = QueryProfiler(
+    settings.PROFILING_SLOW_QUERY_MS,
+    settings.PROFILING_REPEAT_THRESHOLD,
+    settings.PROFILING_SAMPLE_EVERY,
+    settings.PROFILING_DUMP_DIR,
+)
@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import math
+import time
+from collections import Counter, deque
+from typing import Optional
+
+import sqlalchemy as sa
+from fastapi import Depends, Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.admission import WRITE_METHODS
+from app.core.metrics import READS_ROUTED, GaugeCallback
+from app.database import AsyncSessionLocal, engine, engine_options, get_session_factory, settings
+
+logger = logging.getLogger(__name__)
+
+# Время последней записи клиента (Unix time): ответ на запись выставляет оба,
+# браузер возвращает cookie сам, остальные клиенты передают заголовок
+LAST_WRITE_COOKIE = "last_write_at"
+LAST_WRITE_HEADER = "X-Last-Write-At"
+
+# Ключ session.info: до какого момента сессия видит все коммиты primary
+FRESH_AS_OF = "fresh_as_of"
+
+PRIMARY_LSN = sa.text("SELECT pg_current_wal_lsn()::text")
+REPLICA_STATE = sa.text("SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text")
+
+
+def parse_lsn(value: str) -> int:
+    """Позиция WAL вида '16/B374D848' в виде числа для сравнения."""
+    high, low = value.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+class Replica:
+    def __init__(self, url: str, engine: AsyncEngine):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = engine
+        self.session_factory = sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+        self.healthy = False
+        # Все коммиты primary, сделанные до этого момента, на реплике уже видны
+        self.fresh_as_of = 0.0
+        self.error: Optional[str] = None
+
+
+class ReplicaRouter:
+    """Выбор базы для читающего запроса: реплика по кругу или primary.
+
+    Раз в check_interval воркер запоминает текущую позицию WAL primary и время,
+    когда он её прочитал, и спрашивает у каждой реплики, до какой позиции она
+    воспроизвела журнал. Так для реплики известен момент, до которого она видит
+    все коммиты primary, без обращения к базе в самих запросах. Реплика,
+    отставшая больше max_lag_seconds или не ответившая, запросов не получает.
+
+    Запрос клиента, который недавно писал, идёт только на реплику, уже
+    получившую его запись, а если такой нет — на primary. Узел не в режиме
+    восстановления (тот же primary под другим адресом) считается без отставания.
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: list[Replica], max_lag_seconds: float, check_interval: float):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        # Позиции WAL primary за окно допустимого отставания: (время, позиция)
+        self._samples: deque[tuple[float, int]] = deque(maxlen=math.ceil(max_lag_seconds / check_interval) + 2)
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+        self._counters = Counter()
+
+    def choose(self, not_before: float = 0.0) -> Optional[Replica]:
+        """Следующая по кругу здоровая реплика, видящая коммиты до not_before; None — читать с primary."""
+        count = len(self.replicas)
+        for offset in range(count):
+            replica = self.replicas[(self._next + offset) % count]
+            if replica.healthy and replica.fresh_as_of >= not_before:
+                self._next = (self._next + offset + 1) % count
+                self._counters["replica"] += 1
+                READS_ROUTED.inc("replica")
+                return replica
+        self._counters["primary"] += 1
+        READS_ROUTED.inc("primary")
+        return None
+
+    def healthy_count(self) -> int:
+        return sum(replica.healthy for replica in self.replicas)
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "max_lag_seconds": self.max_lag_seconds,
+            "routed": {"replica": self._counters["replica"], "primary": self._counters["primary"]},
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag_seconds": round(max(now - replica.fresh_as_of, 0.0), 3) if replica.fresh_as_of else None,
+                    "error": replica.error,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+    # --- Проверка реплик
+
+    async def _sample_primary(self):
+        # Время берётся до запроса: всё закоммиченное раньше уже входит в позицию
+        started = time.time()
+        async with self.primary.connect() as conn:
+            position = parse_lsn(await conn.scalar(PRIMARY_LSN))
+        self._samples.append((started, position))
+
+    def _mark(self, replica: Replica, healthy: bool, error: Optional[str] = None):
+        if healthy != replica.healthy:
+            if healthy:
+                logger.info("Реплика %s снова принимает чтение", replica.name)
+            else:
+                logger.warning("Реплика %s исключена из чтения: %s", replica.name, error)
+        replica.healthy = healthy
+        replica.error = error
+
+    async def _check_replica(self, replica: Replica):
+        try:
+            async with asyncio.timeout(self.check_interval):
+                async with replica.engine.connect() as conn:
+                    in_recovery, replayed = (await conn.execute(REPLICA_STATE)).one()
+        except Exception as exc:
+            self._mark(replica, False, f"{type(exc).__name__}: {exc}")
+            return
+        if not in_recovery:
+            replica.fresh_as_of = math.inf
+        else:
+            position = parse_lsn(replayed) if replayed else -1
+            replica.fresh_as_of = max(
+                (sampled_at for sampled_at, lsn in self._samples if lsn <= position), default=replica.fresh_as_of
+            )
+        lag = time.time() - replica.fresh_as_of
+        if lag > self.max_lag_seconds:
+            self._mark(replica, False, f"lag {lag:.1f}s")
+        else:
+            self._mark(replica, True)
+
+    async def check(self):
+        try:
+            async with asyncio.timeout(self.check_interval):
+                await self._sample_primary()
+        except Exception:
+            # Без свежей позиции primary отставание реплик растёт, и они выходят из чтения сами
+            logger.warning("Не удалось прочитать позицию WAL primary", exc_info=True)
+        await asyncio.gather(*(self._check_replica(replica) for replica in self.replicas))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Ошибка проверки реплик")
+
+    async def start(self):
+        """Первая проверка до приёма запросов, затем фоновая раз в check_interval."""
+        if not self.replicas or self._task is not None:
+            return
+        await self.check()
+        logger.info("Реплик для чтения: %s из %s", self.healthy_count(), len(self.replicas))
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+def last_write_at(request: Request) -> float:
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return float(value) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+def fresh_as_of(db: AsyncSession) -> float:
+    """До какого момента сессия видит все коммиты primary; для primary — всегда."""
+    return db.info.get(FRESH_AS_OF, math.inf)
+
+
+# Зависимость для читающих эндпоинтов. Запись и проверка доступности стола
+# при бронировании идут только через get_async_session, то есть на primary
+async def get_read_session(request: Request) -> AsyncSession:
+    replica = replica_router.choose(last_write_at(request)) if replica_router.replicas else None
+    if replica is None:
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+    async with replica.session_factory() as session:
+        session.info[FRESH_AS_OF] = replica.fresh_as_of
+        yield session
+
+
+# То же для потоковых ответов, которые открывают сессию сами
+def get_read_session_factory(request: Request, primary: sessionmaker = Depends(get_session_factory)) -> sessionmaker:
+    replica = replica_router.choose(last_write_at(request)) if replica_router.replicas else None
+    return primary if replica is None else replica.session_factory
+
+
+class ReadYourWritesMiddleware:
+    """ASGI-middleware: успешный ответ на запись несёт время записи в cookie
+    и заголовке, чтобы следующие чтения клиента не ушли на отставшую реплику.
+    Дольше допустимого отставания метка не живёт: потом её видят все здоровые реплики."""
+
+    def __init__(self, app, max_age_seconds: float):
+        self.app = app
+        self.max_age = math.ceil(max_age_seconds)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_mark(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                written_at = f"{time.time():.6f}".encode()
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (LAST_WRITE_HEADER.lower().encode(), written_at),
+                    (
+                        b"set-cookie",
+                        b"%s=%s; Max-Age=%d; Path=/; HttpOnly; SameSite=Lax"
+                        % (LAST_WRITE_COOKIE.encode(), written_at, self.max_age),
+                    ),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_mark)
+
+
+replica_router = ReplicaRouter(
+    engine,
+    [Replica(url, create_async_engine(url, **engine_options(settings, url))) for url in settings.DATABASE_REPLICA_URLS],
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_CHECK_INTERVAL,
+)
+
+GaugeCallback("db_replicas_healthy", "Read replicas currently receiving queries", replica_router.healthy_count)
@@ -0,0 +1,96 @@
+import gzip
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from fastapi import Request, Response
+
+from app.core.notifications import NotificationListener
+
+# Тела короче этого порога не сжимаются: выигрыш меньше накладных расходов
+GZIP_MIN_SIZE = 1024
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение ETag из If-None-Match."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+class CachedResponse:
+    """Готовое JSON-тело ответа: сериализованное, сжатое и с ETag по содержимому."""
+
+    __slots__ = ("body", "gzipped", "etag", "headers")
+
+    def __init__(self, body: bytes, headers: dict[str, str]):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None
+        # ETag считается по содержимому, поэтому совпадает у всех воркеров
+        self.etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.headers = headers
+
+    def render(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding", **self.headers}
+        if _etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+        if self.gzipped is not None and "gzip" in request.headers.get("accept-encoding", ""):
+            return Response(self.gzipped, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """LRU-кэш готовых ответов списочных эндпоинтов, сбрасываемый при изменении данных.
+
+    Сбрасывается локально сервисами при записи и во всех воркерах — по NOTIFY
+    (а также после переподключения LISTEN, когда уведомления могли потеряться).
+    Пока кэш тёплый, повторный запрос не обращается к базе вовсе.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.version = 0
+        # Когда данные последний раз менялись (Unix time), для ответов с реплик
+        self.changed_at = 0.0
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+
+    def invalidate(self, *_):
+        self.version += 1
+        self.changed_at = time.time()
+        self._entries.clear()
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(
+        self,
+        key: Hashable,
+        version: int,
+        body: bytes,
+        headers: Optional[dict[str, str]] = None,
+        fresh_as_of: float = math.inf,
+    ) -> CachedResponse:
+        """Сохранение ответа, прочитанного при версии version. Если за время запроса
+        данные изменились или ответ прочитан с реплики, ещё не видевшей последнего
+        изменения (fresh_as_of раньше changed_at), ответ отдаётся, но не кэшируется."""
+        entry = CachedResponse(body, headers or {})
+        if version == self.version and fresh_as_of >= self.changed_at:
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def attach(self, listener: NotificationListener, channel: str):
+        listener.subscribe(channel, self.invalidate)
+        listener.on_connect(self._on_connect)
+
+    async def _on_connect(self):
+        self.invalidate()
@@ -0,0 +1,25 @@
+from typing import Iterable, Sequence
+
+import orjson
+from pydantic import BaseModel
+
+
+def response_fields(model: type[BaseModel]) -> tuple[str, ...]:
+    """Поля схемы ответа в порядке сериализации pydantic."""
+    return tuple(model.model_fields)
+
+
+def rows_to_json(rows: Iterable[Sequence], fields: Sequence[str]) -> bytes:
+    """JSON-массив объектов прямо из строк Core-запроса.
+
+    Списочные эндпоинты не создают ORM-объекты и не валидируют их заново через
+    схему ответа: строки уже получены из базы в нужных типах. Колонки запроса
+    идут в порядке fields, а OPT_UTC_Z пишет UTC как "Z", поэтому тело байт
+    в байт совпадает с сериализацией через pydantic-модель.
+    """
+    return orjson.dumps([dict(zip(fields, row)) for row in rows], option=orjson.OPT_UTC_Z)
+
+
+def rows_to_ndjson(rows: Iterable[Sequence], fields: Sequence[str]) -> bytes:
+    """Строки в NDJSON: по объекту на строку, время в ISO 8601 со смещением."""
+    return b"".join(orjson.dumps(dict(zip(fields, row))) + b"\n" for row in rows)
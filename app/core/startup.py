@@ -0,0 +1,187 @@
+import logging
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Optional
+
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from app.core.metrics import GaugeCallback
+from app.database import Base
+from app.services import reservation_service, table_service
+from app.services.partitions import create_partition, future_months
+
+logger = logging.getLogger(__name__)
+
+# Модуль импортируется вместе с приложением, то есть почти сразу после старта процесса
+PROCESS_STARTED = time.monotonic()
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+CURRENT_REVISION = sa.text("SELECT version_num FROM alembic_version")
+
+# Миграции применяет один воркер, остальные ждут на блокировке и видят новую ревизию
+MIGRATION_LOCK = sa.text("SELECT pg_advisory_xact_lock(hashtext('alembic_migrations'))")
+
+# Пути проб не считаются первым обслуженным запросом
+PROBE_PREFIX = "/health"
+
+
+class SchemaMode(str, Enum):
+    # Отказаться стартовать, если схема отстаёт от миграций
+    check = "check"
+    # Применить недостающие миграции под advisory-блокировкой
+    migrate = "migrate"
+
+
+class SchemaOutdated(RuntimeError):
+    pass
+
+
+def alembic_config() -> Config:
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    return config
+
+
+def head_revision(config: Optional[Config] = None) -> str:
+    """Последняя ревизия по файлам миграций, без обращения к базе."""
+    return ScriptDirectory.from_config(config or alembic_config()).get_current_head()
+
+
+async def current_revision(conn: AsyncConnection, savepoint: bool = False) -> Optional[str]:
+    """Ревизия схемы одним запросом; None — база ещё не под управлением Alembic.
+    С savepoint=True ошибка не обрывает уже открытую транзакцию conn."""
+    try:
+        if savepoint:
+            async with conn.begin_nested():
+                return (await conn.execute(CURRENT_REVISION)).scalar()
+        return (await conn.execute(CURRENT_REVISION)).scalar()
+    # Отсутствующую таблицу Postgres считает ошибкой запроса, SQLite — ошибкой базы
+    except (ProgrammingError, OperationalError):
+        if not savepoint:
+            await conn.rollback()
+        return None
+
+
+async def stamp_head(conn: AsyncConnection):
+    """Отметка схемы, созданной через create_all, как актуальной (бенчмарки, тесты)."""
+    await conn.execute(sa.text(
+        "CREATE TABLE IF NOT EXISTS alembic_version ("
+        "version_num varchar(32) NOT NULL CONSTRAINT alembic_version_pkc PRIMARY KEY)"
+    ))
+    await conn.execute(sa.text("DELETE FROM alembic_version"))
+    await conn.execute(sa.text("INSERT INTO alembic_version (version_num) VALUES (:head)"), {"head": head_revision()})
+
+
+def _upgrade(sync_conn, config: Config):
+    # env.py возьмёт готовое соединение вместо собственного движка
+    config.attributes["connection"] = sync_conn
+    command.upgrade(config, "head")
+
+
+async def ensure_schema(engine: AsyncEngine, mode: SchemaMode, partitions_ahead_months: int = 0) -> str:
+    """Проверка ревизии схемы перед стартом. В режиме check отстающая схема —
+    ошибка запуска, в режиме migrate миграции применяются один раз на все воркеры,
+    и тот же воркер под той же блокировкой создаёт партиции броней на
+    partitions_ahead_months месяцев вперёд. Дальше партиции ведёт
+    команда обслуживания (python -m app.maintenance partitions)."""
+    config = alembic_config()
+    head = head_revision(config)
+    async with engine.connect() as conn:
+        current = await current_revision(conn)
+        if current == head:
+            logger.info("Схема актуальна: ревизия %s", head)
+            return head
+        if mode == SchemaMode.check:
+            raise SchemaOutdated(
+                f"Schema revision {current} is behind {head}: run 'alembic upgrade head' "
+                "or start with DB_SCHEMA_MODE=migrate"
+            )
+
+        await conn.rollback()
+        if engine.dialect.name == "sqlite":
+            # Миграции Alembic написаны для Postgres; локальная база на SQLite
+            # создаётся по моделям и сразу отмечается актуальной
+            logger.warning("Создание схемы SQLite по моделям: %s -> %s", current, head)
+            await conn.run_sync(Base.metadata.create_all)
+            await stamp_head(conn)
+            await conn.commit()
+            return head
+        await conn.execute(MIGRATION_LOCK)
+        # Пока ждали блокировку, миграции мог применить другой воркер
+        current = await current_revision(conn, savepoint=True)
+        if current != head:
+            logger.warning("Применение миграций: %s -> %s", current, head)
+            await conn.run_sync(_upgrade, config)
+            for month in future_months(partitions_ahead_months):
+                await create_partition(conn, month)
+        await conn.commit()
+    logger.info("Схема актуальна: ревизия %s", head)
+    return head
+
+
+async def warm_statements(conn: AsyncConnection):
+    """Прогон запросов горячего пути на соединении пула: SQLAlchemy кладёт их
+    в кэш компиляции, asyncpg — в кэш prepared statements этого соединения.
+    Пишущие запросы адресованы несуществующим строкам и откатываются вместе
+    с транзакцией соединения."""
+    session = AsyncSession(bind=conn)
+    await table_service.get(session)
+    await reservation_service.warm_up(session)
+
+
+class Readiness:
+    """Состояние запуска процесса для проб и метрик."""
+
+    def __init__(self):
+        self.ready = False
+        self.revision: Optional[str] = None
+        self.startup_seconds: Optional[float] = None
+        self.first_request_seconds: Optional[float] = None
+
+    def mark_ready(self, revision: Optional[str] = None):
+        self.ready = True
+        self.revision = revision
+        self.startup_seconds = time.monotonic() - PROCESS_STARTED
+        logger.info("Готов принимать запросы через %.3f с после старта процесса", self.startup_seconds)
+
+    def mark_stopping(self):
+        self.ready = False
+
+    def record_request(self):
+        if self.first_request_seconds is None:
+            self.first_request_seconds = time.monotonic() - PROCESS_STARTED
+            logger.info("Первый запрос обслужен через %.3f с после старта процесса", self.first_request_seconds)
+
+
+readiness = Readiness()
+
+GaugeCallback("app_startup_seconds", "Time from process start to readiness", lambda: readiness.startup_seconds)
+GaugeCallback(
+    "app_first_request_seconds",
+    "Time from process start to the first served request, probes excluded",
+    lambda: readiness.first_request_seconds,
+)
+
+
+class FirstRequestMiddleware:
+    """ASGI-middleware: фиксирует время до первого обслуженного запроса.
+    После него остаётся одна проверка атрибута на запрос."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+        if (
+            readiness.first_request_seconds is None
+            and scope["type"] == "http"
+            and not scope["path"].startswith(PROBE_PREFIX)
+        ):
+            readiness.record_request()
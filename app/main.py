@@ -3,12 +3,22 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 import logging
 
-from app.database import engine
-from app.models import Base
-from app.routers import tables, reservations
+from app.database import engine, settings, warm_up_pool
+from app.routers import tables, reservations, monitoring, analytics, health
+from app.core.admission import AdmissionMiddleware, admission_controller
+from app.core.logger import RequestIdMiddleware, setup_logging, stop_logging
+from app.core.metrics import MetricsMiddleware, instrument_engine, instrument_pool
+from app.core.notifications import notification_listener
+from app.core.profiling import ProfilingMiddleware, query_profiler
+from app.core.replicas import ReadYourWritesMiddleware, replica_router
+from app.core.startup import FirstRequestMiddleware, SchemaMode, ensure_schema, readiness, warm_statements
+from app.models.reservation import RESERVATION_CHANGES_CHANNEL
+from app.models.table import TABLE_CHANGES_CHANNEL
+from app.services.availability_index import availability_index
+from app.services.reservation_stream import reservation_stream
+from app.services.reservation_service import reservations_cache
+from app.services.table_service import tables_cache
 
-# Настройка логгера
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -16,16 +26,79 @@ logger = logging.getLogger(__name__)
 # Lifespan-событие для управления жизненным циклом приложения
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("🔧 Инициализация базы данных...")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Логи пишет отдельный поток, event loop только кладёт записи в очередь
+    setup_logging(settings.LOG_LEVEL, settings.LOG_JSON, settings.LOG_RATE_LIMIT_PER_SECOND, settings.LOG_QUEUE_SIZE)
+    logger.info("🔧 Проверка схемы базы данных...")
+    # Схемой управляет Alembic: одна проверка ревизии вместо create_all в каждом воркере.
+    # Партиции ближайших месяцев создаёт тот воркер, что применил миграции, а не каждый
+    revision = await ensure_schema(
+        engine, SchemaMode(settings.DB_SCHEMA_MODE), settings.RESERVATION_PARTITIONS_AHEAD_MONTHS
+    )
+    # Локальный экземпляр на SQLite (один процесс на точке) обходится без партиций,
+    # реплик и LISTEN/NOTIFY: кэши сбрасывает сам воркер, который пишет
+    postgres = engine.dialect.name == "postgresql"
+    await warm_up_pool(engine, settings.DB_POOL_WARMUP, prepare=warm_statements if postgres else None)
     logger.info("✅ База данных готова.")
-    yield
-    logger.info("🛑 Завершение работы приложения.")
+    if postgres:
+        # Реплики для чтения, если заданы: первая проверка отставания до приёма запросов
+        await replica_router.start()
+        # Одно LISTEN-соединение на воркер держит кэши и индекс согласованными
+        tables_cache.attach(notification_listener, TABLE_CHANGES_CHANNEL)
+        reservations_cache.attach(notification_listener, RESERVATION_CHANGES_CHANNEL)
+        # Оно же питает /reservations/stream
+        reservation_stream.attach(notification_listener, engine)
+        if settings.AVAILABILITY_INDEX_ENABLED:
+            availability_index.attach(notification_listener, engine)
+        notification_listener.start(engine)
+    readiness.mark_ready(revision)
+    try:
+        yield
+    finally:
+        # Сюда uvicorn приходит после завершения начатых запросов (или по
+        # истечении timeout_graceful_shutdown): пул закрывается в любом случае,
+        # чтобы соединения не оставались висеть на сервере после деплоя
+        readiness.mark_stopping()
+        await notification_listener.stop()
+        await availability_index.stop()
+        await replica_router.stop()
+        await engine.dispose()
+        logger.info("🛑 Завершение работы приложения.")
+        stop_logging()
 
 # Инициализация FastAPI-приложения
 app = FastAPI(title="Table Reservation API", lifespan=lifespan)
 
+# Запросы сверх лимитов, посчитанных от пула, сразу получают 503, а не ждут соединение
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware, controller=admission_controller, retry_after_seconds=settings.ADMISSION_RETRY_AFTER_SECONDS
+    )
+# Время последней записи клиента для чтения с реплик без отставания от неё
+if replica_router.replicas:
+    app.add_middleware(
+        ReadYourWritesMiddleware, max_age_seconds=settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_CHECK_INTERVAL
+    )
+# Метрики: латентность по маршрутам, время SQL-запросов и состояние пула
+app.add_middleware(MetricsMiddleware)
+# Число SQL-выражений и время в базе для каждого запроса; выключенное профилирование ничего не стоит
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, profiler=query_profiler)
+# Время от старта процесса до первого обслуженного запроса
+app.add_middleware(FirstRequestMiddleware)
+# Request id в каждой записи лога и в заголовке X-Request-ID ответа
+app.add_middleware(RequestIdMiddleware)
+instrument_engine(engine)
+instrument_pool(engine)
+for replica in replica_router.replicas:
+    instrument_engine(replica.engine)
+if settings.PROFILING_ENABLED:
+    for profiled_engine in (engine, *(replica.engine for replica in replica_router.replicas)):
+        query_profiler.instrument(profiled_engine)
+
 # Подключение маршрутов
+app.include_router(health.router, prefix="/health", tags=["Health"])
 app.include_router(tables.router, prefix="/tables", tags=["Tables"])
 app.include_router(reservations.router, prefix="/reservations", tags=["Reservations"])
+app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(monitoring.router, prefix="/monitoring", tags=["Monitoring"])
+app.include_router(monitoring.metrics_router)
@@ -0,0 +1,75 @@
+"""Служебные команды.
+
+    python -m app.maintenance partitions [--ahead N] [--retention N] [--mode detach|drop]
+    python -m app.maintenance usage
+    python -m app.maintenance idempotency
+
+partitions создаёт месячные партиции броней на ahead месяцев вперёд, раскладывает
+по месяцам брони из партиции по умолчанию и выводит из таблицы партиции старше
+retention месяцев. Предназначена для запуска по расписанию (cron).
+
+usage пересчитывает агрегаты занятости для /analytics с нуля, например после
+заливки с отключённым триггером. История отсоединённых партиций при этом теряется.
+
+idempotency удаляет ключи идемпотентности, срок хранения которых истёк.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+
+from app.database import engine, settings
+from app.services.analytics_service import analytics_service
+from app.services.idempotency_service import idempotency_service
+from app.services.partitions import RetentionMode, maintain_partitions
+
+
+async def _partitions(args) -> dict:
+    try:
+        return await maintain_partitions(engine, args.ahead, args.retention, args.mode, args.archive_schema)
+    finally:
+        await engine.dispose()
+
+
+async def _usage(args) -> dict:
+    try:
+        async with engine.begin() as conn:
+            await analytics_service.rebuild(conn)
+        return {"rebuilt": ["reservation_usage_hourly", "reservation_usage_daily"]}
+    finally:
+        await engine.dispose()
+
+
+async def _idempotency(args) -> dict:
+    try:
+        async with engine.begin() as conn:
+            return {"deleted": await idempotency_service.purge_expired(conn)}
+    finally:
+        await engine.dispose()
+
+
+COMMANDS = {"partitions": _partitions, "usage": _usage, "idempotency": _idempotency}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    partitions = commands.add_parser("partitions", help="обслуживание месячных партиций броней")
+    partitions.add_argument("--ahead", type=int, default=settings.RESERVATION_PARTITIONS_AHEAD_MONTHS)
+    partitions.add_argument("--retention", type=int, default=settings.RESERVATION_RETENTION_MONTHS)
+    partitions.add_argument("--mode", type=RetentionMode, choices=list(RetentionMode), default=RetentionMode(settings.RESERVATION_RETENTION_MODE))
+    partitions.add_argument("--archive-schema", default=settings.RESERVATION_ARCHIVE_SCHEMA)
+
+    commands.add_parser("usage", help="пересчёт агрегатов занятости")
+    commands.add_parser("idempotency", help="удаление просроченных ключей идемпотентности")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+    print(json.dumps(asyncio.run(COMMANDS[args.command](args)), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
 from .table import Table
 from .reservation import Reservation
+from .analytics import ReservationUsageHourly, ReservationUsageDaily
+from .idempotency import IdempotencyKey
 from app.database import Base
\ No newline at end of file
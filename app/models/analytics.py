@@ -0,0 +1,103 @@
+from sqlalchemy import Integer, Date, DDL, Index, event
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import date, datetime
+from app.core.dialects import UTCDateTime
+from app.database import Base
+from app.models.reservation import Reservation
+
+# Агрегаты занятости столов для отчётов (см. app/services/analytics_service.py).
+# Их поддерживает триггер на reservations: каждая вставка, изменение и удаление
+# брони раскладывает её интервал по часам и суткам (UTC) и прибавляет или
+# вычитает занятые секунды. Бронь учитывается в reservations того часа и суток,
+# на которые приходится её начало. Отсоединение партиций триггеры не вызывает,
+# поэтому история в агрегатах переживает срок хранения броней.
+RESERVATION_USAGE_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION apply_reservation_usage(usage_table_id integer, usage_period tstzrange, sign integer)
+RETURNS void LANGUAGE plpgsql AS $$
+DECLARE
+    first_hour timestamptz := date_trunc('hour', lower(usage_period) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+    first_day timestamptz := date_trunc('day', lower(usage_period) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+BEGIN
+    INSERT INTO reservation_usage_hourly AS usage (table_id, hour, booked_seconds, reservations)
+    SELECT usage_table_id, bucket,
+           sign * extract(epoch FROM upper(slice) - lower(slice))::integer,
+           sign * (bucket = first_hour)::integer
+    FROM generate_series(first_hour, upper(usage_period) - interval '1 microsecond', interval '1 hour') AS bucket,
+         LATERAL (SELECT usage_period * tstzrange(bucket, bucket + interval '1 hour')) AS part(slice)
+    ORDER BY bucket
+    ON CONFLICT (table_id, hour) DO UPDATE SET
+        booked_seconds = usage.booked_seconds + EXCLUDED.booked_seconds,
+        reservations = usage.reservations + EXCLUDED.reservations;
+
+    -- Сутки отсчитываются интервалом в 24 часа: '1 day' зависит от часового пояса сессии
+    INSERT INTO reservation_usage_daily AS usage (table_id, day, booked_seconds, reservations)
+    SELECT usage_table_id, (bucket AT TIME ZONE 'UTC')::date,
+           sign * extract(epoch FROM upper(slice) - lower(slice))::integer,
+           sign * (bucket = first_day)::integer
+    FROM generate_series(first_day, upper(usage_period) - interval '1 microsecond', interval '24 hours') AS bucket,
+         LATERAL (SELECT usage_period * tstzrange(bucket, bucket + interval '24 hours')) AS part(slice)
+    ORDER BY bucket
+    ON CONFLICT (table_id, day) DO UPDATE SET
+        booked_seconds = usage.booked_seconds + EXCLUDED.booked_seconds,
+        reservations = usage.reservations + EXCLUDED.reservations;
+
+    IF sign < 0 THEN
+        DELETE FROM reservation_usage_hourly
+        WHERE table_id = usage_table_id AND hour >= first_hour AND hour < upper(usage_period)
+          AND booked_seconds = 0 AND reservations = 0;
+        DELETE FROM reservation_usage_daily
+        WHERE table_id = usage_table_id AND day >= (first_day AT TIME ZONE 'UTC')::date
+          AND day <= (upper(usage_period) AT TIME ZONE 'UTC')::date
+          AND booked_seconds = 0 AND reservations = 0;
+    END IF;
+END $$
+""")
+RESERVATION_USAGE_TRIGGER_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION track_reservation_usage() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_reservation_usage(OLD.table_id, OLD.period, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_reservation_usage(NEW.table_id, NEW.period, 1);
+    END IF;
+    RETURN NULL;
+END $$
+""")
+RESERVATION_USAGE_TRIGGER = DDL("""
+CREATE TRIGGER reservations_usage AFTER INSERT OR UPDATE OR DELETE ON reservations
+    FOR EACH ROW EXECUTE FUNCTION track_reservation_usage()
+""")
+
+
+class ReservationUsageHourly(Base):
+    __tablename__ = "reservation_usage_hourly"
+    __table_args__ = (
+        # Отчёты выбирают диапазон часов по всем столам
+        Index("ix_reservation_usage_hourly_hour", "hour"),
+    )
+
+    # Без внешнего ключа: строки удалённого стола триггер обнуляет и удаляет сам
+    table_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    hour: Mapped[datetime] = mapped_column(UTCDateTime, primary_key=True)
+    booked_seconds: Mapped[int] = mapped_column(Integer, nullable=False)
+    reservations: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class ReservationUsageDaily(Base):
+    __tablename__ = "reservation_usage_daily"
+    __table_args__ = (
+        Index("ix_reservation_usage_daily_day", "day"),
+    )
+
+    table_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    booked_seconds: Mapped[int] = mapped_column(Integer, nullable=False)
+    reservations: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+# Функции plpgsql связываются с таблицами при вызове, поэтому порядок
+# создания таблиц агрегатов и reservations не важен
+event.listen(Reservation.__table__, "after_create", RESERVATION_USAGE_FUNCTION.execute_if(dialect="postgresql"))
+event.listen(Reservation.__table__, "after_create", RESERVATION_USAGE_TRIGGER_FUNCTION.execute_if(dialect="postgresql"))
+event.listen(Reservation.__table__, "after_create", RESERVATION_USAGE_TRIGGER.execute_if(dialect="postgresql"))
@@ -0,0 +1,29 @@
+from sqlalchemy import Integer, String, LargeBinary, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from typing import Optional
+from app.core.dialects import UTCDateTime
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """Первый ответ на POST с заголовком Idempotency-Key (app/services/idempotency_service.py).
+
+    Строка без status_code — запрос ещё выполняется: её держит воркер,
+    захвативший ключ, до locked_until. После expires_at ключ можно использовать заново.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        # Удаление просроченных ключей (python -m app.maintenance idempotency)
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    # Эндпоинт, например "POST /reservations/": один ключ можно прислать на разные ресурсы
+    scope: Mapped[str] = mapped_column(String(64), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # Хэш тела запроса: тот же ключ с другим телом — ошибка клиента
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    body: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    locked_until: Mapped[datetime] = mapped_column(UTCDateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(UTCDateTime, nullable=False)
@@ -1,17 +1,240 @@
-from sqlalchemy import Integer, String, DateTime, ForeignKey
+import sqlalchemy as sa
+from sqlalchemy import Integer, String, ForeignKey, Computed, CheckConstraint, DDL, Index, PrimaryKeyConstraint, Sequence, event
+from sqlalchemy.dialects.postgresql import TSTZRANGE, Range
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.schema import CreateColumn
 from datetime import datetime
+from app.core.dialects import UTCDateTime, add_minutes, as_timestamp, sqlite_add_minutes
 from app.database import Base
 
+# Имя exclusion-ограничения, запрещающего пересечение броней одного стола.
+# Таблица секционирована по месяцам reservation_time, и ограничение создаётся
+# в каждой партиции (с суффиксом); пересечения между соседними партициями
+# ловит триггер reservations_cross_partition под этим же именем
+RESERVATION_OVERLAP_CONSTRAINT = "reservations_no_overlap"
+
+# Партиция для броней вне созданных месячных партиций
+RESERVATION_DEFAULT_PARTITION = "reservations_default"
+
+# Предельная длительность брони. Благодаря ей бронь может пересечься только
+# с бронями, начавшимися не раньше чем за MAX_DURATION_MINUTES до неё, и
+# запросы на пересечение затрагивают одну-две месячные партиции
+MAX_DURATION_MINUTES = 24 * 60
+
+# Канал NOTIFY об изменениях броней (см. app/services/availability_index.py
+# и app/services/reservation_stream.py)
+RESERVATION_CHANGES_CHANNEL = "reservation_changes"
+
+# Сквозной номер события для /reservations/stream: одинаков во всех воркерах,
+# поэтому клиент может продолжить поток с последнего события в любом из них
+RESERVATION_EVENT_SEQUENCE = Sequence("reservation_event_seq", metadata=Base.metadata)
+
+# Изменение брони рассылается как удаление старой строки и вставка новой
+RESERVATION_CHANGES_FUNCTION = DDL(f"""
+CREATE OR REPLACE FUNCTION notify_reservation_change() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('{RESERVATION_CHANGES_CHANNEL}', json_build_object(
+            'op', 'DELETE',
+            'event_id', nextval('{RESERVATION_EVENT_SEQUENCE.name}'),
+            'id', OLD.id,
+            'table_id', OLD.table_id
+        )::text);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('{RESERVATION_CHANGES_CHANNEL}', json_build_object(
+            'op', 'INSERT',
+            'event_id', nextval('{RESERVATION_EVENT_SEQUENCE.name}'),
+            'id', NEW.id,
+            'table_id', NEW.table_id,
+            'reservation_time', NEW.reservation_time,
+            'duration_minutes', NEW.duration_minutes
+        )::text);
+    END IF;
+    RETURN NULL;
+END $$
+""")
+RESERVATION_CHANGES_TRIGGER = DDL("""
+CREATE TRIGGER reservations_notify AFTER INSERT OR UPDATE OR DELETE ON reservations
+    FOR EACH ROW EXECUTE FUNCTION notify_reservation_change()
+""")
+
+def partition_overlap_constraint(partition: str) -> str:
+    return (
+        f"ALTER TABLE {partition} ADD CONSTRAINT {partition}_no_overlap "
+        "EXCLUDE USING gist (table_id WITH =, period WITH &&)"
+    )
+
+
+RESERVATION_DEFAULT_PARTITION_DDL = DDL(
+    f"CREATE TABLE {RESERVATION_DEFAULT_PARTITION} PARTITION OF reservations DEFAULT"
+)
+RESERVATION_DEFAULT_PARTITION_OVERLAP = DDL(partition_overlap_constraint(RESERVATION_DEFAULT_PARTITION))
+
+# Брони, чей месяц отличается, лежат в разных партициях, и exclusion-ограничение
+# их не сравнивает. Пересечься они могут только у границы месяца: бронь переходит
+# через границу или начинается меньше чем через MAX_DURATION_MINUTES после неё.
+# Такие вставки сериализуются блокировкой стола и сверяются с соседними месяцами
+RESERVATION_CROSS_PARTITION_FUNCTION = DDL(f"""
+CREATE OR REPLACE FUNCTION check_reservation_cross_partition() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    month_start timestamptz := date_trunc('month', NEW.reservation_time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+    next_month timestamptz := month_start + interval '1 month';
+    new_period tstzrange := reservation_period(NEW.reservation_time, NEW.duration_minutes);
+BEGIN
+    IF NEW.reservation_time < month_start + make_interval(mins => {MAX_DURATION_MINUTES})
+            OR upper(new_period) > next_month THEN
+        PERFORM pg_advisory_xact_lock(hashtext('reservations'), NEW.table_id);
+        IF EXISTS (
+            SELECT 1 FROM reservations
+            WHERE table_id = NEW.table_id
+              AND id <> NEW.id
+              AND period && new_period
+              AND reservation_time > NEW.reservation_time - make_interval(mins => {MAX_DURATION_MINUTES})
+              AND reservation_time < upper(new_period)
+              AND (reservation_time < month_start OR reservation_time >= next_month)
+        ) THEN
+            RAISE EXCEPTION USING
+                ERRCODE = 'exclusion_violation',
+                CONSTRAINT = '{RESERVATION_OVERLAP_CONSTRAINT}',
+                MESSAGE = 'reservation overlaps an existing one for table ' || NEW.table_id;
+        END IF;
+    END IF;
+    RETURN NEW;
+END $$
+""")
+RESERVATION_CROSS_PARTITION_TRIGGER = DDL("""
+CREATE TRIGGER reservations_cross_partition BEFORE INSERT OR UPDATE ON reservations
+    FOR EACH ROW EXECUTE FUNCTION check_reservation_cross_partition()
+""")
+
+# В Postgres сложение timestamptz + interval помечено как STABLE, а сгенерированная
+# колонка требует IMMUTABLE-выражение. Интервал в минутах не зависит от часового
+# пояса, поэтому обёртка действительно неизменяема.
+RESERVATION_PERIOD_FUNCTION = DDL(
+    "CREATE OR REPLACE FUNCTION reservation_period(start timestamptz, minutes integer) "
+    "RETURNS tstzrange LANGUAGE sql IMMUTABLE PARALLEL SAFE AS "
+    "$$ SELECT tstzrange(start, start + make_interval(mins => minutes)) $$"
+)
+
 
 class Reservation(Base):
     __tablename__ = "reservations"
+    __table_args__ = (
+        CheckConstraint(
+            f"duration_minutes > 0 AND duration_minutes <= {MAX_DURATION_MINUTES}", name="reservations_duration_range"
+        ),
+        # Keyset-пагинация по (reservation_time, id), в том числе внутри одного стола
+        Index("ix_reservations_time_id", "reservation_time", "id"),
+        Index("ix_reservations_table_time_id", "table_id", "reservation_time", "id"),
+        # Месячные партиции создаёт app/services/partitions.py
+        {"postgresql_partition_by": "RANGE (reservation_time)"},
+    )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    # Первичный ключ партиционированной таблицы обязан включать ключ секционирования;
+    # id по-прежнему уникален благодаря последовательности
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True, index=True)
     customer_name: Mapped[str] = mapped_column(String, nullable=False)
     table_id: Mapped[int] = mapped_column(ForeignKey("tables.id", ondelete="CASCADE"))
-    reservation_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    reservation_time: Mapped[datetime] = mapped_column(UTCDateTime, primary_key=True)
     duration_minutes: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Полуинтервал [начало, конец) брони, вычисляется базой. Есть только в Postgres
+    # (там по нему строится exclusion-ограничение), поэтому не загружается с объектом;
+    # запросы обращаются к нему через overlaps_reservation
+    period: Mapped[Range[datetime]] = mapped_column(
+        TSTZRANGE, Computed("reservation_period(reservation_time, duration_minutes)", persisted=True), deferred=True
+    )
 
     table = relationship("Table", back_populates="reservations")
 
+
+# Конец брони: начало плюс длительность
+RESERVATION_END = add_minutes(Reservation.reservation_time, Reservation.duration_minutes)
+
+
+class overlaps_reservation(FunctionElement):
+    """Пересекается ли бронь из reservations с полуинтервалом [start, end)."""
+    type = sa.Boolean()
+    name = "overlaps_reservation"
+    inherit_cache = True
+
+    def __init__(self, start, end):
+        super().__init__(as_timestamp(start), as_timestamp(end))
+
+
+@compiles(overlaps_reservation, "postgresql")
+def _overlaps_reservation_postgresql(element, compiler, **kw):
+    # Через колонку period и тот же оператор, что в exclusion-ограничении:
+    # проверки в коде и база не могут разойтись в понимании пересечения,
+    # а поиск идёт по GiST-индексу ограничения
+    start, end = element.clauses
+    return compiler.process(Reservation.period.overlaps(sa.func.tstzrange(start, end, type_=TSTZRANGE)), **kw)
+
+
+@compiles(overlaps_reservation)
+def _overlaps_reservation_default(element, compiler, **kw):
+    start, end = element.clauses
+    return compiler.process(sa.and_(Reservation.reservation_time < end, RESERVATION_END > start), **kw)
+
+
+# --- SQLite: локальный экземпляр на точке и тесты без сервера Postgres
+
+# Партиций и диапазонных типов в SQLite нет: колонки period у таблицы нет,
+# а первичным ключом служит один id — так он становится псевдонимом rowid
+# и получает значения автоматически
+@compiles(CreateColumn, "sqlite")
+def _create_column_sqlite(element, compiler, **kw):
+    if element.element is Reservation.__table__.c.period:
+        return None
+    if element.element is Reservation.__table__.c.id:
+        # Без AUTOINCREMENT, которое SQLite не допускает у составного ключа модели
+        return "id INTEGER NOT NULL"
+    return compiler.visit_create_column(element, **kw)
+
+
+@compiles(PrimaryKeyConstraint, "sqlite")
+def _primary_key_sqlite(constraint, compiler, **kw):
+    if constraint.table is Reservation.__table__:
+        return "PRIMARY KEY (id)"
+    return compiler.visit_primary_key_constraint(constraint, **kw)
+
+
+# Пересечения вместо exclusion-ограничения проверяет триггер. Писатель в SQLite
+# один, поэтому проверка и вставка не могут разойтись, как в Postgres без ограничения.
+# Знаки % удвоены: DDL подставляет в текст контекст через %
+_SQLITE_OVERLAP_CONDITION = f"""
+    EXISTS (
+        SELECT 1 FROM reservations
+        WHERE table_id = NEW.table_id
+          AND id IS NOT NEW.id
+          AND reservation_time < {sqlite_add_minutes("NEW.reservation_time", "NEW.duration_minutes")}
+          AND {sqlite_add_minutes("reservation_time", "duration_minutes")} > NEW.reservation_time
+    )""".replace("%", "%%")
+RESERVATION_OVERLAP_TRIGGERS_SQLITE = [
+    DDL(f"""
+CREATE TRIGGER {RESERVATION_OVERLAP_CONSTRAINT}_{operation.split()[0].lower()} BEFORE {operation} ON reservations
+    FOR EACH ROW WHEN {_SQLITE_OVERLAP_CONDITION}
+BEGIN
+    SELECT RAISE(ABORT, '{RESERVATION_OVERLAP_CONSTRAINT}');
+END
+""")
+    for operation in ("INSERT", "UPDATE OF table_id, reservation_time, duration_minutes")
+]
+
+
+# btree_gist нужен для оператора "=" по table_id внутри GiST-ограничения
+for ddl in (DDL("CREATE EXTENSION IF NOT EXISTS btree_gist"), RESERVATION_PERIOD_FUNCTION):
+    event.listen(Reservation.__table__, "before_create", ddl.execute_if(dialect="postgresql"))
+for ddl in (
+    RESERVATION_DEFAULT_PARTITION_DDL,
+    RESERVATION_DEFAULT_PARTITION_OVERLAP,
+    RESERVATION_CROSS_PARTITION_FUNCTION,
+    RESERVATION_CROSS_PARTITION_TRIGGER,
+    RESERVATION_CHANGES_FUNCTION,
+    RESERVATION_CHANGES_TRIGGER,
+):
+    event.listen(Reservation.__table__, "after_create", ddl.execute_if(dialect="postgresql"))
+for ddl in RESERVATION_OVERLAP_TRIGGERS_SQLITE:
+    event.listen(Reservation.__table__, "after_create", ddl.execute_if(dialect="sqlite"))
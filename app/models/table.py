@@ -1,11 +1,40 @@
-from sqlalchemy import Integer, String
+from sqlalchemy import Integer, String, Index, DDL, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import List
 from app.database import Base
 
+# Канал NOTIFY об изменениях столов (см. app/services/availability_index.py)
+TABLE_CHANGES_CHANNEL = "table_changes"
+
+TABLE_CHANGES_FUNCTION = DDL(f"""
+CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    -- Изменение полей стола без смены id: стол остаётся, меняются зал и каталог
+    IF TG_OP = 'UPDATE' AND NEW.id = OLD.id THEN
+        PERFORM pg_notify('{TABLE_CHANGES_CHANNEL}', json_build_object('op', 'UPDATE', 'id', NEW.id, 'location', NEW.location)::text);
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('{TABLE_CHANGES_CHANNEL}', json_build_object('op', 'DELETE', 'id', OLD.id)::text);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('{TABLE_CHANGES_CHANNEL}', json_build_object('op', 'INSERT', 'id', NEW.id, 'location', NEW.location)::text);
+    END IF;
+    RETURN NULL;
+END $$
+""")
+TABLE_CHANGES_TRIGGER = DDL("""
+CREATE TRIGGER tables_notify AFTER INSERT OR UPDATE OR DELETE ON tables
+    FOR EACH ROW EXECUTE FUNCTION notify_table_change()
+""")
+
 
 class Table(Base):
     __tablename__ = "tables"
+    __table_args__ = (
+        # Фильтр по залу с keyset-пагинацией по id; seats в INCLUDE для min_seats
+        Index("ix_tables_location_id", "location", "id", postgresql_include=["seats"]),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
@@ -15,3 +44,7 @@ class Table(Base):
     reservations: Mapped[List["Reservation"]] = relationship(
         back_populates="table", cascade="all, delete-orphan"
     )
+
+
+event.listen(Table.__table__, "after_create", TABLE_CHANGES_FUNCTION.execute_if(dialect="postgresql"))
+event.listen(Table.__table__, "after_create", TABLE_CHANGES_TRIGGER.execute_if(dialect="postgresql"))
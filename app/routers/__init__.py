@@ -1,7 +1,13 @@
 from fastapi import APIRouter
+from app.routers.health import router as health_router
 from app.routers.tables import router as tables_router
 from app.routers.reservations import router as reservations_router
+from app.routers.analytics import router as analytics_router
+from app.routers.monitoring import router as monitoring_router
 
 router = APIRouter()
+router.include_router(health_router, prefix="/health", tags=["Health"])
 router.include_router(tables_router, prefix="/tables", tags=["Tables"])
 router.include_router(reservations_router, prefix="/reservations", tags=["Reservations"])
+router.include_router(analytics_router, prefix="/analytics", tags=["Analytics"])
+router.include_router(monitoring_router, prefix="/monitoring", tags=["Monitoring"])
@@ -0,0 +1,50 @@
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.replicas import get_read_session
+from app.schemas import DayUsage, HourUsage, LocationUsage, TableUsage
+from app.services import analytics_service
+
+router = APIRouter()
+
+@router.get("/tables", response_model=list[TableUsage])
+async def get_table_usage(
+    date_from: date,
+    date_to: date,
+    location: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+):
+    return await analytics_service.get_tables(db, date_from=date_from, date_to=date_to, location=location)
+
+@router.get("/locations", response_model=list[LocationUsage])
+async def get_location_usage(
+    date_from: date,
+    date_to: date,
+    db: AsyncSession = Depends(get_read_session),
+):
+    return await analytics_service.get_locations(db, date_from=date_from, date_to=date_to)
+
+@router.get("/days", response_model=list[DayUsage])
+async def get_daily_usage(
+    date_from: date,
+    date_to: date,
+    location: Optional[str] = None,
+    table_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_session),
+):
+    return await analytics_service.get_days(
+        db, date_from=date_from, date_to=date_to, location=location, table_id=table_id
+    )
+
+@router.get("/hours", response_model=list[HourUsage])
+async def get_hourly_usage(
+    date_from: date,
+    date_to: date,
+    location: Optional[str] = None,
+    table_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_session),
+):
+    return await analytics_service.get_hours(
+        db, date_from=date_from, date_to=date_to, location=location, table_id=table_id
+    )
@@ -0,0 +1,37 @@
+import asyncio
+import logging
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.startup import readiness
+from app.database import get_async_session, settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.get("/live")
+async def liveness():
+    """Процесс жив и обслуживает event loop; база не проверяется."""
+    return {"status": "alive"}
+
+async def check_readiness(db: AsyncSession) -> JSONResponse:
+    if not readiness.ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    try:
+        await asyncio.wait_for(db.execute(text("SELECT 1")), settings.READINESS_TIMEOUT)
+    except Exception as exc:
+        logger.warning("Проверка готовности: база недоступна: %s", exc)
+        return JSONResponse({"status": "unavailable"}, status_code=503)
+    return JSONResponse({
+        "status": "ready",
+        "revision": readiness.revision,
+        "startup_seconds": readiness.startup_seconds,
+        "first_request_seconds": readiness.first_request_seconds,
+    })
+
+@router.get("/ready")
+async def readiness_check(db: AsyncSession = Depends(get_async_session)):
+    """Старт завершён (схема проверена, пул и запросы прогреты) и база отвечает."""
+    return await check_readiness(db)
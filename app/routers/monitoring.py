@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core import metrics
+from app.core.admission import admission_controller
+from app.core.replicas import replica_router
+from app.database import engine, pool_stats
+from app.services.availability_index import availability_index
+from app.services.reservation_stream import reservation_stream
+
+router = APIRouter()
+
+# /metrics отдаётся от корня, как ожидает Prometheus
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/pool")
+async def get_pool_stats():
+    return pool_stats(engine)
+
+@router.get("/admission")
+async def get_admission_stats():
+    return admission_controller.stats()
+
+@router.get("/replicas")
+async def get_replica_stats():
+    return replica_router.stats()
+
+@router.get("/availability-index")
+async def get_availability_index_stats():
+    return availability_index.stats()
+
+@router.get("/stream")
+async def get_stream_stats():
+    return reservation_stream.stats()
@@ -1,18 +1,117 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_async_session
-from app.schemas import ReservationCreate, ReservationResponse
-from app.services import reservation_service
+from app.core.replicas import fresh_as_of, get_read_session, get_read_session_factory
+from app.core.serialization import rows_to_json
+from app.database import get_async_session, settings
+from app.schemas import ReservationCreate, ReservationResponse, ExportFormat
+from app.schemas import BulkMode, ReservationBulkCreate, ReservationBulkResponse
+from app.services import idempotency_service, reservation_service
+from app.services.reservation_service import RESERVATION_LIST_FIELDS, reservations_cache
+from app.services.reservation_stream import PING, reservation_stream
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
+# Код закрытия WebSocket для клиента, не успевающего читать поток (Try Again Later)
+SLOW_CLIENT_CLOSE_CODE = 1013
+
 @router.get("/", response_model=list[ReservationResponse])
-async def get_reservations(db: AsyncSession = Depends(get_async_session)):
-    return await reservation_service.get(db)
+async def get_reservations(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    table_id: Optional[int] = None,
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_session),
+):
+    key = (limit, cursor, table_id, time_from, time_to)
+    cached = reservations_cache.get(key)
+    if cached is None:
+        version = reservations_cache.version
+        reservations, next_cursor = await reservation_service.get(
+            db, limit=limit, cursor=cursor, table_id=table_id, time_from=time_from, time_to=time_to
+        )
+        body = rows_to_json(reservations, RESERVATION_LIST_FIELDS)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor is not None else {}
+        cached = reservations_cache.put(key, version, body, headers, fresh_as_of(db))
+    return cached.render(request)
+
+@router.get("/export")
+async def export_reservations(
+    format: ExportFormat = ExportFormat.ndjson,
+    table_id: Optional[int] = None,
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None,
+    session_factory=Depends(get_read_session_factory),
+):
+    media_type = "text/csv" if format == ExportFormat.csv else "application/x-ndjson"
+    return StreamingResponse(
+        reservation_service.export(
+            session_factory, export_format=format, table_id=table_id, time_from=time_from, time_to=time_to
+        ),
+        media_type=media_type,
+    )
+
+@router.websocket("/stream")
+async def stream_reservations(
+    websocket: WebSocket,
+    table_id: Optional[int] = None,
+    location: Optional[str] = None,
+    last_event_id: Optional[int] = None,
+):
+    await websocket.accept()
+    subscriber = reservation_stream.subscribe(table_id, location, last_event_id)
+    try:
+        async for event in reservation_stream.listen(subscriber):
+            message = PING if event is None else event.data
+            # Клиент, который не принимает данные, не должен держать воркер бесконечно
+            await asyncio.wait_for(websocket.send_text(message), settings.STREAM_SEND_TIMEOUT)
+        await websocket.close(code=SLOW_CLIENT_CLOSE_CODE, reason="Client is too slow, reconnect with last_event_id")
+    except (WebSocketDisconnect, TimeoutError):
+        pass
+    finally:
+        reservation_stream.unsubscribe(subscriber)
+
+# Тот же поток для клиентов без WebSocket; EventSource сам передаёт Last-Event-ID при переподключении
+@router.get("/stream")
+async def stream_reservations_sse(
+    table_id: Optional[int] = None,
+    location: Optional[str] = None,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"),
+):
+    return StreamingResponse(
+        reservation_stream.sse(table_id, location, last_event_id if last_event_id is not None else last_event_id_header),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.post("/", response_model=ReservationResponse, status_code=201)
-async def create_reservation(reservation: ReservationCreate, db: AsyncSession = Depends(get_async_session)):
-    return await reservation_service.create(reservation, db)
+async def create_reservation(
+    reservation: ReservationCreate,
+    db: AsyncSession = Depends(get_async_session),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    if idempotency_key is None:
+        return await reservation_service.create(reservation, db)
+    return await idempotency_service.execute(
+        db, "POST /reservations/", idempotency_key, reservation,
+        lambda: reservation_service.create(reservation, db), ReservationResponse,
+    )
+
+@router.post("/bulk", response_model=ReservationBulkResponse, status_code=201)
+async def bulk_create_reservations(
+    bulk: ReservationBulkCreate, response: Response, db: AsyncSession = Depends(get_async_session)
+):
+    result = await reservation_service.bulk_create(bulk, db)
+    if bulk.mode == BulkMode.atomic and result.created < len(bulk.items):
+        response.status_code = 409
+    return result
 
 @router.delete("/{reservation_id}", status_code=204)
 async def delete_reservation(reservation_id: int, db: AsyncSession = Depends(get_async_session)):
@@ -1,22 +1,105 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date, datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.replicas import fresh_as_of, get_read_session
+from app.core.serialization import rows_to_json
 from app.database import get_async_session
-from app.schemas import TableCreate, TableResponse
-from app.services import table_service
+from app.routers.health import check_readiness
+from app.schemas import TableCreate, TableResponse, FreeSlot, OccupancyFormat, OccupancyResponse, TableStarts
+from app.services import idempotency_service, occupancy_service, table_service
+from app.services.table_service import TABLE_LIST_FIELDS, tables_cache
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
+# Прежний адрес проверки, теперь с той же семантикой, что /health/ready
 @router.get("/health")
-async def health_check():
-    return {"status": "ok"}
+async def health_check(db: AsyncSession = Depends(get_async_session)):
+    return await check_readiness(db)
 
 @router.get("/", response_model=list[TableResponse])
-async def get_tables(db: AsyncSession = Depends(get_async_session)):
-    return await table_service.get(db)
+async def get_tables(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    location: Optional[str] = None,
+    min_seats: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_read_session),
+):
+    # Каталог меняется редко, а опрашивается часто: отдаём готовое тело или 304
+    key = (limit, cursor, location, min_seats)
+    cached = tables_cache.get(key)
+    if cached is None:
+        version = tables_cache.version
+        tables, next_cursor = await table_service.get(
+            db, limit=limit, cursor=cursor, location=location, min_seats=min_seats
+        )
+        body = rows_to_json(tables, TABLE_LIST_FIELDS)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor is not None else {}
+        cached = tables_cache.put(key, version, body, headers, fresh_as_of(db))
+    return cached.render(request)
+
+@router.get("/available", response_model=list[TableResponse])
+async def get_available_tables(
+    start: datetime,
+    duration: int = Query(..., ge=1),
+    min_seats: Optional[int] = Query(None, ge=1),
+    location: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+):
+    return await table_service.get_available(
+        db, start=start, duration_minutes=duration, min_seats=min_seats, location=location
+    )
+
+@router.get("/occupancy", response_model=OccupancyResponse)
+async def get_occupancy(
+    date: date,
+    slot_minutes: int = Query(15, ge=5, le=240),
+    location: Optional[str] = None,
+    format: OccupancyFormat = OccupancyFormat.array,
+    db: AsyncSession = Depends(get_read_session),
+):
+    return await occupancy_service.get(
+        db, day=date, slot_minutes=slot_minutes, location=location, output_format=format
+    )
+
+@router.get("/occupancy/fits", response_model=list[TableStarts])
+async def get_fitting_tables(
+    date: date,
+    seats: int = Query(..., ge=1),
+    duration: int = Query(..., ge=1),
+    slot_minutes: int = Query(15, ge=5, le=240),
+    location: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+):
+    return await occupancy_service.get_fitting(
+        db, day=date, min_seats=seats, duration_minutes=duration, slot_minutes=slot_minutes, location=location
+    )
+
+@router.get("/{table_id}/free-slots", response_model=list[FreeSlot])
+async def get_free_slots(
+    table_id: int,
+    after: datetime,
+    duration: int = Query(..., ge=1),
+    count: int = Query(5, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_session),
+):
+    return await table_service.get_free_slots(
+        db, table_id=table_id, after=after, duration_minutes=duration, count=count
+    )
 
 @router.post("/", response_model=TableResponse, status_code=201)
-async def create_table(table: TableCreate, db: AsyncSession = Depends(get_async_session)):
-    return await table_service.create(table, db)
+async def create_table(
+    table: TableCreate,
+    db: AsyncSession = Depends(get_async_session),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    if idempotency_key is None:
+        return await table_service.create(table, db)
+    return await idempotency_service.execute(
+        db, "POST /tables/", idempotency_key, table, lambda: table_service.create(table, db), TableResponse
+    )
 
 @router.delete("/{table_id}", status_code=204)
 async def delete_table(table_id: int, db: AsyncSession = Depends(get_async_session)):
@@ -1,2 +1,5 @@
-from .table import TableBase, TableCreate, TableResponse
-from .reservation import ReservationBase, ReservationCreate, ReservationResponse
+from .table import TableBase, TableCreate, TableResponse, FreeSlot
+from .table import OccupancyFormat, OccupancyResponse, TableOccupancy, TableStarts
+from .analytics import DayUsage, HourUsage, LocationUsage, TableUsage
+from .reservation import ReservationBase, ReservationCreate, ReservationResponse, ExportFormat
+from .reservation import BulkMode, BulkItemStatus, ReservationBulkCreate, ReservationBulkItemResult, ReservationBulkResponse
@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from datetime import date
+
+
+class UsageBase(BaseModel):
+    booked_minutes: float
+    # Брони, начавшиеся в периоде
+    reservations: int
+    # Доля занятого времени столов от 0 до 1
+    utilization: float
+
+
+class TableUsage(UsageBase):
+    table_id: int
+    name: str
+    location: str
+    seats: int
+
+
+class LocationUsage(UsageBase):
+    location: str
+    tables: int
+
+
+class DayUsage(UsageBase):
+    day: date
+
+
+class HourUsage(UsageBase):
+    # Час суток по UTC, 0–23
+    hour: int
@@ -1,5 +1,11 @@
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from datetime import datetime
+from enum import Enum
+from typing import Optional
+from app.models.reservation import MAX_DURATION_MINUTES
+
+# Максимальный размер пакета для массового создания броней
+MAX_BULK_SIZE = 1000
 
 
 class ReservationBase(BaseModel):
@@ -12,6 +18,8 @@ class ReservationBase(BaseModel):
     def validate_duration(cls, value):
         if value <= 0:
             raise ValueError("Duration must be positive")
+        if value > MAX_DURATION_MINUTES:
+            raise ValueError(f"Duration must not exceed {MAX_DURATION_MINUTES} minutes")
         return value
 
 class ReservationCreate(ReservationBase):
@@ -22,3 +30,39 @@ class ReservationResponse(ReservationBase):
     id: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class BulkMode(str, Enum):
+    # Всё или ничего: при любом отказе пакет не сохраняется
+    atomic = "atomic"
+    # Сохраняются все брони, прошедшие проверки
+    best_effort = "best_effort"
+
+
+class BulkItemStatus(str, Enum):
+    created = "created"
+    conflict = "conflict"
+    table_not_found = "table_not_found"
+    # Бронь корректна, но не сохранена, так как atomic-пакет отклонён
+    skipped = "skipped"
+
+
+class ReservationBulkCreate(BaseModel):
+    items: list[ReservationCreate] = Field(min_length=1, max_length=MAX_BULK_SIZE)
+    mode: BulkMode = BulkMode.atomic
+
+
+class ReservationBulkItemResult(BaseModel):
+    index: int
+    status: BulkItemStatus
+    reservation: Optional[ReservationResponse] = None
+
+
+class ReservationBulkResponse(BaseModel):
+    created: int
+    results: list[ReservationBulkItemResult]
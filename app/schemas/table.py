@@ -1,4 +1,7 @@
 from pydantic import BaseModel, ConfigDict
+from datetime import date, datetime
+from enum import Enum
+from typing import Optional, Union
 
 
 class TableBase(BaseModel):
@@ -15,3 +18,37 @@ class TableResponse(TableBase):
     id: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class FreeSlot(BaseModel):
+    start: datetime
+    # None — окно ничем не ограничено справа
+    end: Optional[datetime] = None
+
+
+class OccupancyFormat(str, Enum):
+    # Строка из '0' (свободно) и '1' (занято) на каждый слот
+    array = "array"
+    # Длины чередующихся серий слотов, начиная со свободной
+    rle = "rle"
+
+
+class TableOccupancy(BaseModel):
+    table_id: int
+    seats: int
+    occupancy: Union[str, list[int]]
+
+
+class OccupancyResponse(BaseModel):
+    date: date
+    slot_minutes: int
+    slots: int
+    format: OccupancyFormat
+    tables: list[TableOccupancy]
+
+
+class TableStarts(BaseModel):
+    table_id: int
+    seats: int
+    # Начала слотов, с которых стол свободен нужное время
+    starts: list[datetime]
@@ -0,0 +1,132 @@
+"""Запуск в продакшене: несколько процессов uvicorn с uvloop и httptools.
+
+    python -m app.server [--workers N] [--host 0.0.0.0] [--port 8000] [--graceful-timeout S]
+
+Главный процесс только держит сокет и следит за воркерами. Каждый воркер
+запускается через spawn и сам импортирует приложение, поэтому движок и пул
+создаются в нём заново и не наследуются. Размер пула воркера подбирается так,
+чтобы все воркеры вместе не вышли за max_connections сервера Postgres.
+По SIGTERM воркер перестаёт принимать соединения, ждёт незавершённые запросы
+не дольше graceful-timeout и закрывает пул в lifespan.
+"""
+import argparse
+import asyncio
+import importlib.util
+import logging
+import os
+import sys
+from typing import NamedTuple
+
+import sqlalchemy as sa
+import uvicorn
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from uvicorn.supervisors import Multiprocess
+
+from app.database import db_url, settings
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_LIMITS = sa.text(
+    "SELECT current_setting('max_connections')::int, current_setting('superuser_reserved_connections')::int"
+)
+
+# Соединения воркера сверх пула: LISTEN-соединение app/core/notifications.py
+EXTRA_CONNECTIONS_PER_WORKER = 1
+
+
+class PoolPlan(NamedTuple):
+    workers: int
+    pool_size: int
+    max_overflow: int
+
+    @property
+    def connections(self) -> int:
+        return self.workers * (self.pool_size + self.max_overflow + EXTRA_CONNECTIONS_PER_WORKER)
+
+
+def plan_pool(workers: int, pool_size: int, max_overflow: int, budget: int) -> PoolPlan:
+    """Урезает пул воркера, чтобы workers воркеров уместились в budget соединений.
+    Сначала сокращается overflow, потом постоянная часть пула."""
+    if workers < 1:
+        raise ValueError(f"At least one worker is required, got {workers}")
+    per_worker = budget // workers - EXTRA_CONNECTIONS_PER_WORKER
+    if per_worker < 1:
+        raise ValueError(f"{workers} workers need at least {workers * (1 + EXTRA_CONNECTIONS_PER_WORKER)} connections, budget is {budget}")
+    pool_size = min(pool_size, per_worker)
+    max_overflow = min(max_overflow, per_worker - pool_size)
+    return PoolPlan(workers, pool_size, max_overflow)
+
+
+async def fetch_connection_budget(url: str, reserved: int) -> int:
+    """Соединения, доступные приложению: max_connections без резерва суперпользователя
+    и без reserved для миграций, обслуживания и мониторинга."""
+    engine = create_async_engine(url, poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            max_connections, superuser_reserved = (await conn.execute(CONNECTION_LIMITS)).one()
+    finally:
+        await engine.dispose()
+    return max_connections - superuser_reserved - reserved
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.server", description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WEB_WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--graceful-timeout", type=float, default=settings.WEB_GRACEFUL_TIMEOUT)
+    args = parser.parse_args(argv)
+    # Значение по умолчанию из WEB_WORKERS argparse не проверяет, поэтому проверка после разбора
+    if args.workers < 1:
+        parser.error(f"--workers must be at least 1 (got {args.workers}); set WEB_WORKERS=0 to use the CPU count")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+
+    if settings.DB_PGBOUNCER_MODE:
+        # Соединениями с Postgres распоряжается PgBouncer, у воркеров пула нет
+        plan = PoolPlan(args.workers, 0, 0)
+    elif make_url(db_url).get_backend_name() == "sqlite":
+        # У файла SQLite нет лимита соединений; кэши воркеров согласуются
+        # только через NOTIFY Postgres, поэтому локальному экземпляру нужен один воркер
+        if args.workers > 1:
+            logger.warning("SQLite: запускается один воркер вместо %s", args.workers)
+        plan = PoolPlan(1, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+    else:
+        budget = asyncio.run(fetch_connection_budget(db_url, settings.DB_RESERVED_CONNECTIONS))
+        plan = plan_pool(args.workers, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW, budget)
+        if (plan.pool_size, plan.max_overflow) != (settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW):
+            logger.warning(
+                "Пул воркера урезан до %s+%s, чтобы %s воркеров уместились в %s соединений",
+                plan.pool_size, plan.max_overflow, plan.workers, budget,
+            )
+        # Воркеры читают настройки из окружения при импорте приложения
+        os.environ["DB_POOL_SIZE"] = str(plan.pool_size)
+        os.environ["DB_MAX_OVERFLOW"] = str(plan.max_overflow)
+        logger.info("Воркеров: %s, пул %s+%s, всего до %s соединений", plan.workers, plan.pool_size, plan.max_overflow, plan.connections)
+
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    if (loop, http) != ("uvloop", "httptools"):
+        logger.warning("uvloop или httptools не установлены: loop=%s, http=%s", loop, http)
+
+    config = uvicorn.Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=plan.workers,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        proxy_headers=True,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    server = uvicorn.Server(config)
+    # Даже один воркер запускается отдельным процессом: главный процесс
+    # не импортирует приложение и не держит соединений с базой
+    Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,5 @@
 from .table_service import table_service
-from .reservation_service import reservation_service
\ No newline at end of file
+from .reservation_service import reservation_service
+from .occupancy_service import occupancy_service
+from .analytics_service import analytics_service
+from .idempotency_service import idempotency_service
\ No newline at end of file
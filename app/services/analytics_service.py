@@ -0,0 +1,249 @@
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.future import select
+import sqlalchemy as sa
+from app.core.dialects import dialect_name
+from app.database import settings
+from app.models.analytics import ReservationUsageDaily, ReservationUsageHourly
+from app.models.table import Table
+from app.schemas.analytics import DayUsage, HourUsage, LocationUsage, TableUsage
+
+logger = logging.getLogger(__name__)
+
+# Полный пересчёт агрегатов по броням — для заливок с отключённым триггером
+# reservations_usage. История отсоединённых партиций при этом теряется.
+# SHARE-блокировка не даёт броням меняться, пока агрегаты пересчитываются
+REBUILD_USAGE = (
+    sa.text("LOCK TABLE reservations IN SHARE MODE"),
+    sa.text("TRUNCATE reservation_usage_hourly, reservation_usage_daily"),
+    sa.text("""
+        INSERT INTO reservation_usage_hourly (table_id, hour, booked_seconds, reservations)
+        SELECT r.table_id, bucket,
+               sum(extract(epoch FROM upper(slice) - lower(slice))::integer),
+               count(*) FILTER (WHERE bucket = first_hour)
+        FROM reservations AS r,
+             LATERAL (SELECT date_trunc('hour', lower(r.period) AT TIME ZONE 'UTC') AT TIME ZONE 'UTC') AS f(first_hour),
+             LATERAL generate_series(first_hour, upper(r.period) - interval '1 microsecond', interval '1 hour') AS bucket,
+             LATERAL (SELECT r.period * tstzrange(bucket, bucket + interval '1 hour')) AS part(slice)
+        GROUP BY r.table_id, bucket
+    """),
+    sa.text("""
+        INSERT INTO reservation_usage_daily (table_id, day, booked_seconds, reservations)
+        SELECT table_id, (date_trunc('day', hour AT TIME ZONE 'UTC'))::date, sum(booked_seconds), sum(reservations)
+        FROM reservation_usage_hourly
+        GROUP BY 1, 2
+    """),
+)
+
+
+def _seconds_to_minutes(seconds) -> float:
+    return round(seconds / 60, 2)
+
+
+def _utilization(seconds, capacity_seconds) -> float:
+    return round(seconds / capacity_seconds, 4) if capacity_seconds else 0.0
+
+
+class AnalyticsService:
+    """Отчёты о занятости столов. Читают только агрегаты reservation_usage_*
+    (см. app/models/analytics.py) и никогда не сканируют reservations."""
+
+    def _require_rollups(self, db: AsyncSession):
+        # Агрегаты ведут триггеры plpgsql; в локальном экземпляре на SQLite их нет
+        if dialect_name(db) != "postgresql":
+            logger.warning("Отчёты недоступны на бэкенде %s", dialect_name(db))
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="Usage reports require PostgreSQL"
+            )
+
+    def _check_period(self, date_from: date, date_to: date) -> int:
+        days = (date_to - date_from).days + 1
+        if days <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="date_to must not be earlier than date_from"
+            )
+        if days > settings.ANALYTICS_MAX_RANGE_DAYS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Period must not exceed {settings.ANALYTICS_MAX_RANGE_DAYS} days"
+            )
+        return days
+
+    def _filter_tables(self, query, location: Optional[str], table_id: Optional[int]):
+        if location is not None:
+            query = query.where(Table.location == location)
+        if table_id is not None:
+            query = query.where(Table.id == table_id)
+        return query
+
+    async def _count_tables(self, db: AsyncSession, location: Optional[str], table_id: Optional[int]) -> int:
+        query = self._filter_tables(select(sa.func.count()).select_from(Table), location, table_id)
+        return await db.scalar(query)
+
+    def _daily_totals(self, date_from: date, date_to: date):
+        return (
+            select(
+                ReservationUsageDaily.table_id,
+                sa.func.sum(ReservationUsageDaily.booked_seconds).label("booked_seconds"),
+                sa.func.sum(ReservationUsageDaily.reservations).label("reservations"),
+            )
+            .where(ReservationUsageDaily.day.between(date_from, date_to))
+            .group_by(ReservationUsageDaily.table_id)
+            .subquery()
+        )
+
+    async def get_tables(
+        self, db: AsyncSession, date_from: date, date_to: date, location: Optional[str] = None
+    ) -> list[TableUsage]:
+        self._require_rollups(db)
+        days = self._check_period(date_from, date_to)
+        logger.info("Отчёт по столам за %s–%s", date_from, date_to)
+        totals = self._daily_totals(date_from, date_to)
+        query = self._filter_tables(
+            select(
+                Table.id,
+                Table.name,
+                Table.location,
+                Table.seats,
+                sa.func.coalesce(totals.c.booked_seconds, 0),
+                sa.func.coalesce(totals.c.reservations, 0),
+            )
+            .outerjoin(totals, totals.c.table_id == Table.id)
+            .order_by(Table.id),
+            location,
+            None,
+        )
+        capacity = days * 24 * 3600
+        return [
+            TableUsage(
+                table_id=table_id,
+                name=name,
+                location=table_location,
+                seats=seats,
+                booked_minutes=_seconds_to_minutes(seconds),
+                reservations=reservations,
+                utilization=_utilization(seconds, capacity),
+            )
+            for table_id, name, table_location, seats, seconds, reservations in await db.execute(query)
+        ]
+
+    async def get_locations(self, db: AsyncSession, date_from: date, date_to: date) -> list[LocationUsage]:
+        self._require_rollups(db)
+        days = self._check_period(date_from, date_to)
+        logger.info("Отчёт по залам за %s–%s", date_from, date_to)
+        totals = self._daily_totals(date_from, date_to)
+        query = (
+            select(
+                Table.location,
+                sa.func.count(Table.id),
+                sa.func.coalesce(sa.func.sum(totals.c.booked_seconds), 0),
+                sa.func.coalesce(sa.func.sum(totals.c.reservations), 0),
+            )
+            .outerjoin(totals, totals.c.table_id == Table.id)
+            .group_by(Table.location)
+            .order_by(Table.location)
+        )
+        return [
+            LocationUsage(
+                location=location,
+                tables=tables,
+                booked_minutes=_seconds_to_minutes(seconds),
+                reservations=reservations,
+                utilization=_utilization(seconds, tables * days * 24 * 3600),
+            )
+            for location, tables, seconds, reservations in await db.execute(query)
+        ]
+
+    async def get_days(
+        self,
+        db: AsyncSession,
+        date_from: date,
+        date_to: date,
+        location: Optional[str] = None,
+        table_id: Optional[int] = None,
+    ) -> list[DayUsage]:
+        """Занятость по дням периода; дни без броней тоже попадают в отчёт."""
+        self._require_rollups(db)
+        days = self._check_period(date_from, date_to)
+        logger.info("Отчёт по дням за %s–%s", date_from, date_to)
+        query = self._filter_tables(
+            select(
+                ReservationUsageDaily.day,
+                sa.func.sum(ReservationUsageDaily.booked_seconds),
+                sa.func.sum(ReservationUsageDaily.reservations),
+            )
+            .join(Table, Table.id == ReservationUsageDaily.table_id)
+            .where(ReservationUsageDaily.day.between(date_from, date_to))
+            .group_by(ReservationUsageDaily.day),
+            location,
+            table_id,
+        )
+        usage = {day: (seconds, reservations) for day, seconds, reservations in await db.execute(query)}
+        capacity = await self._count_tables(db, location, table_id) * 24 * 3600
+        report = []
+        for offset in range(days):
+            day = date_from + timedelta(days=offset)
+            seconds, reservations = usage.get(day, (0, 0))
+            report.append(DayUsage(
+                day=day,
+                booked_minutes=_seconds_to_minutes(seconds),
+                reservations=reservations,
+                utilization=_utilization(seconds, capacity),
+            ))
+        return report
+
+    async def get_hours(
+        self,
+        db: AsyncSession,
+        date_from: date,
+        date_to: date,
+        location: Optional[str] = None,
+        table_id: Optional[int] = None,
+    ) -> list[HourUsage]:
+        """Занятость по часам суток (UTC), сложенная за все дни периода."""
+        self._require_rollups(db)
+        days = self._check_period(date_from, date_to)
+        logger.info("Отчёт по часам за %s–%s", date_from, date_to)
+        period_start = datetime.combine(date_from, time(), tzinfo=timezone.utc)
+        hour_of_day = sa.extract("hour", sa.func.timezone("UTC", ReservationUsageHourly.hour))
+        query = self._filter_tables(
+            select(
+                hour_of_day,
+                sa.func.sum(ReservationUsageHourly.booked_seconds),
+                sa.func.sum(ReservationUsageHourly.reservations),
+            )
+            .join(Table, Table.id == ReservationUsageHourly.table_id)
+            .where(
+                ReservationUsageHourly.hour >= period_start,
+                ReservationUsageHourly.hour < period_start + timedelta(days=days),
+            )
+            .group_by(hour_of_day),
+            location,
+            table_id,
+        )
+        usage = {int(hour): (seconds, reservations) for hour, seconds, reservations in await db.execute(query)}
+        capacity = await self._count_tables(db, location, table_id) * days * 3600
+        report = []
+        for hour in range(24):
+            seconds, reservations = usage.get(hour, (0, 0))
+            report.append(HourUsage(
+                hour=hour,
+                booked_minutes=_seconds_to_minutes(seconds),
+                reservations=reservations,
+                utilization=_utilization(seconds, capacity),
+            ))
+        return report
+
+    async def rebuild(self, conn: AsyncConnection):
+        """Пересчёт агрегатов с нуля в транзакции conn."""
+        for statement in REBUILD_USAGE:
+            await conn.execute(statement)
+        logger.info("Агрегаты занятости пересчитаны")
+
+
+analytics_service = AnalyticsService()
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from functools import partial
+from typing import Optional
+
+import sqlalchemy as sa
+from sortedcontainers import SortedList
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.notifications import NotificationListener
+from app.database import settings
+from app.models.reservation import MAX_DURATION_MINUTES, RESERVATION_END, Reservation, RESERVATION_CHANGES_CHANNEL
+from app.models.table import Table, TABLE_CHANGES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+class Verdict(str, Enum):
+    # Стола нет — можно отвечать 404 без базы
+    unknown_table = "unknown_table"
+    # Слот занят — можно отвечать 400 без базы
+    conflict = "conflict"
+    # Слот выглядит свободным, окончательно решает вставка в базу
+    free = "free"
+    # Слот за пределами горизонта индекса, решает база
+    out_of_range = "out_of_range"
+
+
+def _aware(value: datetime) -> datetime:
+    # Наивное время база трактует как UTC, индекс делает так же
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+class AvailabilityIndex:
+    """Индекс предстоящих броней в памяти процесса: по SortedList интервалов
+    (start, end, id) на каждый стол плюс множество существующих столов.
+
+    Хранит только брони, пересекающие окно [сейчас, covered_until); прошедшие
+    вытесняются, окно периодически сдвигается. Согласованность между воркерами
+    поддерживается через LISTEN/NOTIFY от триггеров на tables и reservations
+    (app/core/notifications.py).
+    Индекс лишь отсекает очевидные отказы: всё, что выглядит свободным,
+    проверяет база (exclusion-ограничение).
+    """
+
+    def __init__(self, horizon: timedelta, maintenance_interval: float = 60.0):
+        self.horizon = horizon
+        self.maintenance_interval = maintenance_interval
+        self.ready = False
+        self._tables: set[int] = set()
+        self._slots: dict[int, SortedList] = defaultdict(SortedList)
+        self._by_id: dict[int, tuple[int, tuple]] = {}
+        # Брони принимаются до accept_until, а ответы даются до covered_until:
+        # между ними окно, которое прямо сейчас догружается из базы
+        self._covered_until: Optional[datetime] = None
+        self._accept_until: Optional[datetime] = None
+        # Удаления, пришедшие во время загрузки снимка, чтобы не вернуть их из снимка
+        self._deleted_tables: Optional[set[int]] = None
+        self._deleted_reservations: Optional[set[int]] = None
+        self._counters = Counter()
+        self._engine: Optional[AsyncEngine] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # --- Проверка
+
+    def check(self, table_id: int, start: datetime, end: datetime) -> Optional[Verdict]:
+        """Предварительный ответ на вопрос, можно ли занять стол на [start, end).
+        None — индекс не загружен и отвечать не может."""
+        if not self.ready:
+            self._counters["misses"] += 1
+            return None
+        start, end = _aware(start), _aware(end)
+        if table_id not in self._tables:
+            verdict = Verdict.unknown_table
+        elif end > self._covered_until:
+            verdict = Verdict.out_of_range
+        elif self._overlaps(table_id, start, end):
+            verdict = Verdict.conflict
+        else:
+            verdict = Verdict.free
+        self._counters[verdict.value] += 1
+        self._counters["hits" if verdict in (Verdict.unknown_table, Verdict.conflict) else "misses"] += 1
+        return verdict
+
+    def _overlaps(self, table_id: int, start: datetime, end: datetime) -> bool:
+        slots = self._slots.get(table_id)
+        if not slots:
+            return False
+        # Брони одного стола не пересекаются, поэтому достаточно соседей точки вставки
+        position = slots.bisect_left((start,))
+        if position > 0 and slots[position - 1][1] > start:
+            return True
+        return position < len(slots) and slots[position][0] < end
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._engine is not None,
+            "ready": self.ready,
+            "tables": len(self._tables),
+            "reservations": len(self._by_id),
+            "covered_until": self._covered_until,
+            **{name: self._counters[name] for name in ("hits", "misses", "evicted")},
+            **{verdict.value: self._counters[verdict.value] for verdict in Verdict},
+        }
+
+    # --- Изменения
+
+    def add_table(self, table_id: int):
+        self._tables.add(table_id)
+
+    def remove_table(self, table_id: int):
+        self._tables.discard(table_id)
+        for entry in self._slots.pop(table_id, ()):
+            self._by_id.pop(entry[2], None)
+        if self._deleted_tables is not None:
+            self._deleted_tables.add(table_id)
+
+    def add_reservation(self, reservation_id: int, table_id: int, start: datetime, end: datetime):
+        start, end = _aware(start), _aware(end)
+        if self._accept_until is None or start >= self._accept_until or end <= datetime.now(timezone.utc):
+            return
+        if reservation_id in self._by_id:
+            return
+        entry = (start, end, reservation_id)
+        self._slots[table_id].add(entry)
+        self._by_id[reservation_id] = (table_id, entry)
+
+    def remove_reservation(self, reservation_id: int):
+        table_id, entry = self._by_id.pop(reservation_id, (None, None))
+        if entry is not None:
+            self._slots[table_id].discard(entry)
+        if self._deleted_reservations is not None:
+            self._deleted_reservations.add(reservation_id)
+
+    def evict(self, now: Optional[datetime] = None):
+        """Вытеснение уже закончившихся броней."""
+        now = now or datetime.now(timezone.utc)
+        for table_id, slots in list(self._slots.items()):
+            while slots and slots[0][1] <= now:
+                self._by_id.pop(slots.pop(0)[2], None)
+                self._counters["evicted"] += 1
+            if not slots:
+                del self._slots[table_id]
+
+    def handle_notification(self, channel: str, payload: str):
+        event = json.loads(payload)
+        if channel == TABLE_CHANGES_CHANNEL:
+            if event["op"] == "DELETE":
+                self.remove_table(event["id"])
+            else:
+                self.add_table(event["id"])
+        elif event["op"] == "DELETE":
+            self.remove_reservation(event["id"])
+        elif event["op"] == "INSERT":
+            start = datetime.fromisoformat(event["reservation_time"])
+            self.add_reservation(
+                event["id"], event["table_id"], start, start + timedelta(minutes=event["duration_minutes"])
+            )
+
+    # --- Загрузка из базы
+
+    async def _load(self, conn, start: Optional[datetime], until: datetime, with_tables: bool):
+        """Догрузка броней с началом в [start, until) с учётом удалений во время запроса."""
+        self._accept_until = until
+        self._deleted_tables, self._deleted_reservations = set(), set()
+        try:
+            if with_tables:
+                result = await conn.execute(sa.select(Table.id))
+                table_ids = result.scalars().all()
+            lower, upper = Reservation.reservation_time, RESERVATION_END
+            now = datetime.now(timezone.utc)
+            # Условия по reservation_time ограничивают чтение нужными партициями
+            query = sa.select(Reservation.id, Reservation.table_id, lower, upper).where(
+                upper > now,
+                lower < until,
+                Reservation.reservation_time > now - timedelta(minutes=MAX_DURATION_MINUTES),
+                Reservation.reservation_time < until,
+            )
+            if start is not None:
+                query = query.where(lower >= start)
+            result = await conn.execute(query)
+            rows = result.all()
+            if with_tables:
+                self._tables.update(set(table_ids) - self._deleted_tables)
+            for reservation_id, table_id, lower_value, upper_value in rows:
+                if reservation_id not in self._deleted_reservations and table_id not in self._deleted_tables:
+                    self.add_reservation(reservation_id, table_id, lower_value, upper_value)
+        finally:
+            self._deleted_tables = self._deleted_reservations = None
+        self._covered_until = until
+
+    def _reset(self):
+        self._tables.clear()
+        self._slots.clear()
+        self._by_id.clear()
+        self._covered_until = self._accept_until = None
+
+    # --- Жизненный цикл
+
+    def attach(self, listener: NotificationListener, engine: AsyncEngine):
+        """Подписка на изменения столов и броней; снимок грузится после каждого подключения listener."""
+        self._engine = engine
+        for channel in (TABLE_CHANGES_CHANNEL, RESERVATION_CHANGES_CHANNEL):
+            listener.subscribe(channel, partial(self.handle_notification, channel))
+        listener.on_connect(self._on_connect)
+        listener.on_disconnect(self._on_disconnect)
+
+    async def _on_connect(self):
+        # LISTEN уже активен, поэтому всё, что случится после снимка, придёт уведомлением
+        self._reset()
+        now = datetime.now(timezone.utc)
+        async with self._engine.connect() as conn:
+            await self._load(conn, None, now + self.horizon, with_tables=True)
+        self.ready = True
+        logger.info("Индекс доступности загружен: %s столов, %s броней", len(self._tables), len(self._by_id))
+        self._task = asyncio.create_task(self._maintain())
+
+    def _on_disconnect(self):
+        # Пока уведомления не приходят, индексу нельзя доверять
+        self.ready = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _maintain(self):
+        """Периодическое вытеснение прошедших броней и сдвиг горизонта."""
+        while True:
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                now = datetime.now(timezone.utc)
+                self.evict(now)
+                async with self._engine.connect() as conn:
+                    await self._load(conn, self._covered_until, now + self.horizon, with_tables=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка обслуживания индекса доступности")
+
+    async def stop(self):
+        task, self._task = self._task, None
+        self.ready = False
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+availability_index = AvailabilityIndex(horizon=timedelta(days=settings.AVAILABILITY_INDEX_HORIZON_DAYS))
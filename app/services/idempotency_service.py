@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+import orjson
+import sqlalchemy as sa
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.future import select
+
+from app.core.dialects import dialect_name
+from app.core.metrics import IDEMPOTENT_REPLAYS
+from app.database import settings, use_autocommit
+from app.models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# INSERT ... ON CONFLICT у обоих бэкендов записывается одинаково
+UPSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Как часто дубль проверяет ключ, захваченный запросом в другом воркере, секунды
+POLL_INTERVAL = 0.05
+
+
+class StoredResponse(NamedTuple):
+    request_hash: str
+    status_code: int
+    body: bytes
+    expires_at: datetime
+
+
+def request_hash(payload: BaseModel) -> str:
+    """Отпечаток уже провалидированного тела: не зависит от порядка полей и пробелов в JSON клиента."""
+    return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+
+def _key_filter(scope: str, key: str):
+    return sa.and_(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+
+
+def _claim_query(scope: str, key: str, fingerprint: str, now: datetime, dialect: str = "postgresql"):
+    """Захват ключа одним запросом. Существующую строку можно перезаписать, только
+    если она просрочена или её владелец не завершил запрос до locked_until."""
+    query = UPSERT[dialect](IdempotencyKey).values(
+        scope=scope,
+        key=key,
+        request_hash=fingerprint,
+        locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+        expires_at=now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+    )
+    return query.on_conflict_do_update(
+        index_elements=[IdempotencyKey.scope, IdempotencyKey.key],
+        set_={
+            "request_hash": query.excluded.request_hash,
+            "status_code": None,
+            "body": None,
+            "locked_until": query.excluded.locked_until,
+            "expires_at": query.excluded.expires_at,
+        },
+        where=sa.or_(
+            IdempotencyKey.expires_at <= now,
+            sa.and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.locked_until <= now),
+        ),
+    ).returning(IdempotencyKey.expires_at)
+
+
+def _response(stored: StoredResponse, replayed: bool = False) -> Response:
+    headers = {REPLAYED_HEADER: "true"} if replayed else None
+    return Response(stored.body, status_code=stored.status_code, media_type="application/json", headers=headers)
+
+
+def _key_reused(key: str) -> HTTPException:
+    logger.error("Ключ идемпотентности %s повторён с другим телом запроса", key)
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail="Idempotency-Key has already been used with a different request body"
+    )
+
+
+def _in_progress(key: str) -> HTTPException:
+    logger.warning("Запрос с ключом идемпотентности %s всё ещё выполняется", key)
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="A request with this Idempotency-Key is still in progress",
+        headers={"Retry-After": "1"},
+    )
+
+
+class IdempotencyService:
+    """Первый ответ на POST с заголовком Idempotency-Key и его повтор.
+
+    Ответ хранится в idempotency_keys IDEMPOTENCY_TTL_HOURS часов, последние
+    ответы воркер держит в LRU, и повтор из того же воркера не идёт в базу.
+    Дубль, пришедший, пока первый запрос ещё выполняется, ждёт его завершения:
+    в том же воркере — на событии, из другого воркера — опрашивая строку ключа.
+    Ответы 4xx тоже сохраняются, поэтому клиент, повторивший свою успешную
+    бронь, получает 201, а не «стол уже забронирован». После 5xx и обрыва
+    запроса ключ освобождается, и повтор выполняется заново.
+    """
+
+    def __init__(self, max_entries: int = settings.IDEMPOTENCY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], StoredResponse] = OrderedDict()
+        self._pending: dict[tuple[str, str], asyncio.Event] = {}
+
+    def clear(self):
+        self._entries.clear()
+
+    def _cached(self, cache_key: tuple[str, str]) -> Optional[StoredResponse]:
+        stored = self._entries.get(cache_key)
+        if stored is None:
+            return None
+        if stored.expires_at <= datetime.now(timezone.utc):
+            del self._entries[cache_key]
+            return None
+        self._entries.move_to_end(cache_key)
+        return stored
+
+    def _remember(self, cache_key: tuple[str, str], stored: StoredResponse):
+        self._entries[cache_key] = stored
+        self._entries.move_to_end(cache_key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _replay(self, stored: StoredResponse, fingerprint: str, key: str, source: str) -> Response:
+        if stored.request_hash != fingerprint:
+            raise _key_reused(key)
+        IDEMPOTENT_REPLAYS.inc(source)
+        logger.info("Повтор ответа по ключу идемпотентности %s", key)
+        return _response(stored, replayed=True)
+
+    async def execute(
+        self,
+        db: AsyncSession,
+        scope: str,
+        key: str,
+        payload: BaseModel,
+        create: Callable[[], Awaitable],
+        response_model: type[BaseModel],
+        status_code: int = status.HTTP_201_CREATED,
+    ) -> Response:
+        """Выполнение create() не больше одного раза на ключ в пределах scope."""
+        cache_key = (scope, key)
+        fingerprint = request_hash(payload)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            stored = self._cached(cache_key)
+            if stored is not None:
+                return self._replay(stored, fingerprint, key, "cache")
+            pending = self._pending.get(cache_key)
+            if pending is None:
+                break
+            # Дубль из этого же воркера ждёт первый запрос, не обращаясь к базе
+            try:
+                await asyncio.wait_for(pending.wait(), deadline - time.monotonic())
+            except TimeoutError:
+                raise _in_progress(key)
+
+        done = self._pending[cache_key] = asyncio.Event()
+        try:
+            return await self._execute_once(db, scope, key, fingerprint, create, response_model, status_code, deadline)
+        finally:
+            del self._pending[cache_key]
+            done.set()
+
+    async def _execute_once(self, db, scope, key, fingerprint, create, response_model, status_code, deadline) -> Response:
+        cache_key = (scope, key)
+        while True:
+            await use_autocommit(db)
+            expires_at = await db.scalar(_claim_query(scope, key, fingerprint, datetime.now(timezone.utc), dialect_name(db)))
+            if expires_at is not None:
+                break
+            row = (await db.execute(
+                select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.body, IdempotencyKey.expires_at)
+                .where(_key_filter(scope, key))
+            )).one_or_none()
+            if row is not None and row.status_code is not None:
+                stored = StoredResponse(*row)
+                self._remember(cache_key, stored)
+                return self._replay(stored, fingerprint, key, "database")
+            if row is not None and row.request_hash != fingerprint:
+                raise _key_reused(key)
+            if time.monotonic() >= deadline:
+                raise _in_progress(key)
+            # Ключ держит запрос в другом воркере; строка могла и исчезнуть,
+            # если он завершился ошибкой, — тогда следующий захват удастся
+            await asyncio.sleep(POLL_INTERVAL)
+
+        try:
+            result = await create()
+        except HTTPException as exc:
+            if exc.status_code < 500:
+                stored = StoredResponse(fingerprint, exc.status_code, orjson.dumps({"detail": exc.detail}), expires_at)
+                await self._store(db, scope, key, stored)
+            else:
+                await self._release(db, scope, key)
+            raise
+        except BaseException:
+            await self._release(db, scope, key)
+            raise
+
+        body = response_model.model_validate(result, from_attributes=True).model_dump_json().encode()
+        stored = StoredResponse(fingerprint, status_code, body, expires_at)
+        await self._store(db, scope, key, stored)
+        return _response(stored)
+
+    async def _store(self, db: AsyncSession, scope: str, key: str, stored: StoredResponse):
+        # Запись уже выполнена: если ответ сохранить не удалось, клиент всё равно
+        # его получает, а ключ освободится по истечении locked_until
+        try:
+            await use_autocommit(db)
+            await db.execute(
+                sa.update(IdempotencyKey)
+                .where(_key_filter(scope, key), IdempotencyKey.request_hash == stored.request_hash)
+                .values(status_code=stored.status_code, body=stored.body)
+            )
+        except Exception:
+            logger.exception("Не удалось сохранить ответ по ключу идемпотентности %s", key)
+            return
+        self._remember((scope, key), stored)
+
+    async def _release(self, db: AsyncSession, scope: str, key: str):
+        try:
+            await db.rollback()
+            await use_autocommit(db)
+            await db.execute(sa.delete(IdempotencyKey).where(_key_filter(scope, key), IdempotencyKey.status_code.is_(None)))
+        except Exception:
+            logger.exception("Не удалось освободить ключ идемпотентности %s", key)
+
+    async def purge_expired(self, conn: AsyncConnection) -> int:
+        """Удаление просроченных ключей; их ответы уже не повторяются."""
+        result = await conn.execute(sa.delete(IdempotencyKey).where(IdempotencyKey.expires_at <= sa.func.now()))
+        logger.info("Удалено просроченных ключей идемпотентности: %s", result.rowcount)
+        return result.rowcount
+
+
+idempotency_service = IdempotencyService()
@@ -0,0 +1,180 @@
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+import sqlalchemy as sa
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.dialects import minutes_between
+from app.models.reservation import MAX_DURATION_MINUTES, RESERVATION_END, Reservation, overlaps_reservation
+from app.models.table import Table
+from app.schemas.table import OccupancyFormat, OccupancyResponse, TableOccupancy, TableStarts
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class OccupancyGrid:
+    """Занятость столов за сутки: булева матрица (столы × слоты), True — слот занят.
+
+    Строится одним проходом по броням без циклов по слотам: начало брони
+    добавляет +1 в разностный массив, конец — -1, накопленная сумма по слотам
+    даёт число броней, покрывающих слот.
+    """
+
+    def __init__(self, day_start: datetime, slot_minutes: int, table_ids: np.ndarray, seats: np.ndarray, occupied: np.ndarray):
+        self.day_start = day_start
+        self.slot_minutes = slot_minutes
+        self.table_ids = table_ids
+        self.seats = seats
+        self.occupied = occupied
+
+    @classmethod
+    def build(cls, day_start: datetime, slot_minutes: int, table_ids, seats, reservation_table_ids, starts, ends) -> "OccupancyGrid":
+        """starts/ends — границы броней в минутах от начала суток (могут выходить за сутки)."""
+        table_ids = np.asarray(table_ids, dtype=np.int64)
+        slots = MINUTES_PER_DAY // slot_minutes
+        rows = np.searchsorted(table_ids, np.asarray(reservation_table_ids, dtype=np.int64))
+        # Слот занят, если бронь задевает хотя бы его часть
+        first = np.clip(np.floor_divide(np.asarray(starts, dtype=np.int64), slot_minutes), 0, slots)
+        last = np.clip(-np.floor_divide(-np.asarray(ends, dtype=np.int64), slot_minutes), 0, slots)
+
+        diff = np.zeros((len(table_ids), slots + 1), dtype=np.int32)
+        np.add.at(diff, (rows, first), 1)
+        np.add.at(diff, (rows, last), -1)
+        occupied = np.cumsum(diff[:, :slots], axis=1) > 0
+        return cls(day_start, slot_minutes, table_ids, np.asarray(seats, dtype=np.int64), occupied)
+
+    @property
+    def slots(self) -> int:
+        return self.occupied.shape[1]
+
+    def bitmap(self, row: int) -> str:
+        """Строка занятости стола: '0' — свободно, '1' — занято."""
+        return (self.occupied[row].view(np.uint8) + ord("0")).tobytes().decode()
+
+    def run_lengths(self, row: int) -> list[int]:
+        """Длины чередующихся серий слотов, начиная со свободной (она может быть нулевой)."""
+        line = self.occupied[row]
+        boundaries = np.flatnonzero(line[1:] != line[:-1]) + 1
+        edges = np.concatenate(([0], boundaries, [len(line)]))
+        lengths = np.diff(edges).tolist()
+        return [0, *lengths] if line[0] else lengths
+
+    def starts_fitting(self, min_seats: int, duration_minutes: int) -> tuple[np.ndarray, np.ndarray]:
+        """Для каждого стола с min_seats и больше мест — маска слотов, с которых
+        подряд свободно duration_minutes. Скользящее окно считается через
+        накопленную сумму занятых слотов: окно свободно, если сумма в нём нулевая."""
+        window = -(-duration_minutes // self.slot_minutes)
+        candidates = np.flatnonzero(self.seats >= min_seats)
+        if window > self.slots:
+            return candidates, np.zeros((len(candidates), 0), dtype=bool)
+        busy = np.zeros((len(candidates), self.slots + 1), dtype=np.int32)
+        np.cumsum(self.occupied[candidates], axis=1, out=busy[:, 1:])
+        free = (busy[:, window:] - busy[:, :-window]) == 0
+        return candidates, free
+
+    def slot_time(self, slot: int) -> datetime:
+        return self.day_start + timedelta(minutes=slot * self.slot_minutes)
+
+
+class OccupancyService:
+    async def load(self, db: AsyncSession, day: date, slot_minutes: int, location: Optional[str] = None) -> OccupancyGrid:
+        """Столы и все брони, задевающие сутки day (UTC), — одним запросом."""
+        if MINUTES_PER_DAY % slot_minutes:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="slot_minutes must divide a day evenly"
+            )
+        day_start = datetime.combine(day, time(), tzinfo=timezone.utc)
+        day_end = day_start + timedelta(days=1)
+
+        def minutes_from(column):
+            return minutes_between(day_start, column)
+
+        reservation_on = sa.and_(
+            Reservation.table_id == Table.id,
+            overlaps_reservation(day_start, day_end),
+            # Границы по ключу секционирования: читаются только нужные месяцы
+            Reservation.reservation_time > day_start - timedelta(minutes=MAX_DURATION_MINUTES),
+            Reservation.reservation_time < day_end,
+        )
+        query = (
+            select(
+                Table.id,
+                Table.seats,
+                minutes_from(Reservation.reservation_time).label("start"),
+                minutes_from(RESERVATION_END).label("end"),
+            )
+            .outerjoin(Reservation, reservation_on)
+            .order_by(Table.id)
+        )
+        if location is not None:
+            query = query.where(Table.location == location)
+
+        rows = (await db.execute(query)).all()
+        logger.info("Сетка занятости на %s: %s строк", day, len(rows))
+        # id, места, начало и конец брони в минутах от начала суток; у столов без броней — NaN
+        columns = np.array(rows, dtype=np.float64).reshape(-1, 4)
+        table_ids, first_rows = np.unique(columns[:, 0].astype(np.int64), return_index=True)
+        booked = ~np.isnan(columns[:, 2])
+        return OccupancyGrid.build(
+            day_start,
+            slot_minutes,
+            table_ids,
+            columns[first_rows, 1],
+            columns[booked, 0],
+            np.floor(columns[booked, 2]),
+            np.ceil(columns[booked, 3]),
+        )
+
+    async def get(
+        self,
+        db: AsyncSession,
+        day: date,
+        slot_minutes: int,
+        location: Optional[str] = None,
+        output_format: OccupancyFormat = OccupancyFormat.array,
+    ) -> OccupancyResponse:
+        grid = await self.load(db, day, slot_minutes, location)
+        encode = grid.bitmap if output_format == OccupancyFormat.array else grid.run_lengths
+        return OccupancyResponse(
+            date=day,
+            slot_minutes=slot_minutes,
+            slots=grid.slots,
+            format=output_format,
+            tables=[
+                TableOccupancy(table_id=table_id, seats=seats, occupancy=encode(row))
+                for row, (table_id, seats) in enumerate(zip(grid.table_ids.tolist(), grid.seats.tolist()))
+            ],
+        )
+
+    async def get_fitting(
+        self,
+        db: AsyncSession,
+        day: date,
+        min_seats: int,
+        duration_minutes: int,
+        slot_minutes: int,
+        location: Optional[str] = None,
+    ) -> list[TableStarts]:
+        """Столы, где N гостей поместятся на M минут, и слоты, с которых это возможно."""
+        grid = await self.load(db, day, slot_minutes, location)
+        candidates, free = grid.starts_fitting(min_seats, duration_minutes)
+        result = []
+        for row, starts in zip(candidates.tolist(), free):
+            slots = np.flatnonzero(starts)
+            if len(slots):
+                result.append(TableStarts(
+                    table_id=int(grid.table_ids[row]),
+                    seats=int(grid.seats[row]),
+                    starts=[grid.slot_time(slot) for slot in slots.tolist()],
+                ))
+        return result
+
+
+occupancy_service = OccupancyService()
@@ -0,0 +1,29 @@
+import base64
+import json
+
+from fastapi import HTTPException, status
+
+# Ограничения размера страницы для списочных эндпоинтов
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Заголовок, в котором отдаётся курсор следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    """Упаковка ключа последней строки страницы в непрозрачный курсор."""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """Распаковка курсора с приведением значений к types; некорректный курсор — ошибка 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return [type_(value) for type_, value in zip(types, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
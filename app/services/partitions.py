@@ -0,0 +1,194 @@
+import json
+import logging
+import re
+from datetime import date, datetime, timezone
+from enum import Enum
+from typing import Iterable, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.models.reservation import (
+    RESERVATION_CHANGES_CHANNEL,
+    RESERVATION_DEFAULT_PARTITION,
+    partition_overlap_constraint,
+)
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r"^reservations_y(\d{4})m(\d{2})$")
+
+# Сериализует обслуживание партиций между воркерами и запусками команды
+MAINTENANCE_LOCK = sa.text("SELECT pg_advisory_xact_lock(hashtext('reservation_partitions'))")
+
+PARTITIONS_QUERY = sa.text("""
+SELECT child.relname
+FROM pg_inherits
+JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'reservations'::regclass
+""")
+
+# Триггеры, сообщающие об изменении броней: уведомление потоку и кэшам
+# и пересчёт сводок использования. Перенос строк между партициями — не изменение
+CHANGE_TRIGGERS = ("reservations_notify", "reservations_usage")
+
+CHANGE_TRIGGERS_QUERY = sa.text(
+    "SELECT tgname FROM pg_trigger WHERE tgrelid = CAST(:relation AS regclass) AND tgname = ANY(:names)"
+)
+
+IS_PARTITIONED = sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = 'reservations'::regclass")
+
+DEFAULT_PARTITION_MONTHS = sa.text(f"""
+SELECT DISTINCT date_trunc('month', reservation_time AT TIME ZONE 'UTC')::date AS month
+FROM {RESERVATION_DEFAULT_PARTITION}
+""")
+
+
+class RetentionMode(str, Enum):
+    # Отсоединить партицию и перенести её в архивную схему
+    detach = "detach"
+    # Удалить партицию вместе с данными
+    drop = "drop"
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"reservations_y{month.year}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    match = PARTITION_NAME.match(name)
+    return date(int(match[1]), int(match[2]), 1) if match else None
+
+
+def _bound(month: date) -> str:
+    # Границы месяцев считаются в UTC, как и весь reservation_time
+    return f"'{datetime(month.year, month.month, 1, tzinfo=timezone.utc).isoformat()}'"
+
+
+async def list_partitions(conn: AsyncConnection) -> set[str]:
+    return set((await conn.execute(PARTITIONS_QUERY)).scalars())
+
+
+async def set_change_triggers(conn: AsyncConnection, relation: str, enabled: bool):
+    """Включение и выключение CHANGE_TRIGGERS на партиции. ALTER TABLE действует до конца
+    транзакции и блокирует запись в партицию, поэтому чужие изменения
+    триггеры по-прежнему видят."""
+    names = (await conn.execute(CHANGE_TRIGGERS_QUERY, {"relation": relation, "names": list(CHANGE_TRIGGERS)})).scalars()
+    for trigger in names:
+        await conn.execute(sa.text(f"ALTER TABLE {relation} {'ENABLE' if enabled else 'DISABLE'} TRIGGER {trigger}"))
+
+
+async def create_partition(conn: AsyncConnection, month: date) -> bool:
+    """Создание месячной партиции в транзакции conn. Брони этого месяца, успевшие
+    попасть в партицию по умолчанию, переносятся в новую. False — партиция уже есть."""
+    await conn.execute(MAINTENANCE_LOCK)
+    name = partition_name(month)
+    if name in await list_partitions(conn):
+        return False
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    # Postgres не создаст партицию, пока строки её диапазона лежат в партиции по умолчанию.
+    # Перенос идёт без триггеров изменений: иначе подписчики потока получили бы
+    # ложные deleted/created, а сводки использования пересчитались бы впустую
+    await set_change_triggers(conn, RESERVATION_DEFAULT_PARTITION, enabled=False)
+    await conn.execute(sa.text(f"""
+        CREATE TEMP TABLE reservations_moving ON COMMIT DROP AS
+        WITH moved AS (
+            DELETE FROM {RESERVATION_DEFAULT_PARTITION}
+            WHERE reservation_time >= {lower} AND reservation_time < {upper}
+            RETURNING id, customer_name, table_id, reservation_time, duration_minutes
+        )
+        SELECT * FROM moved
+    """))
+    await conn.execute(sa.text(f"CREATE TABLE {name} PARTITION OF reservations FOR VALUES FROM ({lower}) TO ({upper})"))
+    await conn.execute(sa.text(partition_overlap_constraint(name)))
+    await set_change_triggers(conn, name, enabled=False)
+    moved = await conn.execute(sa.text("""
+        INSERT INTO reservations (id, customer_name, table_id, reservation_time, duration_minutes)
+        SELECT id, customer_name, table_id, reservation_time, duration_minutes FROM reservations_moving
+    """))
+    await conn.execute(sa.text("DROP TABLE reservations_moving"))
+    await set_change_triggers(conn, name, enabled=True)
+    await set_change_triggers(conn, RESERVATION_DEFAULT_PARTITION, enabled=True)
+    logger.info("Создана партиция %s, перенесено броней: %s", name, moved.rowcount)
+    return True
+
+
+async def archive_partition(conn: AsyncConnection, name: str, mode: RetentionMode, archive_schema: str):
+    await conn.execute(MAINTENANCE_LOCK)
+    await conn.execute(sa.text(f"ALTER TABLE reservations DETACH PARTITION {name}"))
+    if mode == RetentionMode.drop:
+        await conn.execute(sa.text(f"DROP TABLE {name}"))
+    else:
+        await conn.execute(sa.text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+        await conn.execute(sa.text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+    logger.info("Партиция %s: %s", name, mode.value)
+
+
+async def create_partitions(engine: AsyncEngine, months: Iterable[date]) -> list[str]:
+    """Создание недостающих партиций, каждая в своей короткой транзакции."""
+    created = []
+    for month in sorted(set(months)):
+        async with engine.begin() as conn:
+            if await create_partition(conn, month):
+                created.append(partition_name(month))
+    return created
+
+
+def future_months(months_ahead: int, today: Optional[date] = None) -> list[date]:
+    """Текущий и следующие months_ahead месяцев."""
+    current = month_start(today or datetime.now(timezone.utc).date())
+    return [add_months(current, n) for n in range(months_ahead + 1)]
+
+
+async def create_future_partitions(engine: AsyncEngine, months_ahead: int, today: Optional[date] = None) -> list[str]:
+    """Партиции текущего и следующих months_ahead месяцев."""
+    async with engine.connect() as conn:
+        if not (await conn.execute(IS_PARTITIONED)).scalar():
+            logger.warning("Таблица reservations не секционирована: примените миграции (alembic upgrade head)")
+            return []
+    return await create_partitions(engine, future_months(months_ahead, today))
+
+
+async def maintain_partitions(
+    engine: AsyncEngine,
+    months_ahead: int,
+    retention_months: int,
+    mode: RetentionMode,
+    archive_schema: str,
+    today: Optional[date] = None,
+) -> dict:
+    """Полный цикл обслуживания: будущие партиции, разбор партиции по умолчанию
+    на месячные и вывод из таблицы партиций старше retention_months (0 — хранить всё)."""
+    today = today or datetime.now(timezone.utc).date()
+    async with engine.connect() as conn:
+        stray_months = (await conn.execute(DEFAULT_PARTITION_MONTHS)).scalars().all()
+    created = await create_future_partitions(engine, months_ahead, today)
+    created += await create_partitions(engine, stray_months)
+
+    archived = []
+    if retention_months > 0:
+        cutoff = add_months(month_start(today), -retention_months)
+        async with engine.connect() as conn:
+            partitions = await list_partitions(conn)
+        for name in sorted(partitions):
+            month = partition_month(name)
+            if month is not None and month < cutoff:
+                async with engine.begin() as conn:
+                    await archive_partition(conn, name, mode, archive_schema)
+                archived.append(name)
+        if archived:
+            # Триггеры при отсоединении не срабатывают: кэши ответов сбрасываем явно
+            async with engine.begin() as conn:
+                await conn.execute(
+                    sa.select(sa.func.pg_notify(RESERVATION_CHANGES_CHANNEL, json.dumps({"op": "ARCHIVE"})))
+                )
+    return {"created": created, "archived": archived}
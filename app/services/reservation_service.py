@@ -1,97 +1,420 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.future import select
-from app.models.reservation import Reservation
+from app.core.dialects import UTCDateTime, add_minutes, dialect_name
+from app.core.metrics import RESERVATION_CONFLICTS, RESERVATIONS_CREATED, TABLE_NOT_FOUND
+from app.core.response_cache import ResponseCache
+from app.core.serialization import response_fields, rows_to_ndjson
+from app.database import use_autocommit
+from app.models.reservation import (
+    MAX_DURATION_MINUTES,
+    RESERVATION_OVERLAP_CONSTRAINT,
+    Reservation,
+    overlaps_reservation,
+)
 from app.models.table import Table
-from app.schemas.reservation import ReservationCreate
+from app.schemas.reservation import (
+    BulkItemStatus,
+    BulkMode,
+    ExportFormat,
+    ReservationBulkCreate,
+    ReservationBulkItemResult,
+    ReservationBulkResponse,
+    ReservationCreate,
+    ReservationResponse,
+)
+from app.services.availability_index import Verdict, availability_index
+from app.services.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
 from fastapi import HTTPException, status
-from sqlalchemy import and_, delete,  text
-from datetime import datetime, timedelta
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import sqlalchemy as sa
+import csv
+import io
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Готовые ответы GET /reservations/, сбрасываются при любом изменении броней
+reservations_cache = ResponseCache()
+
+# SQLSTATE exclusion_violation и foreign_key_violation
+EXCLUSION_VIOLATION = "23P01"
+FOREIGN_KEY_VIOLATION = "23503"
+# Сообщение SQLite о нарушении внешнего ключа
+SQLITE_FOREIGN_KEY_VIOLATION = "FOREIGN KEY constraint failed"
+
+# Колонки и размер пачки для потоковой выгрузки
+EXPORT_COLUMNS = ("id", "customer_name", "table_id", "reservation_time", "duration_minutes")
+EXPORT_CHUNK_SIZE = 1000
+
+# Колонки списка броней в порядке полей ReservationResponse: строки запроса
+# сериализуются сразу в JSON (app/core/serialization.py), без ORM-объектов
+RESERVATION_LIST_FIELDS = response_fields(ReservationResponse)
+RESERVATION_LIST_COLUMNS = tuple(getattr(Reservation, field) for field in RESERVATION_LIST_FIELDS)
+
+
+def overlapping_reservation_exists(table_id, start, end):
+    """EXISTS по броням стола, пересекающимся с [start, end). Единое определение
+    пересечения для проверки доступности, пакетной вставки и поиска свободных столов."""
+    return sa.exists().where(
+        Reservation.table_id == table_id,
+        overlaps_reservation(start, end),
+        # Условия по ключу секционирования: проверяются только месяцы, где может
+        # начинаться пересекающаяся бронь
+        Reservation.reservation_time > add_minutes(start, -MAX_DURATION_MINUTES),
+        Reservation.reservation_time < end,
+    )
+
+
 # Функция проверки доступности стола
 async def check_table_availability(db: AsyncSession, table_id: int, reservation_time: datetime, duration_minutes: int):
     end_time = reservation_time + timedelta(minutes=duration_minutes)
-
-    # Выполняем запрос для поиска конфликтующих броней
     result = await db.execute(
-        select(Reservation).filter(
-            Reservation.table_id == table_id,
-            and_(
-                Reservation.reservation_time < end_time,
-                # Используем SQL-выражение для вычисления конца брони
-                (Reservation.reservation_time + sa.text("INTERVAL '1 minute' * duration_minutes")) > reservation_time
-            )
-        )
+        select(overlapping_reservation_exists(table_id, reservation_time, end_time))
     )
-
-    conflicting_reservations = result.scalars().all()
-    is_available = len(conflicting_reservations) == 0
+    is_available = not result.scalar()
 
     if not is_available:
-        logger.warning(f"Конфликт брони для стола {table_id} на время {reservation_time}")
+        RESERVATION_CONFLICTS.inc("check")
+        logger.warning("Конфликт брони для стола %s на время %s", table_id, reservation_time)
     return is_available
 
+
+def is_overlap_violation(exc: IntegrityError) -> bool:
+    """Нарушено ли ограничение на пересечение броней. SQLite кодов SQLSTATE
+    не знает: его триггер прерывает вставку сообщением с именем ограничения."""
+    return getattr(exc.orig, "sqlstate", None) == EXCLUSION_VIOLATION or str(exc.orig) == RESERVATION_OVERLAP_CONSTRAINT
+
+
+def is_foreign_key_violation(exc: IntegrityError) -> bool:
+    """Ссылается ли бронь на несуществующий стол."""
+    return getattr(exc.orig, "sqlstate", None) == FOREIGN_KEY_VIOLATION or str(exc.orig) == SQLITE_FOREIGN_KEY_VIOLATION
+
+
+def _table_not_found(table_id: int) -> HTTPException:
+    TABLE_NOT_FOUND.inc()
+    logger.error("Стол с ID %s не найден", table_id)
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Table with id {table_id} not found"
+    )
+
+
+def _table_already_reserved(table_id: int, reservation_time: datetime, source: str) -> HTTPException:
+    RESERVATION_CONFLICTS.inc(source)
+    logger.error("Стол %s уже забронирован на время %s", table_id, reservation_time)
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Table is already reserved for the selected time."
+    )
+
+def _filter_reservations(query, table_id: Optional[int], time_from: Optional[datetime], time_to: Optional[datetime]):
+    """Общие фильтры списка и выгрузки броней."""
+    if table_id is not None:
+        query = query.where(Reservation.table_id == table_id)
+    if time_from is not None:
+        query = query.where(Reservation.reservation_time >= time_from)
+    if time_to is not None:
+        query = query.where(Reservation.reservation_time < time_to)
+    return query
+
+
+def _encode_export_chunk(rows, export_format: ExportFormat, with_header: bool = False) -> bytes:
+    """Кодирование пачки строк выгрузки в NDJSON или CSV."""
+    if export_format == ExportFormat.csv:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if with_header:
+            writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow((row.id, row.customer_name, row.table_id, row.reservation_time.isoformat(), row.duration_minutes))
+        return buffer.getvalue().encode()
+    return rows_to_ndjson(rows, EXPORT_COLUMNS)
+
+
+def _check_batch_query(items: list[ReservationCreate]):
+    """Один запрос, проверяющий весь пакет по базе: существование стола
+    и пересечение с уже сохранёнными бронями. Пересечения внутри пакета
+    разбирает _resolve_batch."""
+    batch = sa.values(
+        sa.column("idx", sa.Integer),
+        sa.column("table_id", sa.Integer),
+        sa.column("reservation_time", UTCDateTime),
+        sa.column("duration_minutes", sa.Integer),
+        name="batch",
+    ).data([
+        (idx, item.table_id, item.reservation_time, item.duration_minutes)
+        for idx, item in enumerate(items)
+    ])
+    end_time = add_minutes(batch.c.reservation_time, batch.c.duration_minutes)
+    return select(
+        batch.c.idx,
+        sa.exists().where(Table.id == batch.c.table_id).label("table_exists"),
+        overlapping_reservation_exists(batch.c.table_id, batch.c.reservation_time, end_time).label("conflict"),
+    ).order_by(batch.c.idx)
+
+
+def _utc(value: datetime) -> datetime:
+    # Время без смещения база считает UTC (UTCDateTime); так же и здесь,
+    # чтобы его можно было сравнивать со временем со смещением
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _resolve_batch(items: list[ReservationCreate], checks) -> list[BulkItemStatus]:
+    """Статусы броней пакета по результатам _check_batch_query. Брони пакета
+    принимаются по порядку: бронь конфликтует только с уже принятыми, поэтому
+    отклонённая бронь не мешает следующим."""
+    accepted: dict[int, list[tuple[datetime, datetime]]] = {}
+    statuses = []
+    for item, check in zip(items, checks):
+        if not check.table_exists:
+            statuses.append(BulkItemStatus.table_not_found)
+            continue
+        start = _utc(item.reservation_time)
+        end = start + timedelta(minutes=item.duration_minutes)
+        periods = accepted.setdefault(item.table_id, [])
+        if check.conflict or any(other_start < end and other_end > start for other_start, other_end in periods):
+            statuses.append(BulkItemStatus.conflict)
+            continue
+        periods.append((start, end))
+        statuses.append(BulkItemStatus.created)
+    return statuses
+
+
+def _create_query(data: ReservationCreate, dialect: str = "postgresql"):
+    """INSERT ... SELECT одним запросом: бронь вставляется, только если стол есть
+    и слот свободен, а флаги проверок возвращаются вместе с созданной строкой,
+    чтобы отличить отсутствующий стол от конфликта без повторного запроса.
+
+    SQLite не поддерживает INSERT внутри CTE. Там вставка простая: отсутствующий
+    стол и пересечение отклоняют внешний ключ и триггер, а писатель в базе
+    один, так что гонки между проверкой и вставкой нет."""
+    values = data.model_dump()
+    columns = Reservation.__table__.c
+    if dialect == "sqlite":
+        return (
+            insert(Reservation)
+            .values(**values)
+            .returning(sa.true().label("table_exists"), sa.false().label("conflict"), columns.id, *(columns[name] for name in values))
+        )
+    checked = select(
+        sa.exists().where(Table.id == data.table_id).label("table_exists"),
+        overlapping_reservation_exists(
+            data.table_id, data.reservation_time, data.reservation_time + timedelta(minutes=data.duration_minutes)
+        ).label("conflict"),
+    ).cte("checked")
+    inserted = (
+        insert(Reservation)
+        .from_select(
+            list(values),
+            select(*(sa.literal(value, columns[name].type) for name, value in values.items()))
+            .where(checked.c.table_exists, sa.not_(checked.c.conflict)),
+        )
+        .returning(columns.id, *(columns[name] for name in values))
+        .cte("inserted")
+    )
+    return select(checked.c.table_exists, checked.c.conflict, *inserted.c).select_from(
+        checked.outerjoin(inserted, sa.true())
+    )
+
+
+async def _missing_tables(db: AsyncSession, table_ids: set[int]) -> set[int]:
+    """Столы из table_ids, которых нет в базе."""
+    existing = await db.scalars(select(Table.id).where(Table.id.in_(table_ids)))
+    return table_ids - set(existing)
+
+
 class ReservationService:
-    async def get(self, db: AsyncSession):
-        """Получение списка всех броней."""
-        logger.info("Получение списка всех броней")
-        result = await db.execute(select(Reservation))
-        reservations = result.scalars().all()
-        logger.debug(f"Найдено {len(reservations)} броней")
-        return reservations
+    async def get(
+        self,
+        db: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        table_id: Optional[int] = None,
+        time_from: Optional[datetime] = None,
+        time_to: Optional[datetime] = None,
+    ):
+        """Страница броней в порядке (reservation_time, id) и курсор следующей страницы.
+        Строки — кортежи колонок RESERVATION_LIST_FIELDS, а не ORM-объекты."""
+        logger.info("Получение списка броней")
+        query = _filter_reservations(select(*RESERVATION_LIST_COLUMNS), table_id, time_from, time_to)
+        if cursor is not None:
+            # Keyset: продолжаем строго после последней строки предыдущей страницы
+            last_time, last_id = decode_cursor(cursor, datetime.fromisoformat, int)
+            query = query.where(sa.tuple_(Reservation.reservation_time, Reservation.id) > (last_time, last_id))
+        query = query.order_by(Reservation.reservation_time, Reservation.id).limit(limit + 1)
+
+        result = await db.execute(query)
+        reservations = result.all()
+        next_cursor = None
+        if len(reservations) > limit:
+            reservations = reservations[:limit]
+            last = reservations[-1]
+            next_cursor = encode_cursor(last.reservation_time.isoformat(), last.id)
+        logger.debug("Найдено %s броней", len(reservations))
+        return reservations, next_cursor
+
+    async def export(
+        self,
+        session_factory: sessionmaker,
+        export_format: ExportFormat = ExportFormat.ndjson,
+        table_id: Optional[int] = None,
+        time_from: Optional[datetime] = None,
+        time_to: Optional[datetime] = None,
+    ):
+        """Потоковая выгрузка броней через серверный курсор пачками по EXPORT_CHUNK_SIZE строк."""
+        logger.info("Выгрузка броней в формате %s", export_format.value)
+        query = _filter_reservations(
+            select(*(getattr(Reservation, column) for column in EXPORT_COLUMNS)), table_id, time_from, time_to
+        ).order_by(Reservation.reservation_time, Reservation.id)
+
+        exported = 0
+        async with session_factory() as session:
+            result = await session.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+            if export_format == ExportFormat.csv:
+                yield _encode_export_chunk([], export_format, with_header=True)
+            async for rows in result.partitions():
+                yield _encode_export_chunk(rows, export_format)
+                exported += len(rows)
+        logger.info("Выгружено %s броней", exported)
 
     async def create(self, reservation_data: ReservationCreate, db: AsyncSession):
         """Создание новой брони с проверкой доступности стола."""
-        logger.info(f"Создание новой брони: {reservation_data}")
-        reservation = Reservation(**reservation_data.model_dump())
+        logger.info("Создание новой брони: стол %s на %s", reservation_data.table_id, reservation_data.reservation_time)
+        end_time = reservation_data.reservation_time + timedelta(minutes=reservation_data.duration_minutes)
 
-        # Проверка существования стола
-        result = await db.execute(select(Table).filter(Table.id == reservation.table_id))
-        table = result.scalar_one_or_none()
+        # Очевидные отказы отсекает индекс в памяти, не обращаясь к базе
+        verdict = availability_index.check(reservation_data.table_id, reservation_data.reservation_time, end_time)
+        if verdict == Verdict.unknown_table:
+            raise _table_not_found(reservation_data.table_id)
+        if verdict == Verdict.conflict:
+            raise _table_already_reserved(reservation_data.table_id, reservation_data.reservation_time, "index")
 
-        if table is None:
-            logger.error(f"Стол с ID {reservation.table_id} не найден")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Table with id {reservation.table_id} not found"
-            )
+        # Проверки и вставка — один запрос вне транзакции. Гонку между проверкой
+        # и вставкой ловят ограничения базы, их нарушения дают те же 400 и 404
+        await use_autocommit(db)
+        try:
+            row = (await db.execute(_create_query(reservation_data, dialect_name(db)))).one()
+        except IntegrityError as exc:
+            await db.rollback()
+            if is_overlap_violation(exc):
+                raise _table_already_reserved(reservation_data.table_id, reservation_data.reservation_time, "constraint")
+            if is_foreign_key_violation(exc):
+                raise _table_not_found(reservation_data.table_id)
+            raise
+        if not row.table_exists:
+            raise _table_not_found(reservation_data.table_id)
+        if row.conflict:
+            raise _table_already_reserved(reservation_data.table_id, reservation_data.reservation_time, "check")
 
-        # Проверка доступности стола
-        if not await check_table_availability(
-            db, reservation.table_id, reservation.reservation_time, reservation.duration_minutes
-        ):
-            logger.error(f"Стол {reservation.table_id} уже забронирован на время {reservation.reservation_time}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Table is already reserved for the selected time."
+        availability_index.add_reservation(row.id, row.table_id, row.reservation_time, end_time)
+        reservations_cache.invalidate()
+        RESERVATIONS_CREATED.inc("single")
+        logger.info("Бронь успешно создана: ID=%s", row.id)
+        return row
+
+    async def bulk_create(self, bulk_data: ReservationBulkCreate, db: AsyncSession):
+        """Массовое создание броней: одна проверка пакета и одна многострочная вставка."""
+        items = bulk_data.items
+        logger.info("Массовое создание броней: %s шт., режим %s", len(items), bulk_data.mode.value)
+
+        statuses = _resolve_batch(items, (await db.execute(_check_batch_query(items))).all())
+        accepted = [idx for idx, item_status in enumerate(statuses) if item_status == BulkItemStatus.created]
+        if bulk_data.mode == BulkMode.atomic and len(accepted) < len(items):
+            # Пакет отклонён целиком: корректные брони не сохраняются
+            statuses = [
+                BulkItemStatus.skipped if item_status == BulkItemStatus.created else item_status
+                for item_status in statuses
+            ]
+            accepted = []
+
+        created = {}
+        while accepted:
+            try:
+                # Многострочный INSERT ... RETURNING; порядок строк совпадает с порядком параметров
+                result = await db.scalars(
+                    insert(Reservation).returning(Reservation, sort_by_parameter_order=True),
+                    [items[idx].model_dump() for idx in accepted],
+                )
+                created = dict(zip(accepted, result.all()))
+                await db.commit()
+                break
+            except IntegrityError as exc:
+                await db.rollback()
+                if is_overlap_violation(exc):
+                    # Между проверкой и вставкой кто-то занял один из слотов
+                    logger.error("Конкурентный конфликт при массовом создании броней")
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="Some slots were reserved concurrently, retry the batch."
+                    )
+                if not is_foreign_key_violation(exc):
+                    raise
+                # Между проверкой и вставкой удалили стол: как и в create, это 404,
+                # а в режиме best_effort — отказ только броням этого стола
+                missing = await _missing_tables(db, {items[idx].table_id for idx in accepted})
+                if not missing:
+                    raise
+                if bulk_data.mode == BulkMode.atomic:
+                    raise _table_not_found(min(missing))
+                for idx in accepted:
+                    if items[idx].table_id in missing:
+                        statuses[idx] = BulkItemStatus.table_not_found
+                accepted = [idx for idx in accepted if statuses[idx] == BulkItemStatus.created]
+
+        if created:
+            reservations_cache.invalidate()
+            for reservation in created.values():
+                availability_index.add_reservation(
+                    reservation.id,
+                    reservation.table_id,
+                    reservation.reservation_time,
+                    reservation.reservation_time + timedelta(minutes=reservation.duration_minutes),
+                )
+
+        RESERVATIONS_CREATED.inc("bulk", amount=len(created))
+        RESERVATION_CONFLICTS.inc("bulk", amount=statuses.count(BulkItemStatus.conflict))
+        TABLE_NOT_FOUND.inc(amount=statuses.count(BulkItemStatus.table_not_found))
+        results = [
+            ReservationBulkItemResult(
+                index=idx,
+                status=item_status,
+                reservation=ReservationResponse.model_validate(created[idx]) if idx in created else None,
             )
+            for idx, item_status in enumerate(statuses)
+        ]
+        logger.info("Создано броней: %s из %s", len(created), len(items))
+        return ReservationBulkResponse(created=len(created), results=results)
 
-        # Добавление и сохранение брони
-        db.add(reservation)
-        await db.commit()
-        await db.refresh(reservation)
-        logger.info(f"Бронь успешно создана: ID={reservation.id}")
-        return reservation
+    async def warm_up(self, db: AsyncSession):
+        """Прогон запросов горячего пути (список, создание, удаление) при прогреве пула.
+        Создание и удаление адресованы несуществующим столу и брони, поэтому данные
+        не меняются; транзакцию откатывает вызывающий."""
+        await self.get(db)
+        probe = ReservationCreate(customer_name="", table_id=0, reservation_time=datetime.now(timezone.utc), duration_minutes=1)
+        await db.execute(_create_query(probe, dialect_name(db)))
+        await db.execute(delete(Reservation).where(Reservation.id == 0).returning(Reservation.id))
 
     async def delete(self, reservation_id: int, db: AsyncSession):
         """Удаление брони по ID с проверкой существования."""
-        logger.info(f"Удаление брони с ID={reservation_id}")
-        result = await db.execute(select(Reservation).filter(Reservation.id == reservation_id))
-        reservation = result.scalar_one_or_none()
-
-        if reservation is None:
-            logger.error(f"Бронь с ID {reservation_id} не найдена")
+        logger.info("Удаление брони с ID=%s", reservation_id)
+        await use_autocommit(db)
+        result = await db.execute(
+            delete(Reservation).where(Reservation.id == reservation_id).returning(Reservation.id)
+        )
+        if result.scalar_one_or_none() is None:
+            logger.error("Бронь с ID %s не найдена", reservation_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Reservation with id {reservation_id} not found"
             )
 
-        await db.execute(delete(Reservation).where(Reservation.id == reservation_id))
-        await db.commit()
-        logger.info(f"Бронь с ID={reservation_id} успешно удалена")
+        availability_index.remove_reservation(reservation_id)
+        reservations_cache.invalidate()
+        logger.info("Бронь с ID=%s успешно удалена", reservation_id)
         return {"message": f"Reservation {reservation_id} deleted"}
 
 reservation_service = ReservationService()
\ No newline at end of file
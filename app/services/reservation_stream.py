@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+from collections import Counter, deque
+from datetime import datetime
+from typing import AsyncIterator, NamedTuple, Optional
+
+import orjson
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.metrics import STREAM_CLIENTS_DROPPED, GaugeCallback
+from app.core.notifications import NotificationListener
+from app.database import settings
+from app.models.reservation import RESERVATION_CHANGES_CHANNEL
+from app.models.table import Table, TABLE_CHANGES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# Сообщение, которым поток проверяет, что клиент ещё на связи
+PING = '{"type":"ping"}'
+
+
+class StreamEvent(NamedTuple):
+    # Номер из reservation_event_seq; у reset номера нет
+    event_id: Optional[int]
+    table_id: Optional[int]
+    type: str
+    # JSON события, закодированный один раз для всех подписчиков
+    data: str
+
+
+# Пропущенные события восстановить нельзя: клиенту нужно перечитать GET /reservations/
+RESET = StreamEvent(None, None, "reset", '{"type":"reset"}')
+
+
+def format_sse(event: Optional[StreamEvent]) -> bytes:
+    """Событие в формате text/event-stream; None — комментарий-heartbeat."""
+    if event is None:
+        return b": ping\n\n"
+    if event.event_id is None:
+        return f"event: {event.type}\ndata: {event.data}\n\n".encode()
+    return f"id: {event.event_id}\nevent: {event.type}\ndata: {event.data}\n\n".encode()
+
+
+class Subscriber:
+    __slots__ = ("table_id", "location", "queue", "dropped")
+
+    def __init__(self, table_id: Optional[int], location: Optional[str], queue_size: int):
+        self.table_id = table_id
+        self.location = location
+        # None в очереди — поток подписчика закрыт, потому что он отстал
+        self.queue: asyncio.Queue[Optional[StreamEvent]] = asyncio.Queue(queue_size)
+        self.dropped = False
+
+
+class ReservationStream:
+    """Раздача изменений броней подписчикам /reservations/stream.
+
+    Источник — то же LISTEN-соединение воркера, что у кэшей и индекса доступности:
+    каждое уведомление разбирается и кодируется один раз, а затем раскладывается
+    по очередям подписчиков с подходящим фильтром. Очередь ограничена; клиент,
+    не успевающий её разбирать, отключается, а не копит память воркера.
+
+    Последние buffer_size событий хранятся в кольцевом буфере. Номера событий
+    выдаёт последовательность в базе, а Postgres доставляет уведомления всем
+    слушателям в порядке фиксации транзакций, поэтому переподключившийся клиент
+    может продолжить с last_event_id в любом воркере. Если такого события в
+    буфере нет, клиент получает reset и перечитывает список сам.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int, heartbeat_seconds: float):
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self._buffer: deque[StreamEvent] = deque(maxlen=buffer_size)
+        self._subscribers: set[Subscriber] = set()
+        # Зал каждого стола для фильтра location
+        self._locations: dict[int, str] = {}
+        self._engine: Optional[AsyncEngine] = None
+        self._counters = Counter()
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subscribers), "buffered": len(self._buffer), **self._counters}
+
+    # --- Подписчики
+
+    def _matches(self, subscriber: Subscriber, event: StreamEvent) -> bool:
+        if event.table_id is None:
+            return True
+        if subscriber.table_id is not None and subscriber.table_id != event.table_id:
+            return False
+        return subscriber.location is None or self._locations.get(event.table_id) == subscriber.location
+
+    def _since(self, last_event_id: int) -> Optional[list[StreamEvent]]:
+        """События после last_event_id; None — такого события в буфере нет."""
+        missed = []
+        for event in reversed(self._buffer):
+            if event.event_id == last_event_id:
+                missed.reverse()
+                return missed
+            missed.append(event)
+        return None
+
+    def subscribe(
+        self, table_id: Optional[int] = None, location: Optional[str] = None, last_event_id: Optional[int] = None
+    ) -> Subscriber:
+        subscriber = Subscriber(table_id, location, self.queue_size)
+        if last_event_id is not None:
+            missed = self._since(last_event_id)
+            if missed is not None:
+                missed = [event for event in missed if self._matches(subscriber, event)]
+            if missed is None or len(missed) >= self.queue_size:
+                self._counters["resets"] += 1
+                subscriber.queue.put_nowait(RESET)
+            else:
+                self._counters["resumed"] += 1
+                for event in missed:
+                    subscriber.queue.put_nowait(event)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def _offer(self, subscriber: Subscriber, event: StreamEvent):
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Непрочитанное выбрасывается, маркер None завершает поток клиента;
+            # он переподключится с last_event_id и дочитает из буфера
+            self._subscribers.discard(subscriber)
+            subscriber.dropped = True
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+            self._counters["dropped"] += 1
+            STREAM_CLIENTS_DROPPED.inc()
+            logger.warning("Подписчик потока броней отстал на %s событий и отключён", self.queue_size)
+
+    def publish(self, event: StreamEvent):
+        if event.event_id is not None:
+            self._buffer.append(event)
+            self._counters["events"] += 1
+        for subscriber in list(self._subscribers):
+            if self._matches(subscriber, event):
+                self._offer(subscriber, event)
+
+    async def listen(self, subscriber: Subscriber) -> AsyncIterator[Optional[StreamEvent]]:
+        """События подписчика; None — пора отправить heartbeat. Поток завершается,
+        когда подписчик отстал и отключён."""
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat_seconds)
+                except TimeoutError:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                yield event
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def sse(
+        self, table_id: Optional[int] = None, location: Optional[str] = None, last_event_id: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Поток text/event-stream. Подписка оформляется, когда ответ начинает отправляться."""
+        subscriber = self.subscribe(table_id, location, last_event_id)
+        async for event in self.listen(subscriber):
+            yield format_sse(event)
+
+    # --- Уведомления
+
+    def handle_reservation(self, payload: str):
+        change = json.loads(payload)
+        # Служебные уведомления (ARCHIVE при выводе партиций) номера не имеют
+        if "event_id" not in change:
+            return
+        if change["op"] == "INSERT":
+            event_type = "created"
+            reservation = {
+                "id": change["id"],
+                "table_id": change["table_id"],
+                "reservation_time": datetime.fromisoformat(change["reservation_time"]),
+                "duration_minutes": change["duration_minutes"],
+            }
+        else:
+            event_type = "deleted"
+            reservation = {"id": change["id"], "table_id": change["table_id"]}
+        data = orjson.dumps(
+            {"event_id": change["event_id"], "type": event_type, "reservation": reservation}, option=orjson.OPT_UTC_Z
+        ).decode()
+        self.publish(StreamEvent(change["event_id"], change["table_id"], event_type, data))
+
+    def handle_table(self, payload: str):
+        change = json.loads(payload)
+        # Удалённый стол остаётся в словаре: уведомления о каскадно удалённых
+        # бронях могут прийти после уведомления о самом столе
+        if change["op"] in ("INSERT", "UPDATE") and "location" in change:
+            self._locations[change["id"]] = change["location"]
+
+    # --- Жизненный цикл
+
+    def attach(self, listener: NotificationListener, engine: AsyncEngine):
+        self._engine = engine
+        listener.subscribe(RESERVATION_CHANGES_CHANNEL, self.handle_reservation)
+        listener.subscribe(TABLE_CHANGES_CHANNEL, self.handle_table)
+        listener.on_connect(self._on_connect)
+
+    async def _on_connect(self):
+        # Пока LISTEN-соединения не было, события могли потеряться: буфер
+        # больше не непрерывен, и текущим подписчикам нужно перечитать список
+        async with self._engine.connect() as conn:
+            self._locations = dict((await conn.execute(sa.select(Table.id, Table.location))).all())
+        self._buffer.clear()
+        if self._subscribers:
+            self._counters["resets"] += len(self._subscribers)
+            self.publish(RESET)
+        logger.info("Поток броней готов: %s столов", len(self._locations))
+
+
+reservation_stream = ReservationStream(
+    buffer_size=settings.STREAM_BUFFER_SIZE,
+    queue_size=settings.STREAM_QUEUE_SIZE,
+    heartbeat_seconds=settings.STREAM_HEARTBEAT_SECONDS,
+)
+
+GaugeCallback(
+    "reservation_stream_subscribers", "Clients subscribed to /reservations/stream",
+    lambda: len(reservation_stream._subscribers),
+)
@@ -1,36 +1,163 @@
 import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import delete
+from sqlalchemy import delete, insert
+import sqlalchemy as sa
+from app.core.dialects import UTCDateTime, add_minutes
+from app.core.response_cache import ResponseCache
+from app.core.serialization import response_fields
+from app.database import use_autocommit
+from app.models.reservation import MAX_DURATION_MINUTES, RESERVATION_END, Reservation
 from app.models.table import Table
-from app.schemas.table import TableCreate
+from app.schemas.table import TableCreate, TableResponse, FreeSlot
+from app.services.availability_index import availability_index
+from app.services.reservation_service import overlapping_reservation_exists, reservations_cache
+from app.services.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
 
 logger = logging.getLogger(__name__)
 
+# Готовые ответы GET /tables/, сбрасываются при любом изменении столов
+tables_cache = ResponseCache()
+
+# Колонки списка столов в порядке полей TableResponse (см. RESERVATION_LIST_FIELDS)
+TABLE_LIST_FIELDS = response_fields(TableResponse)
+TABLE_LIST_COLUMNS = tuple(getattr(Table, field) for field in TABLE_LIST_FIELDS)
+
 
 class TableService:
-    async def get(self, db: AsyncSession):
-        logger.info("Получение списка всех столиков")
-        result = await db.execute(select(Table))
+    async def get(
+        self,
+        db: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        location: Optional[str] = None,
+        min_seats: Optional[int] = None,
+    ):
+        logger.info("Получение списка столиков")
+        query = select(*TABLE_LIST_COLUMNS)
+        if location is not None:
+            query = query.where(Table.location == location)
+        if min_seats is not None:
+            query = query.where(Table.seats >= min_seats)
+        if cursor is not None:
+            (last_id,) = decode_cursor(cursor, int)
+            query = query.where(Table.id > last_id)
+        query = query.order_by(Table.id).limit(limit + 1)
+
+        result = await db.execute(query)
+        tables = result.all()
+        next_cursor = None
+        if len(tables) > limit:
+            tables = tables[:limit]
+            next_cursor = encode_cursor(tables[-1].id)
+        logger.debug("Найдено %s столиков", len(tables))
+        return tables, next_cursor
+
+    async def get_available(
+        self,
+        db: AsyncSession,
+        start: datetime,
+        duration_minutes: int,
+        min_seats: Optional[int] = None,
+        location: Optional[str] = None,
+    ):
+        logger.info("Поиск свободных столиков на %s, %s мин", start, duration_minutes)
+        # Анти-join по броням: пересечение ищется по GiST-индексу exclusion-ограничения
+        query = select(Table).where(
+            sa.not_(overlapping_reservation_exists(Table.id, start, start + timedelta(minutes=duration_minutes)))
+        )
+        if location is not None:
+            query = query.where(Table.location == location)
+        if min_seats is not None:
+            query = query.where(Table.seats >= min_seats)
+        # Сначала самые маленькие подходящие столики
+        query = query.order_by(Table.seats, Table.id)
+
+        result = await db.execute(query)
         tables = result.scalars().all()
-        logger.debug(f"Найдено {len(tables)} столиков")
+        logger.debug("Свободно %s столиков", len(tables))
         return tables
 
+    async def get_free_slots(
+        self,
+        db: AsyncSession,
+        table_id: int,
+        after: datetime,
+        duration_minutes: int,
+        count: int,
+    ):
+        logger.info("Поиск свободных окон для столика %s после %s", table_id, after)
+        if await db.get(Table, table_id) is None:
+            logger.error("Стол с ID %s не найден", table_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Table with id {table_id} not found"
+            )
+
+        # Брони не пересекаются (exclusion-ограничение), поэтому свободные окна —
+        # это промежуток до первой брони и промежутки между соседними бронями
+        starts = Reservation.reservation_time
+        ends = RESERVATION_END
+        upcoming = (
+            select(starts.label("starts"), ends.label("ends"))
+            .where(
+                Reservation.table_id == table_id,
+                ends > after,
+                Reservation.reservation_time > after - timedelta(minutes=MAX_DURATION_MINUTES),
+            )
+            .cte("upcoming")
+        )
+        windows = sa.union_all(
+            select(
+                sa.literal(after, UTCDateTime).label("window_start"),
+                select(sa.func.min(upcoming.c.starts)).scalar_subquery().label("window_end"),
+            ),
+            select(
+                upcoming.c.ends.label("window_start"),
+                sa.func.lead(upcoming.c.starts).over(order_by=upcoming.c.starts).label("window_end"),
+            ),
+        ).subquery("windows")
+        query = (
+            select(windows.c.window_start, windows.c.window_end)
+            .where(sa.or_(
+                windows.c.window_end.is_(None),
+                windows.c.window_end >= add_minutes(windows.c.window_start, duration_minutes),
+            ))
+            .order_by(windows.c.window_start)
+            .limit(count)
+        )
+
+        result = await db.execute(query)
+        return [FreeSlot(start=row.window_start, end=row.window_end) for row in result]
+
     async def create(self, table_data: TableCreate, db: AsyncSession):
         logger.info("Создание нового столика")
-        table = Table(**table_data.model_dump())
-        db.add(table)
-        await db.commit()
-        await db.refresh(table)
-        logger.debug(f"Создан столик: {table}")
+        # INSERT ... RETURNING вне транзакции: один запрос вместо INSERT, COMMIT и refresh
+        await use_autocommit(db)
+        table = await db.scalar(insert(Table).values(**table_data.model_dump()).returning(Table))
+        availability_index.add_table(table.id)
+        tables_cache.invalidate()
+        logger.debug("Создан столик: %s", table)
         return table
 
     async def delete(self, table_id: int, db: AsyncSession):
-        logger.info(f"Удаление столика с ID={table_id}")
-        stmt = delete(Table).where(Table.id == table_id)
-        await db.execute(stmt)
-        await db.commit()
-        logger.debug(f"Удалён столик с ID={table_id}")
+        logger.info("Удаление столика с ID=%s", table_id)
+        await use_autocommit(db)
+        result = await db.execute(delete(Table).where(Table.id == table_id).returning(Table.id))
+        if result.scalar_one_or_none() is None:
+            logger.error("Стол с ID %s не найден", table_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Table with id {table_id} not found"
+            )
+        availability_index.remove_table(table_id)
+        # Вместе со столом каскадно удаляются и его брони
+        tables_cache.invalidate()
+        reservations_cache.invalidate()
+        logger.debug("Удалён столик с ID=%s", table_id)
 
 
 table_service = TableService()
@@ -0,0 +1,117 @@
+"""Нагрузочные бенчмарки горячего пути бронирования.
+
+    python -m benchmarks seed --tables 5000 --reservations-per-table 400
+    python -m benchmarks run --concurrency 64 --output result.json --baseline benchmarks/baseline.json
+    python -m benchmarks compare result.json benchmarks/baseline.json
+    python -m benchmarks coldstart --runs 5
+    python -m benchmarks serialization --rows 100000
+
+Сервер запускается отдельно (uvicorn app.main:app) на той же базе, что и seed;
+coldstart сам запускает и останавливает сервер; serialization работает
+с базой напрямую, без сервера.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+
+from app.database import settings
+from benchmarks.coldstart import cold_start
+from benchmarks.compare import compare
+from benchmarks.load import SCENARIOS, load_workload, run
+from benchmarks.seed import seed
+from benchmarks.serialization import serialization
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def _write_json(data: dict, path: str | None):
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if path:
+        Path(path).write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+def _check(report: dict, baseline_path: Path, tolerance: float) -> int:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    regressions = compare(report, baseline, tolerance)
+    for regression in regressions:
+        print(f"РЕГРЕССИЯ: {json.dumps(regression, ensure_ascii=False)}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="пересоздать схему и заполнить базу")
+    seed_parser.add_argument("--tables", type=int, default=5000)
+    seed_parser.add_argument("--reservations-per-table", type=int, default=400)
+    seed_parser.add_argument("--no-reset", action="store_true", help="дописать данные, не пересоздавая схему")
+
+    run_parser = commands.add_parser("run", help="прогнать сценарии против запущенного сервера")
+    run_parser.add_argument("--base-url", default="http://localhost:8000")
+    run_parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    run_parser.add_argument("--requests", type=int, default=5000, help="запросов на сценарий")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--warmup", type=int, default=200, help="запросов на прогрев, не попадают в отчёт")
+    run_parser.add_argument("--hot-tables", type=int, default=10, help="столов под конкурентные брони")
+    run_parser.add_argument("--slots", type=int, default=48, help="часовых слотов под конкурентные брони")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", help="файл для JSON-отчёта")
+    run_parser.add_argument("--baseline", type=Path, help="сравнить с базовым отчётом")
+    run_parser.add_argument("--save-baseline", action="store_true", help=f"сохранить отчёт как {DEFAULT_BASELINE.name}")
+    run_parser.add_argument("--tolerance", type=float, default=0.15, help="допустимое ухудшение, доля")
+
+    compare_parser = commands.add_parser("compare", help="сравнить отчёт с базовым")
+    compare_parser.add_argument("report", type=Path)
+    compare_parser.add_argument("baseline", type=Path, nargs="?", default=DEFAULT_BASELINE)
+    compare_parser.add_argument("--tolerance", type=float, default=0.15)
+
+    coldstart_parser = commands.add_parser("coldstart", help="время от запуска сервера до первого ответа")
+    coldstart_parser.add_argument("--port", type=int, default=8765)
+    coldstart_parser.add_argument("--runs", type=int, default=5)
+    coldstart_parser.add_argument("--output", help="файл для JSON-отчёта")
+
+    serialization_parser = commands.add_parser("serialization", help="строк в секунду списка броней: ORM против Core")
+    serialization_parser.add_argument("--rows", type=int, default=100_000)
+    serialization_parser.add_argument("--runs", type=int, default=3)
+    serialization_parser.add_argument("--output", help="файл для JSON-отчёта")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+
+    if args.command == "seed":
+        _write_json(asyncio.run(seed(args.database_url, args.tables, args.reservations_per_table, not args.no_reset)), None)
+        return 0
+
+    if args.command == "coldstart":
+        _write_json(asyncio.run(cold_start(args.database_url, args.port, args.runs)), args.output)
+        return 0
+
+    if args.command == "serialization":
+        _write_json(asyncio.run(serialization(args.database_url, args.rows, args.runs)), args.output)
+        return 0
+
+    if args.command == "compare":
+        return _check(json.loads(args.report.read_text(encoding="utf-8")), args.baseline, args.tolerance)
+
+    async def run_all() -> dict:
+        deletes = args.requests if "delete" in args.scenarios else 0
+        workload = await load_workload(args.database_url, args.hot_tables, args.slots, deletes, args.seed)
+        return await run(args.base_url, workload, tuple(args.scenarios), args.requests, args.concurrency, args.warmup)
+
+    report = asyncio.run(run_all())
+    _write_json(report, args.output)
+    if args.save_baseline:
+        DEFAULT_BASELINE.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    if args.baseline:
+        return _check(report, args.baseline, args.tolerance)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+from benchmarks.load import percentile
+
+# Интервал опроса /health/ready при ожидании готовности
+POLL_INTERVAL = 0.01
+
+
+async def _wait_ready(client: httpx.AsyncClient, process, timeout: float) -> float:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.returncode is not None:
+            raise RuntimeError(f"server exited with code {process.returncode} before becoming ready")
+        try:
+            if (await client.get("/health/ready")).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(POLL_INTERVAL)
+    raise TimeoutError(f"server not ready in {timeout} s")
+
+
+async def cold_start(database_url: str, port: int, runs: int, timeout: float = 60.0) -> dict:
+    """Время от запуска процесса uvicorn до готовности и до первого ответа GET /tables/."""
+    env = {**os.environ, "DATABASE_URL": database_url}
+    ready, first_response = [], []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=5.0) as client:
+        for _ in range(runs):
+            started = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                env=env, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+            )
+            try:
+                ready_at = await _wait_ready(client, process, timeout)
+                response = await client.get("/tables/", params={"limit": 1})
+                response.raise_for_status()
+                ready.append(ready_at - started)
+                first_response.append(time.perf_counter() - started)
+            finally:
+                process.terminate()
+                await process.wait()
+
+    def summary(values: list[float]) -> dict:
+        values = sorted(values)
+        return {
+            "min_ms": round(1000 * values[0], 1),
+            "p50_ms": round(1000 * percentile(values, 0.5), 1),
+            "max_ms": round(1000 * values[-1], 1),
+        }
+
+    return {"runs": runs, "ready": summary(ready), "first_response": summary(first_response)}
@@ -0,0 +1,34 @@
+# Показатели, рост которых — регрессия, и показатели, падение которых — регрессия
+HIGHER_IS_WORSE = ("p50", "p95", "p99")
+LOWER_IS_WORSE = ("throughput_rps",)
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """Регрессии отчёта относительно базового: ухудшения больше чем на tolerance (доля)."""
+    regressions = []
+    for name, current in report["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if reference is None:
+            continue
+        checks = [(metric, current["latency_ms"][metric], reference["latency_ms"][metric], 1) for metric in HIGHER_IS_WORSE]
+        checks += [(metric, current[metric], reference[metric], -1) for metric in LOWER_IS_WORSE]
+        for metric, value, base, direction in checks:
+            if not base:
+                continue
+            change = (value - base) / base
+            if change * direction > tolerance:
+                regressions.append({
+                    "scenario": name,
+                    "metric": metric,
+                    "baseline": base,
+                    "current": value,
+                    "change_pct": round(100 * change, 1),
+                })
+        if current["unexpected"] > reference.get("unexpected", 0):
+            regressions.append({
+                "scenario": name,
+                "metric": "unexpected",
+                "baseline": reference.get("unexpected", 0),
+                "current": current["unexpected"],
+            })
+    return regressions
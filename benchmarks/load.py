@@ -0,0 +1,181 @@
+import asyncio
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+import httpx
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models import Reservation, Table
+
+# Сценарии по умолчанию в порядке запуска: удаления идут последними, чтобы не
+# менять данные для остальных
+SCENARIOS = ("create_contention", "list_by_table", "list_page", "delete")
+
+# Запрос сценария: метод, путь и именованные аргументы httpx
+RequestSpec = tuple[str, str, dict]
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Перцентиль по ближайшему рангу."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(fraction * len(sorted_values) + 0.5 - 1e-9))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ScenarioResult:
+    def __init__(self, name: str, expected: set[int]):
+        self.name = name
+        self.expected = expected
+        self.latencies: list[float] = []
+        self.statuses: Counter = Counter()
+        self.seconds = 0.0
+
+    def record(self, latency: float, status: str):
+        self.latencies.append(latency)
+        self.statuses[status] += 1
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "seconds": round(self.seconds, 3),
+            "throughput_rps": round(count / self.seconds, 1) if self.seconds else 0.0,
+            "latency_ms": {
+                "p50": round(1000 * percentile(latencies, 0.50), 2),
+                "p95": round(1000 * percentile(latencies, 0.95), 2),
+                "p99": round(1000 * percentile(latencies, 0.99), 2),
+                "max": round(1000 * latencies[-1], 2) if latencies else 0.0,
+                "mean": round(1000 * sum(latencies) / count, 2) if count else 0.0,
+            },
+            "statuses": dict(sorted(self.statuses.items())),
+            "unexpected": sum(n for status, n in self.statuses.items() if not status.isdigit() or int(status) not in self.expected),
+        }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    make_request: Callable[[int], RequestSpec],
+    expected: set[int],
+    requests: int,
+    concurrency: int,
+) -> ScenarioResult:
+    """requests запросов, выполняемых concurrency воркерами на одном клиенте."""
+    result = ScenarioResult(name, expected)
+    # Общий итератор: каждый номер запроса достаётся ровно одному воркеру
+    numbers = iter(range(requests))
+
+    async def worker():
+        for number in numbers:
+            method, url, kwargs = make_request(number)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            result.record(time.perf_counter() - started, status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+class Workload:
+    """Генераторы запросов сценариев поверх засеянных данных.
+
+    Случайность детерминирована seed-ом, поэтому прогоны на одних данных
+    сравнимы между собой.
+    """
+
+    def __init__(self, table_ids: list[int], delete_ids: list[int], hot_tables: int, slots: int, seed: int):
+        self.table_ids = table_ids
+        self.hot_table_ids = table_ids[:hot_tables]
+        self.delete_ids = delete_ids
+        self.slots = slots
+        self.random = random.Random(seed)
+        # Сетка слотов для конкурентных броней начинается с ближайшей полуночи
+        tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+        self.contention_start = tomorrow.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def create_contention(self, number: int) -> RequestSpec:
+        # Немного горячих столов и слотов: большая часть запросов конфликтует
+        slot = self.contention_start + timedelta(hours=self.random.randrange(self.slots))
+        return "POST", "/reservations/", {"json": {
+            "customer_name": f"Нагрузка {number}",
+            "table_id": self.random.choice(self.hot_table_ids),
+            "reservation_time": slot.isoformat(),
+            "duration_minutes": 60,
+        }}
+
+    def list_by_table(self, number: int) -> RequestSpec:
+        return "GET", "/reservations/", {"params": {"table_id": self.random.choice(self.table_ids), "limit": 50}}
+
+    def list_page(self, number: int) -> RequestSpec:
+        # Разное начало окна, чтобы запросы не обслуживались кэшем ответов
+        time_from = self.contention_start - timedelta(minutes=self.random.randrange(60 * 24 * 30))
+        return "GET", "/reservations/", {"params": {"time_from": time_from.isoformat(), "limit": 100}}
+
+    def delete(self, number: int) -> RequestSpec:
+        return "DELETE", f"/reservations/{self.delete_ids[number]}", {}
+
+    def scenario(self, name: str) -> tuple[Callable[[int], RequestSpec], set[int]]:
+        expected = {
+            "create_contention": {201, 400},
+            "list_by_table": {200},
+            "list_page": {200},
+            "delete": {204},
+        }[name]
+        return getattr(self, name), expected
+
+
+async def load_workload(database_url: str, hot_tables: int, slots: int, deletes: int, seed: int) -> Workload:
+    """Идентификаторы столов и удаляемых броней берутся прямо из базы."""
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            table_ids = (await conn.execute(sa.select(Table.id).order_by(Table.id))).scalars().all()
+            # Удаляются засеянные брони с наибольшими id
+            delete_ids = (await conn.execute(
+                sa.select(Reservation.id).order_by(Reservation.id.desc()).limit(deletes)
+            )).scalars().all()
+    finally:
+        await engine.dispose()
+    if not table_ids:
+        raise RuntimeError("В базе нет столов: сначала выполните python -m benchmarks seed")
+    return Workload(list(table_ids), list(delete_ids), hot_tables, slots, seed)
+
+
+async def run(
+    base_url: str,
+    workload: Workload,
+    scenarios: tuple[str, ...],
+    requests: int,
+    concurrency: int,
+    warmup: int = 0,
+    timeout: Optional[float] = 30.0,
+) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "requests": requests,
+        "scenarios": {},
+    }
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        for name in scenarios:
+            make_request, expected = workload.scenario(name)
+            count = min(requests, len(workload.delete_ids)) if name == "delete" else requests
+            if warmup and name != "delete":
+                await run_scenario(client, name, make_request, expected, warmup, concurrency)
+            result = await run_scenario(client, name, make_request, expected, count, concurrency)
+            report["scenarios"][name] = result.summary()
+    return report
@@ -0,0 +1,117 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.startup import stamp_head
+from app.models import Base
+from app.services.analytics_service import analytics_service
+from app.services.partitions import add_months, create_partitions, month_start
+
+logger = logging.getLogger(__name__)
+
+LOCATIONS = ("зал у окна", "терраса", "основной зал", "веранда", "VIP-зал", "бар")
+
+# Брони одного стола идут подряд с шагом SLOT_STEP_MINUTES и не пересекаются
+SLOT_STEP_MINUTES = 120
+DURATION_CHOICES = (30, 60, 90, 120)
+
+# Брони вставляются пачками по столько столов, чтобы видеть прогресс
+TABLES_PER_BATCH = 500
+
+# Возвращает первый id созданных столов: вставка одним запросом даёт подряд идущие id
+SEED_TABLES = sa.text("""
+WITH inserted AS (
+    INSERT INTO tables (name, seats, location)
+    SELECT 'Стол ' || n, 2 + (n % 5) * 2, (CAST(:locations AS text[]))[1 + n % cardinality(CAST(:locations AS text[]))]
+    FROM generate_series(1, :count) AS n
+    RETURNING id
+)
+SELECT min(id) FROM inserted
+""")
+
+# Время броней размазано вокруг seed_start, чтобы в данных были и прошлые, и будущие
+SEED_RESERVATIONS = sa.text("""
+INSERT INTO reservations (customer_name, table_id, reservation_time, duration_minutes)
+SELECT
+    'Гость ' || t.id || '-' || n,
+    t.id,
+    CAST(:seed_start AS timestamptz) + make_interval(mins => (n * :step + (t.id % 4) * 15)::integer),
+    (CAST(:durations AS integer[]))[1 + (t.id + n) % cardinality(CAST(:durations AS integer[]))]
+FROM tables AS t
+CROSS JOIN generate_series(0, :per_table - 1) AS n
+WHERE t.id >= :first_id AND t.id < :first_id + :batch
+""")
+
+# Триггеры на время заливки отключаются: миллионы уведомлений никому не нужны,
+# сетка броней не пересекается по построению, а агрегаты занятости
+# пересчитываются одним запросом в конце
+SEED_DISABLED_TRIGGERS = (
+    ("tables", "tables_notify"),
+    ("reservations", "reservations_notify"),
+    ("reservations", "reservations_cross_partition"),
+    ("reservations", "reservations_usage"),
+)
+
+
+def seed_start(reservations_per_table: int) -> datetime:
+    """Начало сетки броней: половина слотов в прошлом, половина в будущем."""
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return now - timedelta(minutes=SLOT_STEP_MINUTES * (reservations_per_table // 2))
+
+
+async def seed(database_url: str, tables: int, reservations_per_table: int, reset: bool = True) -> dict:
+    engine = create_async_engine(database_url)
+    started = time.perf_counter()
+    try:
+        async with engine.begin() as conn:
+            if reset:
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.run_sync(Base.metadata.create_all)
+                # Схема из моделей совпадает с последней миграцией: сервер стартует в режиме check
+                await stamp_head(conn)
+            for table_name, trigger in SEED_DISABLED_TRIGGERS:
+                await conn.execute(sa.text(f"ALTER TABLE {table_name} DISABLE TRIGGER {trigger}"))
+            first_id = (await conn.execute(SEED_TABLES, {"count": tables, "locations": list(LOCATIONS)})).scalar()
+            logger.info("Создано столов: %s", tables)
+
+        start = seed_start(reservations_per_table)
+        # Месячные партиции под всю сетку, чтобы брони не осели в партиции по умолчанию
+        last = (start + timedelta(minutes=SLOT_STEP_MINUTES * reservations_per_table)).date()
+        months, month = [], month_start(start.date())
+        while month <= last:
+            months.append(month)
+            month = add_months(month, 1)
+        await create_partitions(engine, months)
+
+        for offset in range(0, tables, TABLES_PER_BATCH):
+            async with engine.begin() as conn:
+                await conn.execute(SEED_RESERVATIONS, {
+                    "seed_start": start,
+                    "step": SLOT_STEP_MINUTES,
+                    "durations": list(DURATION_CHOICES),
+                    "per_table": reservations_per_table,
+                    "first_id": first_id + offset,
+                    "batch": TABLES_PER_BATCH,
+                })
+            logger.info("Брони: %s/%s столов", min(offset + TABLES_PER_BATCH, tables), tables)
+
+        async with engine.begin() as conn:
+            for table_name, trigger in SEED_DISABLED_TRIGGERS:
+                await conn.execute(sa.text(f"ALTER TABLE {table_name} ENABLE TRIGGER {trigger}"))
+            await analytics_service.rebuild(conn)
+        # Статистика планировщика после массовой заливки
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(sa.text("VACUUM ANALYZE tables"))
+            await conn.execute(sa.text("VACUUM ANALYZE reservations"))
+    finally:
+        await engine.dispose()
+
+    return {
+        "tables": tables,
+        "reservations": tables * reservations_per_table,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
@@ -0,0 +1,51 @@
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+
+from app.core.serialization import rows_to_json
+from app.models.reservation import Reservation
+from app.schemas import ReservationResponse
+from app.services.reservation_service import RESERVATION_LIST_COLUMNS, RESERVATION_LIST_FIELDS
+
+# Прежний путь списка: ORM-объекты и повторная валидация через схему ответа
+ReservationList = TypeAdapter(list[ReservationResponse])
+
+
+async def _orm_path(session: AsyncSession, limit: int) -> tuple[int, bytes]:
+    query = select(Reservation).order_by(Reservation.reservation_time, Reservation.id).limit(limit)
+    reservations = (await session.execute(query)).scalars().all()
+    body = ReservationList.dump_json(ReservationList.validate_python(reservations, from_attributes=True))
+    return len(reservations), body
+
+
+async def _core_path(session: AsyncSession, limit: int) -> tuple[int, bytes]:
+    query = select(*RESERVATION_LIST_COLUMNS).order_by(Reservation.reservation_time, Reservation.id).limit(limit)
+    rows = (await session.execute(query)).all()
+    return len(rows), rows_to_json(rows, RESERVATION_LIST_FIELDS)
+
+
+async def serialization(database_url: str, rows: int, runs: int) -> dict:
+    """Строк в секунду на списке из rows броней: запрос, сборка строк и JSON-тело,
+    прежним ORM-путём и через Core-строки с orjson. Берётся лучший из runs прогонов."""
+    engine = create_async_engine(database_url)
+    report = {"rows": rows, "runs": runs}
+    try:
+        bodies = {}
+        for name, path in (("orm", _orm_path), ("core", _core_path)):
+            best = None
+            for _ in range(runs):
+                # Новая сессия на прогон: identity map не переживает запрос, как и в приложении
+                async with AsyncSession(engine) as session:
+                    started = time.perf_counter()
+                    count, body = await path(session, rows)
+                    elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            bodies[name] = body
+            report[name] = {"seconds": round(best, 4), "rows_per_second": round(count / best)}
+    finally:
+        await engine.dispose()
+    report["speedup"] = round(report["orm"]["seconds"] / report["core"]["seconds"], 2)
+    report["identical"] = bodies["orm"] == bodies["core"]
+    return report
@@ -0,0 +1,83 @@
+"""Общая тестовая база.
+
+Схема создаётся один раз на процесс pytest, а каждый тест работает внутри
+транзакции, которую в конце откатывает (см. db_session в tests/test_api.py).
+При запуске через pytest-xdist (pytest -n auto) у каждого воркера своя база:
+для Postgres — mytestdb_gw0, mytestdb_gw1, ... на том же сервере, для SQLite —
+отдельный файл рядом с основным. Тесты, которым нужны возможности Postgres
+(LISTEN/NOTIFY, партиции, plpgsql), помечены @pytest.mark.postgres и на SQLite
+пропускаются.
+"""
+import asyncio
+import os
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database import configure_connections, settings
+from app.models import Base
+
+
+def worker_database_url(url: str, worker: str) -> str:
+    """Адрес базы воркера xdist: своё имя базы или свой файл SQLite."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        root, extension = os.path.splitext(parsed.database)
+        return parsed.set(database=f"{root}_{worker}{extension}").render_as_string(hide_password=False)
+    return parsed.set(database=f"{parsed.database}_{worker}").render_as_string(hide_password=False)
+
+
+# Тестовые модули читают адрес при импорте, то есть после conftest
+WORKER = os.getenv("PYTEST_XDIST_WORKER")
+SHARED_DATABASE_URL = settings.TEST_DATABASE_URL
+if WORKER:
+    settings.TEST_DATABASE_URL = worker_database_url(SHARED_DATABASE_URL, WORKER)
+
+IS_SQLITE = make_url(settings.TEST_DATABASE_URL).get_backend_name() == "sqlite"
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: тест нужен Postgres, на SQLite пропускается")
+
+
+def pytest_collection_modifyitems(config, items):
+    if not IS_SQLITE:
+        return
+    skip = pytest.mark.skip(reason="требуется Postgres")
+    for item in items:
+        if "postgres" in item.keywords:
+            item.add_marker(skip)
+
+
+async def create_worker_database():
+    """CREATE DATABASE для воркера xdist, если её ещё нет. Выполняется в общей базе."""
+    database = make_url(settings.TEST_DATABASE_URL).database
+    engine = create_async_engine(SHARED_DATABASE_URL, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as conn:
+            exists = await conn.scalar(sa.text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": database})
+            if not exists:
+                await conn.execute(sa.text(f'CREATE DATABASE "{database}"'))
+    finally:
+        await engine.dispose()
+
+
+async def create_schema():
+    engine = configure_connections(create_async_engine(settings.TEST_DATABASE_URL, poolclass=NullPool), settings)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_database():
+    """Схема создаётся заново при каждом запуске: следы прошлого запуска не мешают."""
+    if WORKER and not IS_SQLITE:
+        asyncio.run(create_worker_database())
+    asyncio.run(create_schema())
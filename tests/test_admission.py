@@ -0,0 +1,92 @@
+import asyncio
+
+import httpx
+import pytest
+from httpx import ASGITransport
+
+from app.core.admission import AdmissionController, AdmissionMiddleware, ClassLimits, RouteClass, plan_limits
+from app.database import Settings
+
+
+def make_controller(capacity: int = 2, queue: int = 2, wait_seconds: float = 1.0) -> AdmissionController:
+    return AdmissionController(capacity, {
+        RouteClass.write: ClassLimits(capacity, queue, wait_seconds),
+        RouteClass.read: ClassLimits(capacity - 1, queue, wait_seconds),
+    })
+
+
+def test_limits_follow_pool_capacity():
+    settings = Settings(ADMISSION_WRITE_RESERVE=0.25, ADMISSION_QUEUE_FACTOR=2)
+    limits = plan_limits(20, settings)
+    assert (limits[RouteClass.write].concurrency, limits[RouteClass.read].concurrency) == (20, 15)
+    assert (limits[RouteClass.write].queue, limits[RouteClass.read].queue) == (40, 30)
+    # Пул из одного соединения всё равно пропускает и чтение, и запись
+    assert {limits.concurrency for limits in plan_limits(1, settings).values()} == {1}
+
+
+@pytest.mark.asyncio
+async def test_writes_are_admitted_before_reads():
+    controller = make_controller()
+    await controller.acquire(RouteClass.read)
+    await controller.acquire(RouteClass.write)
+    order = []
+
+    async def request(route_class: RouteClass, name: str):
+        await controller.acquire(route_class)
+        order.append(name)
+
+    waiting = [asyncio.create_task(request(RouteClass.read, "read")), asyncio.create_task(request(RouteClass.write, "write"))]
+    await asyncio.sleep(0.01)
+    assert (controller.queued(RouteClass.read), controller.queued(RouteClass.write)) == (1, 1)
+
+    # Освободилось одно место: его получает запись, хотя чтение ждёт дольше
+    controller.release(RouteClass.read)
+    await asyncio.sleep(0.01)
+    assert order == ["write"]
+    controller.release(RouteClass.write)
+    await asyncio.gather(*waiting)
+    assert order == ["write", "read"]
+    assert controller.in_flight == {RouteClass.write: 1, RouteClass.read: 1}
+
+
+@pytest.mark.asyncio
+async def test_queue_bound_and_deadline_shed_requests():
+    controller = make_controller(capacity=1, queue=1, wait_seconds=0.05)
+    await controller.acquire(RouteClass.write)
+    waiter = asyncio.create_task(controller.acquire(RouteClass.write))
+    await asyncio.sleep(0)
+    with pytest.raises(Exception, match="queue_full"):
+        await controller.acquire(RouteClass.write)
+    with pytest.raises(Exception, match="timeout"):
+        await waiter
+    assert controller.stats()["write"]["shed"] == 2
+    assert controller.queued(RouteClass.write) == 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_answers_503_with_retry_after():
+    controller = make_controller(capacity=2, queue=0, wait_seconds=0.05)
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    transport = ASGITransport(app=AdmissionMiddleware(app, controller, retry_after_seconds=2))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # Чтению доступно одно место из двух, второе остаётся записи
+        slow_read = asyncio.create_task(client.get("/reservations/"))
+        await asyncio.sleep(0.01)
+        response = await client.get("/tables/")
+        assert (response.status_code, response.headers["retry-after"]) == (503, "2")
+        assert response.json() == {"detail": "Server is overloaded, retry later"}
+
+        write = asyncio.create_task(client.post("/reservations/"))
+        # Пробы не ограничиваются
+        probe = asyncio.create_task(client.get("/health/live"))
+        await asyncio.sleep(0.01)
+        assert controller.in_flight == {RouteClass.write: 1, RouteClass.read: 1}
+        release.set()
+        assert [r.status_code for r in await asyncio.gather(slow_read, write, probe)] == [200, 200, 200]
+    assert controller.in_flight == {RouteClass.write: 0, RouteClass.read: 0}
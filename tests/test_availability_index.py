@@ -0,0 +1,65 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from app.models.reservation import RESERVATION_CHANGES_CHANNEL
+from app.models.table import TABLE_CHANGES_CHANNEL
+from app.services.availability_index import AvailabilityIndex, Verdict
+
+
+def make_index(now: datetime) -> AvailabilityIndex:
+    # Индекс в состоянии «загружен» без обращения к базе
+    index = AvailabilityIndex(horizon=timedelta(days=7))
+    index._covered_until = index._accept_until = now + timedelta(days=7)
+    index.ready = True
+    index.add_table(1)
+    return index
+
+
+def test_check_verdicts():
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    index = make_index(now)
+    start = now + timedelta(hours=2)
+    index.add_reservation(10, 1, start, start + timedelta(hours=1))
+
+    assert index.check(2, start, start + timedelta(hours=1)) == Verdict.unknown_table
+    assert index.check(1, start + timedelta(minutes=30), start + timedelta(hours=2)) == Verdict.conflict
+    assert index.check(1, start - timedelta(minutes=30), start + timedelta(minutes=1)) == Verdict.conflict
+    # Полуинтервалы: бронь встык не конфликтует
+    assert index.check(1, start + timedelta(hours=1), start + timedelta(hours=2)) == Verdict.free
+    assert index.check(1, start - timedelta(hours=1), start) == Verdict.free
+    assert index.check(1, now + timedelta(days=8), now + timedelta(days=8, hours=1)) == Verdict.out_of_range
+
+    stats = index.stats()
+    assert (stats["hits"], stats["misses"]) == (3, 3)
+
+
+def test_not_ready_index_does_not_answer():
+    index = AvailabilityIndex(horizon=timedelta(days=7))
+    now = datetime.now(timezone.utc)
+    assert index.check(1, now, now + timedelta(hours=1)) is None
+
+
+def test_notifications_and_eviction():
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    index = make_index(now)
+    start = now + timedelta(hours=1)
+
+    index.handle_notification(TABLE_CHANGES_CHANNEL, json.dumps({"op": "INSERT", "id": 2}))
+    index.handle_notification(RESERVATION_CHANGES_CHANNEL, json.dumps({
+        "op": "INSERT", "id": 20, "table_id": 2,
+        "reservation_time": start.isoformat(), "duration_minutes": 60,
+    }))
+    assert index.check(2, start, start + timedelta(minutes=15)) == Verdict.conflict
+
+    index.handle_notification(RESERVATION_CHANGES_CHANNEL, json.dumps({"op": "DELETE", "id": 20}))
+    assert index.check(2, start, start + timedelta(minutes=15)) == Verdict.free
+
+    # Брони за горизонтом не хранятся, закончившиеся вытесняются
+    index.add_reservation(21, 2, now + timedelta(days=9), now + timedelta(days=9, hours=1))
+    index.add_reservation(22, 2, start, start + timedelta(hours=1))
+    assert index.stats()["reservations"] == 1
+    index.evict(start + timedelta(hours=2))
+    assert index.stats()["reservations"] == 0
+
+    index.handle_notification(TABLE_CHANGES_CHANNEL, json.dumps({"op": "DELETE", "id": 2}))
+    assert index.check(2, start, start + timedelta(minutes=15)) == Verdict.unknown_table
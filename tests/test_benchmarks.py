@@ -0,0 +1,42 @@
+import copy
+
+from benchmarks.compare import compare
+from benchmarks.load import ScenarioResult, percentile
+
+
+def test_percentile_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 0.50) == 50.0
+    assert percentile(values, 0.95) == 95.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([7.0], 0.99) == 7.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_scenario_summary_counts_unexpected_statuses():
+    result = ScenarioResult("create_contention", {201, 400})
+    for latency, status in [(0.01, "201"), (0.02, "400"), (0.03, "500"), (0.04, "ConnectError")]:
+        result.record(latency, status)
+    result.seconds = 2.0
+    summary = result.summary()
+    assert summary["requests"] == 4
+    assert summary["throughput_rps"] == 2.0
+    assert summary["unexpected"] == 2
+    assert summary["latency_ms"]["max"] == 40.0
+
+
+def test_compare_reports_regressions_beyond_tolerance():
+    baseline = {"scenarios": {"list_page": {
+        "throughput_rps": 1000.0,
+        "latency_ms": {"p50": 10.0, "p95": 20.0, "p99": 40.0},
+        "unexpected": 0,
+    }}}
+    report = copy.deepcopy(baseline)
+    # Шум в пределах допуска регрессией не считается
+    report["scenarios"]["list_page"]["latency_ms"]["p95"] = 22.0
+    assert compare(report, baseline, tolerance=0.15) == []
+
+    report["scenarios"]["list_page"]["latency_ms"]["p99"] = 60.0
+    report["scenarios"]["list_page"]["throughput_rps"] = 700.0
+    regressions = compare(report, baseline, tolerance=0.15)
+    assert {(r["metric"], r["change_pct"]) for r in regressions} == {("p99", 50.0), ("throughput_rps", -30.0)}
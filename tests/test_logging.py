@@ -0,0 +1,70 @@
+import json
+import logging
+import queue
+
+import httpx
+import pytest
+from httpx import ASGITransport
+
+from app.core.logger import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    RateLimitFilter,
+    RequestIdFilter,
+    request_id_var,
+)
+from app.main import app
+
+
+def _record(msg, *args, level=logging.INFO, name="app.test"):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_rate_limit_per_template_reports_suppressed(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.core.logger.time.monotonic", lambda: now[0])
+    rate_limit = RateLimitFilter(per_second=2)
+
+    passed = [rate_limit.filter(_record("Бронь %s", n)) for n in range(5)]
+    assert passed == [True, True, False, False, False]
+    # Другой шаблон и предупреждения считаются отдельно
+    assert rate_limit.filter(_record("Удаление %s", 1))
+    assert rate_limit.filter(_record("Бронь %s", 6, level=logging.WARNING))
+
+    now[0] += 1.0
+    record = _record("Бронь %s", 7)
+    assert rate_limit.filter(record)
+    assert record.suppressed == 3
+
+
+def test_queue_handler_defers_formatting_and_never_blocks():
+    log_queue = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+
+    token = request_id_var.set("req-1")
+    try:
+        handler.handle(_record("Стол %s", 5))
+        handler.handle(_record("Стол %s", 6))
+    finally:
+        request_id_var.reset(token)
+
+    record = log_queue.get_nowait()
+    # Аргументы не подставлены в потоке вызова
+    assert (record.msg, record.args, record.request_id) == ("Стол %s", (5,), "req-1")
+    assert handler.dropped == 1
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Стол 5"
+    assert entry["request_id"] == "req-1"
+    assert entry["level"] == "INFO"
+
+
+@pytest.mark.asyncio
+async def test_request_id_header():
+    async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/tables/health", headers={"X-Request-ID": "abc-123"})
+        assert response.headers["x-request-id"] == "abc-123"
+
+        generated = (await client.get("/tables/health")).headers["x-request-id"]
+        assert len(generated) == 32 and generated != "abc-123"
@@ -0,0 +1,73 @@
+import logging
+
+import httpx
+import pytest
+import sqlalchemy as sa
+from fastapi import FastAPI
+from httpx import ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.profiling import ProfilingMiddleware, QueryProfiler, RequestProfile
+from app.database import configure_connections, settings
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_repeated_ignores_transaction_control():
+    profile = RequestProfile()
+    profile.statements.update({"SELECT 1": 3, "BEGIN": 5, "SELECT 2": 1})
+    assert profile.repeated(3) == [("SELECT 1", 3)]
+    assert profile.server_timing().startswith(b'db;dur=0.0;desc="0 queries", app;dur=')
+
+
+@pytest.mark.asyncio
+async def test_headers_slow_queries_repeats_and_samples(tmp_path):
+    engine = configure_connections(create_async_engine(settings.TEST_DATABASE_URL, poolclass=NullPool), settings)
+    # Порог 0 мс: медленным считается любое выражение
+    profiler = QueryProfiler(slow_query_ms=0, repeat_threshold=3, sample_every=2, dump_dir=str(tmp_path))
+    profiler.instrument(engine)
+
+    api = FastAPI()
+    lookup_query = sa.select(sa.bindparam("n", type_=sa.Integer))
+
+    @api.get("/tables/{count}")
+    async def lookup(count: int):
+        async with engine.connect() as conn:
+            # Одно выражение с разными параметрами в цикле: типичный N+1
+            return [await conn.scalar(lookup_query, {"n": n}) for n in range(count)]
+
+    handler = ListHandler()
+    logger = logging.getLogger("app.core.profiling")
+    logger.addHandler(handler)
+    try:
+        async with httpx.AsyncClient(transport=ASGITransport(app=ProfilingMiddleware(api, profiler)), base_url="http://test") as client:
+            few = await client.get("/tables/2")
+            many = await client.get("/tables/4")
+    finally:
+        logger.removeHandler(handler)
+        await engine.dispose()
+
+    assert few.json() == [0, 1]
+    # На SQLite к выражениям добавляется BEGIN из configure_connections
+    assert int(few.headers["x-db-queries"]) >= 2
+    assert int(many.headers["x-db-queries"]) >= 4
+    assert few.headers["server-timing"].startswith("db;dur=")
+    assert 'desc="' in few.headers["server-timing"] and "total;dur=" in few.headers["server-timing"]
+
+    slow = [message for message in handler.messages if message.startswith("Медленный SQL-запрос")]
+    # Параметры пишутся в том виде, в каком их получил драйвер
+    assert any(message.endswith("параметры: (3,)") for message in slow)
+    repeats = [message for message in handler.messages if message.startswith("Возможный N+1")]
+    assert len(repeats) == 1 and "GET /tables/4" in repeats[0] and "4 раз" in repeats[0]
+
+    # Снят второй запрос из двух
+    [dump] = tmp_path.iterdir()
+    assert dump.name.endswith(".prof") and "_GET_tables_4_" in dump.name
@@ -0,0 +1,150 @@
+import asyncio
+import json
+
+import pytest
+
+from app.main import app
+from app.services.reservation_stream import RESET, ReservationStream, format_sse, reservation_stream
+
+
+def created(event_id: int, table_id: int, reservation_id: int = 0) -> str:
+    return json.dumps({
+        "op": "INSERT", "event_id": event_id, "id": reservation_id or event_id, "table_id": table_id,
+        "reservation_time": "2025-04-10T18:00:00+00:00", "duration_minutes": 60,
+    })
+
+
+def make_stream(queue_size: int = 8) -> ReservationStream:
+    stream = ReservationStream(buffer_size=4, queue_size=queue_size, heartbeat_seconds=0.05)
+    stream.handle_table(json.dumps({"op": "INSERT", "id": 1, "location": "зал"}))
+    stream.handle_table(json.dumps({"op": "INSERT", "id": 2, "location": "терраса"}))
+    return stream
+
+
+def drain(subscriber) -> list:
+    events = []
+    while not subscriber.queue.empty():
+        events.append(subscriber.queue.get_nowait())
+    return events
+
+
+def test_filters_by_table_and_location():
+    stream = make_stream()
+    everything, hall, table_two = stream.subscribe(), stream.subscribe(location="зал"), stream.subscribe(table_id=2)
+    stream.handle_reservation(created(1, table_id=1))
+    stream.handle_reservation(created(2, table_id=2))
+    stream.handle_reservation(json.dumps({"op": "DELETE", "event_id": 3, "id": 1, "table_id": 1}))
+    # Служебное уведомление без номера в поток не попадает
+    stream.handle_reservation(json.dumps({"op": "ARCHIVE"}))
+
+    assert [e.event_id for e in drain(everything)] == [1, 2, 3]
+    assert [(e.event_id, e.type) for e in drain(hall)] == [(1, "created"), (3, "deleted")]
+    [event] = drain(table_two)
+    assert json.loads(event.data) == {"event_id": 2, "type": "created", "reservation": {
+        "id": 2, "table_id": 2, "reservation_time": "2025-04-10T18:00:00Z", "duration_minutes": 60,
+    }}
+    assert format_sse(event).startswith(b"id: 2\nevent: created\ndata: {")
+
+
+def test_table_update_moves_location():
+    stream = make_stream()
+    stream.handle_table(json.dumps({"op": "UPDATE", "id": 1, "location": "терраса"}))
+    terrace = stream.subscribe(location="терраса")
+    stream.handle_reservation(created(1, table_id=1))
+    assert [e.event_id for e in drain(terrace)] == [1]
+
+
+def test_resume_from_last_event_id():
+    stream = make_stream()
+    for event_id in range(1, 6):
+        stream.handle_reservation(created(event_id, table_id=1 + event_id % 2))
+
+    # Буфер держит 4 последних события: 2–5
+    assert [e.event_id for e in drain(stream.subscribe(last_event_id=3))] == [4, 5]
+    assert [e.event_id for e in drain(stream.subscribe(table_id=1, last_event_id=2))] == [4]
+    assert drain(stream.subscribe(last_event_id=5)) == []
+    # Событие вытеснено из буфера или неизвестно воркеру — клиенту нужно перечитать список
+    assert drain(stream.subscribe(last_event_id=1)) == [RESET]
+    assert stream.stats()["resets"] == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_dropped():
+    stream = make_stream(queue_size=2)
+    slow, fast = stream.subscribe(), stream.subscribe()
+    received = []
+
+    async def read():
+        async for event in stream.listen(fast):
+            if event is not None:
+                received.append(event.event_id)
+
+    reader = asyncio.create_task(read())
+    for event_id in range(1, 5):
+        stream.handle_reservation(created(event_id, table_id=1))
+        await asyncio.sleep(0.01)
+    assert received == [1, 2, 3, 4]
+
+    # Отставший подписчик получает только маркер конца потока
+    assert slow.dropped and drain(slow) == [None]
+    assert stream.stats()["subscribers"] == 1 and stream.stats()["dropped"] == 1
+    reader.cancel()
+
+
+@pytest.mark.asyncio
+async def test_websocket_and_sse_endpoints(monkeypatch):
+    monkeypatch.setattr(reservation_stream, "heartbeat_seconds", 0.05)
+    reservation_stream.handle_table(json.dumps({"op": "INSERT", "id": 7, "location": "зал"}))
+    sent: asyncio.Queue = asyncio.Queue()
+    client_gone = asyncio.Event()
+
+    async def send(message):
+        # Так сервер сообщает приложению, что клиент уже отключился
+        if client_gone.is_set():
+            raise OSError("client disconnected")
+        await sent.put(message)
+
+    async def connect():
+        return {"type": "websocket.connect"}
+
+    scope = {
+        "type": "websocket", "path": "/reservations/stream", "raw_path": b"/reservations/stream",
+        "query_string": b"location=%D0%B7%D0%B0%D0%BB", "headers": [], "scheme": "ws",
+        "server": ("test", 80), "client": ("test", 1), "subprotocols": [], "root_path": "",
+    }
+    session = asyncio.create_task(app(scope, connect, send))
+    assert (await asyncio.wait_for(sent.get(), 1))["type"] == "websocket.accept"
+
+    reservation_stream.handle_reservation(created(100, table_id=7))
+    reservation_stream.handle_reservation(created(101, table_id=8))
+    assert json.loads((await asyncio.wait_for(sent.get(), 1))["text"])["event_id"] == 100
+    assert json.loads((await asyncio.wait_for(sent.get(), 1))["text"]) == {"type": "ping"}
+
+    # Отключение замечается на ближайшей отправке, в худшем случае на heartbeat
+    client_gone.set()
+    await asyncio.wait_for(session, 1)
+    assert reservation_stream.stats()["subscribers"] == 0
+
+    # SSE продолжает с Last-Event-ID
+    reservation_stream.handle_reservation(created(102, table_id=7))
+    http_scope = {
+        "type": "http", "method": "GET", "path": "/reservations/stream", "raw_path": b"/reservations/stream",
+        "query_string": b"table_id=7", "headers": [(b"last-event-id", b"100")], "scheme": "http",
+        "server": ("test", 80), "client": ("test", 1), "root_path": "", "http_version": "1.1",
+    }
+    client_gone.clear()
+    sent = asyncio.Queue()
+
+    async def http_receive():
+        await client_gone.wait()
+        return {"type": "http.disconnect"}
+
+    response = asyncio.create_task(app(http_scope, http_receive, sent.put))
+    start = await asyncio.wait_for(sent.get(), 1)
+    assert start["status"] == 200
+    assert dict(start["headers"])[b"content-type"].startswith(b"text/event-stream")
+    assert (await asyncio.wait_for(sent.get(), 1))["body"].startswith(b"id: 102\nevent: created\n")
+    assert (await asyncio.wait_for(sent.get(), 1))["body"] == b": ping\n\n"
+    client_gone.set()
+    await asyncio.wait_for(response, 1)
+    assert reservation_stream.stats()["subscribers"] == 0
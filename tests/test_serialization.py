@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+
+from pydantic import TypeAdapter
+
+from app.core.serialization import rows_to_json, rows_to_ndjson
+from app.schemas import ReservationResponse
+from app.services.reservation_service import EXPORT_COLUMNS, RESERVATION_LIST_FIELDS
+
+
+def test_rows_to_json_matches_response_model():
+    rows = [
+        ("Алиса", 3, datetime(2025, 4, 10, 20, 0, tzinfo=timezone.utc), 60, 1),
+        ('Боб "младший"', 4, datetime(2025, 4, 10, 21, 30, 15, 500, tzinfo=timezone.utc), 90, 2),
+    ]
+    adapter = TypeAdapter(list[ReservationResponse])
+    # Через модели, как ответ с response_model: dump_json сериализует их без предупреждений
+    expected = adapter.dump_json(adapter.validate_python([dict(zip(RESERVATION_LIST_FIELDS, row)) for row in rows]))
+    assert rows_to_json(rows, RESERVATION_LIST_FIELDS) == expected
+    assert rows_to_json([], RESERVATION_LIST_FIELDS) == b"[]"
+
+    # В выгрузке время по-прежнему со смещением, по строке на бронь
+    export_row = (1, "Алиса", 3, datetime(2025, 4, 10, 20, 0, tzinfo=timezone.utc), 60)
+    lines = rows_to_ndjson([export_row], EXPORT_COLUMNS).splitlines()
+    assert lines == ['{"id":1,"customer_name":"Алиса","table_id":3,"reservation_time":"2025-04-10T20:00:00+00:00","duration_minutes":60}'.encode()]
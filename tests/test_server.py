@@ -0,0 +1,31 @@
+import pytest
+
+from app.server import PoolPlan, main, plan_pool
+
+
+def test_pool_plan_fits_connection_budget():
+    # Бюджета хватает: настройки не меняются
+    assert plan_pool(4, pool_size=10, max_overflow=10, budget=100) == PoolPlan(4, 10, 10)
+
+    # Сначала урезается overflow: 8 воркеров × (10 + 1 + LISTEN) = 96
+    plan = plan_pool(8, pool_size=10, max_overflow=10, budget=100)
+    assert plan == PoolPlan(8, 10, 1)
+    assert plan.connections <= 100
+
+    plan = plan_pool(16, pool_size=10, max_overflow=10, budget=90)
+    assert plan == PoolPlan(16, 4, 0)
+    assert plan.connections <= 90
+
+    with pytest.raises(ValueError):
+        plan_pool(50, pool_size=10, max_overflow=10, budget=90)
+
+
+def test_workers_must_be_positive(capsys):
+    with pytest.raises(ValueError, match="At least one worker"):
+        plan_pool(0, pool_size=10, max_overflow=10, budget=100)
+    # Ошибка разбора аргументов, а не ZeroDivisionError при расчёте пула
+    for workers in ("0", "-2"):
+        with pytest.raises(SystemExit) as exited:
+            main(["--workers", workers])
+        assert exited.value.code == 2
+        assert "--workers must be at least 1" in capsys.readouterr().err
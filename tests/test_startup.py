@@ -0,0 +1,106 @@
+import asyncio
+
+import httpx
+import pytest
+from httpx import ASGITransport
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.startup import (
+    SchemaMode,
+    SchemaOutdated,
+    current_revision,
+    ensure_schema,
+    head_revision,
+    readiness,
+    stamp_head,
+    warm_statements,
+)
+from app.database import configure_connections, get_async_session, settings
+from app.main import app
+from app.services.partitions import future_months, list_partitions, partition_name
+from tests.test_api import override_get_async_session
+
+# Проверка готовности ходит в тестовую базу
+app.dependency_overrides[get_async_session] = override_get_async_session
+
+
+@pytest.mark.asyncio
+async def test_schema_check_refuses_outdated_schema():
+    engine = create_async_engine(settings.TEST_DATABASE_URL)
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        with pytest.raises(SchemaOutdated):
+            await ensure_schema(engine, SchemaMode.check)
+
+        async with engine.begin() as conn:
+            await stamp_head(conn)
+        assert await ensure_schema(engine, SchemaMode.check) == head_revision()
+        async with engine.connect() as conn:
+            assert await current_revision(conn) == head_revision()
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_liveness_and_readiness():
+    async with httpx.AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/health/live")).json() == {"status": "alive"}
+
+        # Lifespan в тестах не выполняется: процесс ещё «стартует»
+        response = await client.get("/health/ready")
+        assert (response.status_code, response.json()["status"]) == (503, "starting")
+
+        readiness.mark_ready("test-revision")
+        try:
+            response = await client.get("/health/ready")
+            assert response.status_code == 200
+            assert response.json()["revision"] == "test-revision"
+            assert (await client.get("/tables/health")).status_code == 200
+        finally:
+            readiness.mark_stopping()
+
+
+@pytest.mark.asyncio
+@pytest.mark.postgres
+async def test_migrate_mode_creates_partitions_once():
+    # Миграции с нуля — в отдельной базе: общая тестовая схема создана по моделям
+    url = make_url(settings.TEST_DATABASE_URL)
+    scratch = url.set(database=f"{url.database}_migrate")
+    admin = create_async_engine(url, poolclass=NullPool, isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f'DROP DATABASE IF EXISTS "{scratch.database}"'))
+        await conn.execute(text(f'CREATE DATABASE "{scratch.database}"'))
+    engine = create_async_engine(scratch)
+    try:
+        # Воркеры стартуют одновременно: миграции и партиции достаются одному
+        revisions = await asyncio.gather(*(ensure_schema(engine, SchemaMode.migrate, 1) for _ in range(3)))
+        assert revisions == [head_revision()] * 3
+        async with engine.connect() as conn:
+            partitions = await list_partitions(conn)
+        monthly = {name for name in partitions if name != "reservations_default"}
+        assert monthly == {partition_name(month) for month in future_months(1)}
+    finally:
+        await engine.dispose()
+        async with admin.connect() as conn:
+            await conn.execute(text(f'DROP DATABASE "{scratch.database}"'))
+        await admin.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.postgres
+async def test_warm_statements_run_hot_path_queries():
+    # Прогрев выполняется только на Postgres: на SQLite вставку-пробу отклонил бы внешний ключ
+    engine = configure_connections(create_async_engine(settings.TEST_DATABASE_URL, poolclass=NullPool), settings)
+    try:
+        async with engine.connect() as conn:
+            await warm_statements(conn)
+            assert (await conn.execute(text("SELECT count(*) FROM reservations"))).scalar() == 0
+            await conn.rollback()
+    finally:
+        await engine.dispose()